@@ -0,0 +1,33 @@
+"""Shared set-up for the benchmarks. All fixtures are generated locally in a
+temporary directory so that no benchmark needs network access."""
+import os
+import shutil
+import tempfile
+
+from wsynphot.tests.helpers import make_filter_cache, write_vega_fits
+
+
+class LocalFilterCache(object):
+    """Mixin creating a temporary filter cache and Vega calibration file
+
+    Subclasses set `n_filters` (or override `get_n_filters`) and
+    `n_filter_points`.
+    """
+    n_filters = 10
+    n_filter_points = 500
+
+    def get_n_filters(self, *params):
+        return self.n_filters
+
+    def setup(self, *params):
+        self.tmp_dir = tempfile.mkdtemp(prefix='wsynphot_bench_')
+        self.cache_dir = os.path.join(self.tmp_dir, 'filters', 'SVO')
+        os.makedirs(self.cache_dir)
+        self.filter_ids = make_filter_cache(self.cache_dir,
+                                            self.get_n_filters(*params),
+                                            n_points=self.n_filter_points)
+        self.vega_fpath = os.path.join(self.tmp_dir, 'vega.fits')
+        write_vega_fits(self.vega_fpath)
+
+    def teardown(self, *params):
+        shutil.rmtree(self.tmp_dir, ignore_errors=True)
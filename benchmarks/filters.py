@@ -0,0 +1,49 @@
+"""Benchmarks for loading filters from the cache"""
+from wsynphot import FilterCurve, FilterSet
+
+from .common import LocalFilterCache
+
+
+class FilterCurveLoad(LocalFilterCache):
+    params = [100, 1000, 10000]
+    param_names = ['n_filter_points']
+
+    def setup(self, n_filter_points):
+        self.n_filter_points = n_filter_points
+        super(FilterCurveLoad, self).setup(n_filter_points)
+
+    def time_load_filter(self, n_filter_points):
+        FilterCurve.load_filter(self.filter_ids[0], cache_dir=self.cache_dir)
+
+
+class FilterSetConstruction(LocalFilterCache):
+    params = [1, 10, 50]
+    param_names = ['n_filters']
+
+    def get_n_filters(self, n_filters):
+        return n_filters
+
+    def time_filter_set_from_ids(self, n_filters):
+        FilterSet(self.filter_ids, cache_dir=self.cache_dir)
+
+    def time_zp_vega(self, n_filters):
+        filter_set = FilterSet(self.filter_ids, cache_dir=self.cache_dir,
+                               vega_fpath=self.vega_fpath)
+        for filter in filter_set:
+            filter.zp_vega_f_lambda
+
+
+class FilterSetMemory(LocalFilterCache):
+    params = ([None, 'float32'], [False, True])
+    param_names = ['dtype', 'share_wavelength']
+    n_filters = 50
+
+    def setup(self, dtype, share_wavelength):
+        super(FilterSetMemory, self).setup(dtype, share_wavelength)
+        self.filter_set = FilterSet(self.filter_ids, cache_dir=self.cache_dir,
+                                    dtype=dtype,
+                                    share_wavelength=share_wavelength)
+
+    def track_memory_usage(self, dtype, share_wavelength):
+        return int(self.filter_set.memory_usage()['Total'])
+    track_memory_usage.unit = 'bytes'
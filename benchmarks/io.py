@@ -0,0 +1,42 @@
+"""Benchmarks for reading the filter cache"""
+import os
+import shutil
+import tempfile
+
+from wsynphot.io.cache_filters import df_from_votable, load_local_filters_index
+from wsynphot.tests.helpers import (make_filter_cache, make_transmission_curve,
+                                    write_filter_votable)
+
+
+class LocalFiltersIndex(object):
+    params = [1000, 10000, 50000]
+    param_names = ['n_filters']
+    timeout = 300
+
+    def setup(self, n_filters):
+        self.cache_dir = tempfile.mkdtemp(prefix='wsynphot_bench_')
+        make_filter_cache(self.cache_dir, n_filters, n_instruments=100,
+                          empty_files=True)
+
+    def teardown(self, n_filters):
+        shutil.rmtree(self.cache_dir, ignore_errors=True)
+
+    def time_load_local_filters_index(self, n_filters):
+        load_local_filters_index(self.cache_dir)
+
+
+class VOTableToDataFrame(object):
+    params = [100, 1000, 10000]
+    param_names = ['n_filter_points']
+
+    def setup(self, n_filter_points):
+        self.tmp_dir = tempfile.mkdtemp(prefix='wsynphot_bench_')
+        self.votable_path = os.path.join(self.tmp_dir, 'filter.vot')
+        write_filter_votable(self.votable_path, *make_transmission_curve(
+            5000, 500, n_points=n_filter_points))
+
+    def teardown(self, n_filter_points):
+        shutil.rmtree(self.tmp_dir, ignore_errors=True)
+
+    def time_df_from_votable(self, n_filter_points):
+        df_from_votable(self.votable_path)
@@ -0,0 +1,119 @@
+"""Benchmarks for synthetic photometry"""
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+
+import numpy as np
+from astropy import units as u
+
+from wsynphot import FilterSet
+from wsynphot.base import calculate_ab_magnitude, calculate_vega_magnitude
+from wsynphot.tests.helpers import make_spectrum, make_spectrum_arrays
+
+from .common import LocalFilterCache
+
+
+class FilterMagnitude(LocalFilterCache):
+    params = [1000, 10000, 100000]
+    param_names = ['n_spectrum_points']
+    n_filters = 1
+
+    def setup(self, n_spectrum_points):
+        super(FilterMagnitude, self).setup(n_spectrum_points)
+        self.spectrum = make_spectrum(n_spectrum_points)
+        self.filter = FilterSet(self.filter_ids, cache_dir=self.cache_dir,
+                                vega_fpath=self.vega_fpath)[0]
+        # compute the zero points outside of the timed functions
+        self.filter.zp_ab_f_lambda
+        self.filter.zp_vega_f_lambda
+
+    def time_calculate_ab_magnitude(self, n_spectrum_points):
+        calculate_ab_magnitude(self.spectrum, self.filter)
+
+    def time_calculate_vega_magnitude(self, n_spectrum_points):
+        calculate_vega_magnitude(self.spectrum, self.filter)
+
+
+class FilterSetMagnitudes(LocalFilterCache):
+    params = ([1000, 10000, 100000], [1, 10, 50])
+    param_names = ['n_spectrum_points', 'n_filters']
+
+    def get_n_filters(self, n_spectrum_points, n_filters):
+        return n_filters
+
+    def setup(self, n_spectrum_points, n_filters):
+        super(FilterSetMagnitudes, self).setup(n_spectrum_points, n_filters)
+        self.spectrum = make_spectrum(n_spectrum_points)
+        self.filter_set = FilterSet(self.filter_ids, cache_dir=self.cache_dir,
+                                    vega_fpath=self.vega_fpath)
+        for filter in self.filter_set:
+            filter.zp_ab_f_lambda
+            filter.zp_vega_f_lambda
+
+    def time_calculate_ab_magnitudes(self, n_spectrum_points, n_filters):
+        self.filter_set.calculate_ab_magnitudes(self.spectrum)
+
+    def time_calculate_vega_magnitudes(self, n_spectrum_points, n_filters):
+        self.filter_set.calculate_vega_magnitudes(self.spectrum)
+
+
+class BatchMagnitudes(LocalFilterCache):
+    params = ([100, 10000], [1, 10, 50])
+    param_names = ['n_spectra', 'n_filters']
+
+    def get_n_filters(self, n_spectra, n_filters):
+        return n_filters
+
+    def setup(self, n_spectra, n_filters):
+        super(BatchMagnitudes, self).setup(n_spectra, n_filters)
+        self.wavelength, self.flux = make_spectrum_arrays(
+            5000, n_spectra=n_spectra)
+        self.filter_set = FilterSet(self.filter_ids, cache_dir=self.cache_dir,
+                                    vega_fpath=self.vega_fpath)
+        self.filter_set.calculate_vega_magnitudes_batch(self.wavelength,
+                                                        self.flux[:1])
+
+    def time_calculate_vega_magnitudes_batch(self, n_spectra, n_filters):
+        self.filter_set.calculate_vega_magnitudes_batch(self.wavelength,
+                                                        self.flux)
+
+
+class BlackbodyMagnitudes(LocalFilterCache):
+    params = [100, 10000]
+    param_names = ['n_temperatures']
+    n_filters = 10
+
+    def setup(self, n_temperatures):
+        super(BlackbodyMagnitudes, self).setup(n_temperatures)
+        self.filter_set = FilterSet(self.filter_ids, cache_dir=self.cache_dir)
+        self.temperature = np.logspace(3, 5, n_temperatures)
+
+    def time_calculate_blackbody_magnitudes(self, n_temperatures):
+        self.filter_set.calculate_blackbody_magnitudes(
+            self.temperature, 1 * u.R_sun, dlambda=10)
+
+
+class ThreadedBatchMagnitudes(LocalFilterCache):
+    """Batch photometry called from several threads sharing one filter set,
+    each on its own block of spectra; scales with the threads as far as the
+    matrix products release the GIL"""
+    params = [1, 2, 4]
+    param_names = ['n_threads']
+    n_filters = 10
+
+    def setup(self, n_threads):
+        super(ThreadedBatchMagnitudes, self).setup(n_threads)
+        self.wavelength, flux = make_spectrum_arrays(5000, n_spectra=20000)
+        self.flux_blocks = np.array_split(flux, n_threads)
+        self.filter_set = FilterSet(self.filter_ids, cache_dir=self.cache_dir,
+                                    vega_fpath=self.vega_fpath)
+        self.calculate = partial(self.filter_set.calculate_ab_magnitudes_batch,
+                                 self.wavelength)
+        self.calculate(flux[:1])
+        self.pool = ThreadPoolExecutor(n_threads)
+
+    def teardown(self, n_threads):
+        self.pool.shutdown()
+        super(ThreadedBatchMagnitudes, self).teardown(n_threads)
+
+    def time_calculate_ab_magnitudes_batch(self, n_threads):
+        list(self.pool.map(self.calculate, self.flux_blocks))
@@ -0,0 +1,65 @@
+"""Benchmarks for pickling prepared filter sets"""
+import pickle
+
+import numpy as np
+
+from wsynphot import FilterSet
+from wsynphot.base import BaseFilterCurve
+
+from .common import LocalFilterCache
+
+
+def legacy_dumps(filter_set):
+    """Pickle the filters the way the default slot pickling did, with every
+    computed attribute (interp1d objects, Quantities); the interpolation
+    caches are left out as they are not picklable"""
+    filters = [(type(item), {name: getattr(item, name)
+                             for name in BaseFilterCurve.__slots__ +
+                             ('interpolation_object', 'lambda_pivot',
+                              'zp_ab_f_lambda', 'zp_vega_f_lambda')
+                             if not name.startswith('_') and
+                             hasattr(item, name)})
+               for item in filter_set]
+    return pickle.dumps(filters, protocol=pickle.HIGHEST_PROTOCOL)
+
+
+def legacy_loads(payload):
+    filters = []
+    for cls, state in pickle.loads(payload):
+        item = cls.__new__(cls)
+        for name, value in state.items():
+            setattr(item, name, value)
+        filters.append(item)
+    return FilterSet(filters)
+
+
+class PickleFilterSet(LocalFilterCache):
+    params = ([10, 50], ['compact', 'legacy'])
+    param_names = ['n_filters', 'method']
+    n_filter_points = 2000
+
+    def get_n_filters(self, n_filters, method):
+        return n_filters
+
+    def setup(self, n_filters, method):
+        super(PickleFilterSet, self).setup(n_filters, method)
+        self.filter_set = FilterSet(self.filter_ids, cache_dir=self.cache_dir,
+                                    vega_fpath=self.vega_fpath)
+        # prepare the filters like a photometry run does
+        self.filter_set.calculate_vega_magnitudes_batch(
+            np.linspace(2000, 12000, 5000), np.ones((1, 5000)))
+        for item in self.filter_set:
+            item.interpolation_object
+        if method == 'compact':
+            self.dumps = lambda filter_set: pickle.dumps(
+                filter_set, protocol=pickle.HIGHEST_PROTOCOL)
+            self.loads = pickle.loads
+        else:
+            self.dumps, self.loads = legacy_dumps, legacy_loads
+
+    def time_round_trip(self, n_filters, method):
+        self.loads(self.dumps(self.filter_set))
+
+    def track_payload_bytes(self, n_filters, method):
+        return len(self.dumps(self.filter_set))
+    track_payload_bytes.unit = 'bytes'
@@ -0,0 +1,12 @@
+"""Benchmarks for generating model spectra"""
+from astropy import units as u
+
+from wsynphot.spectrum1d import blackbody1d
+
+
+class Blackbody(object):
+    params = [10, 1, 0.1]
+    param_names = ['dlambda']
+
+    def time_blackbody1d(self, dlambda):
+        blackbody1d(5780 * u.K, 1 * u.R_sun, dlambda=dlambda)
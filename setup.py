@@ -100,6 +100,7 @@ setup(name=PACKAGENAME,
       version=VERSION,
       description=DESCRIPTION,
       scripts=scripts,
+      entry_points={'console_scripts': ['wsynphot = wsynphot.cli:main']},
       requires=['astropy'],
       install_requires=['astropy'],
       provides=[PACKAGENAME],
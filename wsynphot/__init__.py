@@ -16,7 +16,7 @@ import logging
 # For egg_info test builds to pass, put package imports here.
 if not _ASTROPY_SETUP_:
     from wsynphot.base import (BaseFilterCurve, FilterCurve, FilterSet,
-                               MagnitudeSet, list_filters)
+                               MagnitudeSet, MagnitudeCatalog, list_filters)
     from wsynphot.calibration import get_vega_calibration_spectrum
     from wsynphot.spectrum1d import SKSpectrum1D as Spectrum1D
     from wsynphot.data.base import (download_calibration_data, 
@@ -1,21 +1,37 @@
 # defining the base filter curve classes
 
 import os
+import sys
 import logging
+import numbers
+import weakref
+from functools import lru_cache, partial
 from scipy import interpolate
-from wsynphot.spectrum1d import SKSpectrum1D as Spectrum1D
+from wsynphot.spectrum1d import FLAM_UNIT, SKSpectrum1D as Spectrum1D
 import pandas as pd
-from wsynphot.io.cache_filters import DetectorType, load_local_filters_index, load_transmission_data
+from wsynphot.io.cache_filters import (CACHE_DIR, DetectorType,
+                                       load_local_filters_index,
+                                       load_transmission_data)
 
 
 
 from astropy import units as u, constants as const
 
-from astropy import utils
 import numpy as np
+from wsynphot.batch import (DEFAULT_CHUNK_SIZE, BatchPhotometry,
+                            calculate_blackbody_magnitudes)
 from wsynphot.calibration import get_vega_calibration_spectrum
+from wsynphot.executors import is_in_process, map_chunks
+from wsynphot.io.photometry_cache import get_photometry_cache
+from wsynphot.util.cache import LRUCache, array_fingerprint
+from wsynphot.util.profiling import count, timed, timer
+from wsynphot.util.properties import slot_lazyproperty
 logger = logging.getLogger(__name__)
 
+# wavelength grids shared between filters, see share_wavelength_grid()
+_wavelength_grids = weakref.WeakValueDictionary()
+
+@timed('calculate_filter_flux_density')
 def calculate_filter_flux_density(spectrum, filter):
     """
     Calculate the average flux through the filter by evaluating the integral
@@ -34,12 +50,13 @@ def calculate_filter_flux_density(spectrum, filter):
     """
 
     filtered_spectrum = filter * spectrum
-    if filter.detector_type == DetectorType.PHOTON_COUNTER:
-        filter_flux_density = np.trapz(filtered_spectrum.flux * filtered_spectrum.wavelength,
-                    filtered_spectrum.wavelength)
-    else:  # DetectorType.ENERGY_COUNTER
-        filter_flux_density = np.trapz(filtered_spectrum.flux,
-                                       filtered_spectrum.wavelength)
+    with timer('calculate_filter_flux_density.integration'):
+        if filter.detector_type == DetectorType.PHOTON_COUNTER:
+            filter_flux_density = np.trapz(filtered_spectrum.flux * filtered_spectrum.wavelength,
+                        filtered_spectrum.wavelength)
+        else:  # DetectorType.ENERGY_COUNTER
+            filter_flux_density = np.trapz(filtered_spectrum.flux,
+                                           filtered_spectrum.wavelength)
 
     return filter_flux_density
 
@@ -61,6 +78,85 @@ def calculate_ab_magnitude(spectrum, filter):
     return -2.5 * np.log10(filtered_f_lambda / filter.zp_ab_f_lambda)
 
 
+def share_wavelength_grid(wavelength):
+    """
+    Return a read-only wavelength Quantity that is shared with all other
+    filters having an identical wavelength grid.
+
+    Parameters
+    ----------
+
+    wavelength: ~astropy.units.Quantity
+        wavelength grid
+
+    Returns
+    -------
+        : ~astropy.units.Quantity
+        the shared grid, `wavelength` itself if no identical grid is in use
+    """
+    key = (wavelength.unit.to_string(), wavelength.dtype.str,
+           wavelength.shape, hash(wavelength.value.tobytes()))
+    shared_wavelength = _wavelength_grids.get(key)
+    if (shared_wavelength is not None and
+            np.array_equal(shared_wavelength.value, wavelength.value)):
+        return shared_wavelength
+    wavelength = wavelength.copy()
+    wavelength.flags.writeable = False
+    _wavelength_grids[key] = wavelength
+    return wavelength
+
+
+def _array_memory_blocks(obj, depth=2):
+    """
+    Yield (address, nbytes) of the numpy data buffers referenced by `obj`
+    and its attributes (up to `depth` levels), so that shared buffers can be
+    counted once
+    """
+    if isinstance(obj, np.ndarray):
+        base = obj
+        while isinstance(base.base, np.ndarray):
+            base = base.base
+        yield base.__array_interface__['data'][0], base.nbytes
+    elif depth > 0 and isinstance(getattr(obj, '__dict__', None), dict):
+        for value in list(vars(obj).values()):
+            yield from _array_memory_blocks(value, depth - 1)
+
+
+def _calculate_vega_zero_point(filter_data):
+    # builds a bare filter, so that only arrays are sent to other processes
+    (wavelength, transmission_lambda, detector_type, interpolation_kind,
+     vega_fpath) = filter_data
+    return FilterCurve(wavelength, transmission_lambda, detector_type,
+                       interpolation_kind=interpolation_kind,
+                       vega_fpath=vega_fpath).zp_vega_f_lambda.to_value(
+        FLAM_UNIT)
+
+
+# parsing and formatting units dominates unpickling small filters
+_parse_unit = lru_cache(maxsize=64)(u.Unit)
+
+
+@lru_cache(maxsize=64)
+def _format_unit(unit):
+    return unit.to_string()
+
+
+def _rebuild_filter_curve(cls, wavelength, wavelength_unit,
+                          transmission_lambda, detector_type,
+                          interpolation_kind, filter_id, vega_fpath,
+                          precomputed):
+    """Unpickle a filter curve, see `BaseFilterCurve.__reduce__`"""
+    filter = cls(u.Quantity(wavelength, _parse_unit(wavelength_unit),
+                            copy=False),
+                 transmission_lambda, DetectorType(detector_type),
+                 interpolation_kind=interpolation_kind, filter_id=filter_id,
+                 vega_fpath=vega_fpath)
+    for name, unit in cls.pickled_properties:
+        if name in precomputed:
+            setattr(filter, name, precomputed[name] * unit)
+    return filter
+
+
 def list_filters():
     """
     List available filters
@@ -84,12 +180,46 @@ class BaseFilterCurve(object):
     transmission_lambda: numpy.ndarray
         transmission_lambda for filter curve
 
+    detector_type: ~wsynphot.io.cache_filters.DetectorType
+        energy counter or photon counter
+
     interpolation_kind: str
         allowed interpolation kinds given in scipy.interpolate.interp1d
+
+    filter_id: str, optional
+        filter ID
+
+    vega_fpath: str, optional
+        Path of Vega calibration file to be used for calculating vega magnitudes
+
+    dtype: numpy.dtype, optional
+        dtype to store wavelength and transmission in, e.g. `numpy.float32`
+        to halve the memory footprint (default: keep the given dtype)
+
+    share_wavelength: bool, optional
+        share the wavelength array with other filters having an identical
+        wavelength grid; the array is made read-only (default: False)
     """
 
+    __slots__ = ('wavelength', 'transmission_lambda', 'detector_type',
+                 'interpolation_kind', 'filter_id', 'vega_fpath',
+                 '_interpolation_object', '_lambda_pivot',
+                 '_wavelength_start', '_wavelength_end', '_zp_ab_f_lambda',
+                 '_zp_ab_f_nu', '_zp_vega_f_lambda', '_interpolation_cache',
+                 '__weakref__')
+
+    # default number of wavelength grids each filter keeps the interpolated
+    # transmission for
+    interpolation_cache_size = 8
+
+    # lazily computed values that are kept when pickling, with their units
+    pickled_properties = (('lambda_pivot', u.angstrom),
+                          ('zp_ab_f_lambda', FLAM_UNIT),
+                          ('zp_vega_f_lambda', FLAM_UNIT))
+
     @classmethod
-    def load_filter(cls, filter_id=None, interpolation_kind='linear', vega_fpath=None):
+    def load_filter(cls, filter_id=None, interpolation_kind='linear', vega_fpath=None,
+                    cache_dir=CACHE_DIR, dtype=None, share_wavelength=False):
         """
 
         Parameters
@@ -103,13 +233,22 @@ class BaseFilterCurve(object):
         
         vega_fpath: str, optional
             Path of Vega calibration file to be used for calculating vega magnitudes
+
+        cache_dir: str, optional
+            Path of the directory where filter data is cached
+
+        dtype: numpy.dtype, optional
+            dtype to store wavelength and transmission in
+
+        share_wavelength: bool, optional
+            share identical wavelength grids between filters
         """
         if filter_id is None:
             return list_filters()
 
         else:
             transmission_data, detector_type = load_transmission_data(
-                filter_id)
+                filter_id, cache_dir)
             
             wavelength_unit = 'angstrom'
 
@@ -117,24 +256,78 @@ class BaseFilterCurve(object):
 
             return cls(wavelength, transmission_data['Transmission'].values, detector_type,
                        interpolation_kind=interpolation_kind,
-                       filter_id=filter_id, vega_fpath=vega_fpath)
+                       filter_id=filter_id, vega_fpath=vega_fpath,
+                       dtype=dtype, share_wavelength=share_wavelength)
 
+    @timed('FilterCurve.__init__')
     def __init__(self, wavelength, transmission_lambda, detector_type,
-                 interpolation_kind='linear', filter_id=None, vega_fpath=None):
+                 interpolation_kind='linear', filter_id=None, vega_fpath=None,
+                 dtype=None, share_wavelength=False):
         if not hasattr(wavelength, 'unit'):
             raise ValueError('the wavelength needs to be a astropy quantity')
+        if dtype is not None:
+            wavelength = wavelength.astype(dtype, copy=False)
+            transmission_lambda = np.asarray(transmission_lambda, dtype=dtype)
+        if share_wavelength:
+            wavelength = share_wavelength_grid(wavelength)
         self.wavelength = wavelength
         self.transmission_lambda = transmission_lambda
         self.detector_type = detector_type
-
-        self.interpolation_object = interpolate.interp1d(self.wavelength,
-                                                         self.transmission_lambda,
-                                                         kind=interpolation_kind,
-                                                         bounds_error=False,
-                                                         fill_value=0.0)
+        self.interpolation_kind = interpolation_kind
         self.filter_id = filter_id
         self.vega_fpath = vega_fpath
 
+    def __reduce__(self):
+        """
+        Pickle as the raw curve arrays plus the pivot wavelength and zero
+        points computed so far; interpolation objects and caches are
+        rebuilt lazily after unpickling
+        """
+        precomputed = {name: getattr(self, name).to_value(unit)
+                       for name, unit in self.pickled_properties
+                       if getattr(type(self), name).is_set(self)}
+        return (_rebuild_filter_curve,
+                (type(self), np.asarray(self.wavelength.value),
+                 _format_unit(self.wavelength.unit),
+                 np.asarray(self.transmission_lambda),
+                 int(self.detector_type), self.interpolation_kind,
+                 self.filter_id, self.vega_fpath, precomputed))
+
+    @slot_lazyproperty
+    def interpolation_object(self):
+        """
+        interp1d of the transmission, only built on first use since it copies
+        the wavelength and transmission arrays
+        """
+        with timer('FilterCurve.interp1d_construction'):
+            return interpolate.interp1d(self.wavelength,
+                                        self.transmission_lambda,
+                                        kind=self.interpolation_kind,
+                                        bounds_error=False,
+                                        fill_value=0.0)
+
+    def _memory_blocks(self):
+        yield from _array_memory_blocks(self.wavelength)
+        yield from _array_memory_blocks(self.transmission_lambda)
+        if type(self).interpolation_object.is_set(self):
+            yield from _array_memory_blocks(self.interpolation_object)
+        if type(self).interpolation_cache.is_set(self):
+            for transmission in self.interpolation_cache.values():
+                yield from _array_memory_blocks(transmission)
+
+    def memory_usage(self):
+        """
+        Number of bytes held by the filter: its wavelength and transmission
+        arrays, the interpolator (if built), the interpolation cache and the
+        instance itself
+
+        Returns
+        -------
+            : int
+        """
+        blocks = dict(self._memory_blocks())
+        return sys.getsizeof(self) + sum(blocks.values())
+
 
     def __mul__(self, other):
         if not hasattr(other, 'flux') or not hasattr(other, 'wavelength'):
@@ -151,7 +344,7 @@ class BaseFilterCurve(object):
         return self.__mul__(other)
 
 
-    @utils.lazyproperty
+    @slot_lazyproperty
     def lambda_pivot(self):
         """
         Calculate the pivotal wavelength as defined as equation A16 in 
@@ -176,37 +369,42 @@ class BaseFilterCurve(object):
                 )
         
 
-    @utils.lazyproperty
+    @slot_lazyproperty
     def wavelength_start(self):
         return self.get_wavelength_start()
 
 
-    @utils.lazyproperty
+    @slot_lazyproperty
     def wavelength_end(self):
         return self.get_wavelength_end()
 
-    @utils.lazyproperty
+    @slot_lazyproperty
     def zp_ab_f_lambda(self):
         return (self.zp_ab_f_nu * const.c / self.lambda_pivot**2).to(
             'erg/s/cm^2/Angstrom', u.spectral())
 
-    @utils.lazyproperty
+    @slot_lazyproperty
     def zp_ab_f_nu(self):
         return (3631 * u.Jy).to('erg/s/cm^2/Hz')
 
 
 
-    @utils.lazyproperty
+    @slot_lazyproperty
     def zp_vega_f_lambda(self):
-        return (calculate_filter_flux_density(
-            get_vega_calibration_spectrum(self.vega_fpath), self
-        ) / self.calculate_wavelength_delta())
+        with timer('FilterCurve.zp_vega_f_lambda'):
+            return (calculate_filter_flux_density(
+                get_vega_calibration_spectrum(self.vega_fpath), self
+            ) / self.calculate_wavelength_delta())
 
 
+    @timed('FilterCurve.interpolate')
     def interpolate(self, wavelength):
         """
         Interpolate the filter onto new wavelength grid
 
+        The result is cached (see `interpolation_cache`), repeated calls with
+        the same grid return the same read-only array.
+
         Parameters
         ----------
 
@@ -215,9 +413,36 @@ class BaseFilterCurve(object):
 
         """
 
-        converted_wavelength = wavelength.to(self.wavelength.unit)
+        cache = self.interpolation_cache
+        if cache.maxsize <= 0:
+            return self._interpolate(wavelength)
+
+        key = array_fingerprint(wavelength)
+        transmission = cache.get(key)
+        if transmission is None:
+            transmission = self._interpolate(wavelength)
+            transmission.flags.writeable = False
+            cache.put(key, transmission)
+        else:
+            count('FilterCurve.interpolate.cache_hit')
+        return transmission
+
+    def _interpolate(self, wavelength):
+        with timer('FilterCurve.interpolate.unit_conversion'):
+            converted_wavelength = wavelength.to(self.wavelength.unit)
         return self.interpolation_object(converted_wavelength)
 
+    @slot_lazyproperty
+    def interpolation_cache(self):
+        """
+        LRU cache of the transmission interpolated onto the most recently
+        requested wavelength grids, keyed by a fingerprint of the grid.
+        Its size defaults to `interpolation_cache_size`, use
+        ``interpolation_cache.resize`` to change it and
+        ``interpolation_cache.info()`` for statistics.
+        """
+        return LRUCache(self.interpolation_cache_size)
+
     def _calculuate_flux_density(self, wavelength, flux):
         return _calculcate_filter_flux_density(flux, self)
 
@@ -317,6 +542,8 @@ class BaseFilterCurve(object):
 
 
 class FilterCurve(BaseFilterCurve):
+    __slots__ = ()
+
     def __repr__(self):
         if self.filter_id is None:
             filter_id = "{0:x}".format(self.__hash__())
@@ -344,33 +571,62 @@ class FilterSet(object):
     vega_fpath: str, optional
         Path of Vega calibration file to be used for calculating vega magnitudes
 
+    cache_dir: str, optional
+        Path of the directory where filter data is cached
+
+    dtype: numpy.dtype, optional
+        dtype to store wavelength and transmission of loaded filters in
+
+    share_wavelength: bool, optional
+        share identical wavelength grids between loaded filters
+
+    executor: str or object, optional
+        where the filters are loaded, see `~wsynphot.executors` (default:
+        serially in the calling thread)
+
+    n_workers: int, optional
+        number of workers of a new executor pool
+
     """
 
-    def __init__(self, filter_set, interpolation_kind='linear', vega_fpath=None):
+    def __init__(self, filter_set, interpolation_kind='linear', vega_fpath=None,
+                 cache_dir=CACHE_DIR, dtype=None, share_wavelength=False,
+                 executor=None, n_workers=None):
 
         if hasattr(filter_set[0], 'wavelength'):
             self.filter_set = filter_set
         else:
-            self.filter_set = [FilterCurve.load_filter(filter_id,
-                                                       interpolation_kind=interpolation_kind,
-                                                       vega_fpath=vega_fpath)
-                               for filter_id in filter_set]
+            load_filter = partial(FilterCurve.load_filter,
+                                  interpolation_kind=interpolation_kind,
+                                  vega_fpath=vega_fpath, cache_dir=cache_dir,
+                                  dtype=dtype,
+                                  share_wavelength=share_wavelength)
+            self.filter_set = map_chunks(load_filter, filter_set, executor,
+                                         n_workers)
+            if share_wavelength and not is_in_process(executor):
+                # filters from other processes share grids only there
+                for item in self.filter_set:
+                    item.wavelength = share_wavelength_grid(item.wavelength)
+        self._batch_photometry = LRUCache(4)
 
 
 
     def __iter__(self):
-        self.current_filter_idx = 0
-        return self
+        # a fresh iterator each time, so threads can iterate concurrently
+        return iter(self.filter_set)
 
-    def __next__(self):
-        try:
-            item = self.filter_set[self.current_filter_idx]
-        except IndexError:
-            raise StopIteration
+    def __len__(self):
+        return len(self.filter_set)
 
-        self.current_filter_idx += 1
-        return item
-    next = __next__
+    def __getstate__(self):
+        # batch photometry engines are rebuilt on demand
+        state = self.__dict__.copy()
+        del state['_batch_photometry']
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self._batch_photometry = LRUCache(4)
 
 
     def __getitem__(self, item):
@@ -387,6 +643,44 @@ class FilterSet(object):
     def lambda_pivot(self):
         return u.Quantity([item.lambda_pivot for item in self])
 
+    def interpolation_cache_info(self):
+        """
+        Statistics of the interpolation caches of all filters
+
+        Returns
+        -------
+            : pandas.DataFrame
+            one row of `~wsynphot.util.cache.CacheInfo` per filter ID
+        """
+        return pd.DataFrame([item.interpolation_cache.info()
+                             for item in self.filter_set],
+                            index=[item.filter_id for item in self.filter_set])
+
+    def clear_interpolation_caches(self):
+        for item in self.filter_set:
+            item.interpolation_cache.clear()
+
+    def memory_usage(self):
+        """
+        Number of bytes held by each filter and by the whole set
+
+        Returns
+        -------
+            : pandas.Series
+            bytes per filter ID, with a final 'Total' entry that counts
+            wavelength grids shared between filters only once
+        """
+        usage = pd.Series([item.memory_usage() for item in self.filter_set],
+                          index=[item.filter_id for item in self.filter_set],
+                          name='bytes')
+        blocks = {}
+        for item in self.filter_set:
+            blocks.update(item._memory_blocks())
+        total = (sys.getsizeof(self.filter_set) + sum(blocks.values()) +
+                 sum(sys.getsizeof(item) for item in self.filter_set))
+        return pd.concat([usage, pd.Series([total], index=['Total'],
+                                           name='bytes')])
+
     def calculate_f_lambda(self, spectrum):
         return u.Quantity(
             [item.calculate_f_lambda(spectrum) for item in self.filter_set])
@@ -401,63 +695,263 @@ class FilterSet(object):
                 for item in self.filter_set]
         return mags
 
-    def convert_ab_magnitudes_to_f_lambda(self, magnitudes):
-        if len(magnitudes) != len(self.filter_set):
-            raise ValueError("Filter set and magnitudes need to have the same "
-                             "number of items")
-        f_lambdas = [filter.convert_ab_magnitude_to_f_lambda(mag)
-                     for filter, mag in zip(self.filter_set, magnitudes)]
-        return u.Quantity(f_lambdas)
+    def get_batch_photometry(self, wavelength):
+        """
+        Photometry engine for many spectra on the wavelength grid
+        `wavelength`; engines of recently used grids are reused
 
+        Parameters
+        ----------
 
-    def convert_ab_magnitude_uncertainties_to_f_lambda_uncertainties(
-            self, magnitudes, magnitude_uncertainties):
+        wavelength: ~astropy.units.Quantity or numpy.ndarray
+            wavelength grid (plain arrays are in Angstrom)
 
-        if len(magnitudes) != len(self.filter_set):
-            raise ValueError("Filter set and magnitudes need to have the same "
-                             "number of items")
-        f_lambda_positive_uncertainties = u.Quantity(
-            [filter.convert_ab_magnitude_to_f_lambda(mag +  mag_uncertainty)
-                     for filter, mag, mag_uncertainty in zip(
-                self.filter_set, magnitudes, magnitude_uncertainties, )])
+        Returns
+        -------
+            : ~wsynphot.batch.BatchPhotometry
+        """
+        key = array_fingerprint(wavelength)
+        photometry = self._batch_photometry.get(key)
+        if photometry is None:
+            photometry = BatchPhotometry(self, wavelength)
+            self._batch_photometry.put(key, photometry)
+        return photometry
+
+    def _calculate_batch(self, wavelength, flux, magnitude_system,
+                         chunk_size, cache, executor=None, n_workers=None):
+        """f_lambda and magnitudes of a batch, served from `cache` where
+        possible"""
+        photometry = self.get_batch_photometry(wavelength)
+        cache = get_photometry_cache(cache)
+        if cache is None or np.ndim(flux) != 2:
+            f_lambda = photometry.calculate_f_lambda(flux, chunk_size,
+                                                     executor, n_workers)
+            return f_lambda, photometry.convert_f_lambda_to_magnitudes(
+                f_lambda, photometry.get_zero_points(magnitude_system))
+        return cache.calculate(photometry, flux, magnitude_system,
+                               chunk_size, executor, n_workers)
+
+    def calculate_f_lambda_batch(self, wavelength, flux,
+                                 chunk_size=DEFAULT_CHUNK_SIZE, cache=None,
+                                 executor=None, n_workers=None):
+        """
+        Average flux densities of many spectra sharing a wavelength grid
 
-        f_lambda_negative_uncertainties = u.Quantity(
-            [filter.convert_ab_magnitude_to_f_lambda(mag -  mag_uncertainty)
-                     for filter, mag, mag_uncertainty in zip(
-                self.filter_set, magnitudes, magnitude_uncertainties)])
+        Parameters
+        ----------
 
-        return np.abs(u.Quantity((f_lambda_positive_uncertainties,
-                f_lambda_negative_uncertainties))
-                      -  self.convert_ab_magnitudes_to_f_lambda(magnitudes))
+        wavelength: ~astropy.units.Quantity or numpy.ndarray
+            (n_wavelength,) grid (plain arrays are in Angstrom)
 
-    def convert_vega_magnitude_uncertainties_to_f_lambda_uncertainties(
-            self, magnitudes, magnitude_uncertainties):
+        flux: ~astropy.units.Quantity or numpy.ndarray
+            (n_spectra, n_wavelength) fluxes (plain arrays are in
+            erg/s/cm^2/Angstrom)
+
+        chunk_size: int, optional
+            number of spectra processed at once
+
+        cache: ~wsynphot.io.photometry_cache.PhotometryCache, str or bool
+            persistent photometry cache (True for the default one), only
+            spectra not in the cache are computed
+
+        executor: str or object, optional
+            where the chunks are computed, see `~wsynphot.executors`
+            (default: serially in the calling thread)
+
+        n_workers: int, optional
+            number of workers of a new executor pool
+
+        Returns
+        -------
+            : ~astropy.units.Quantity
+            (n_spectra, n_filters) flux densities
+        """
+        if get_photometry_cache(cache) is None:
+            f_lambda = self.get_batch_photometry(
+                wavelength).calculate_f_lambda(flux, chunk_size, executor,
+                                               n_workers)
+        else:
+            f_lambda = self._calculate_batch(wavelength, flux, 'ab',
+                                             chunk_size, cache, executor,
+                                             n_workers)[0]
+        return u.Quantity(f_lambda, 'erg/s/cm^2/Angstrom')
+
+    def calculate_ab_magnitudes_batch(self, wavelength, flux,
+                                      chunk_size=DEFAULT_CHUNK_SIZE,
+                                      cache=None, executor=None,
+                                      n_workers=None):
+        """
+        AB magnitudes of many spectra sharing a wavelength grid as
+        (n_spectra, n_filters) array, see `calculate_f_lambda_batch`
+        """
+        return self._calculate_batch(wavelength, flux, 'ab', chunk_size,
+                                     cache, executor, n_workers)[1]
+
+    def calculate_vega_magnitudes_batch(self, wavelength, flux,
+                                        chunk_size=DEFAULT_CHUNK_SIZE,
+                                        cache=None, executor=None,
+                                        n_workers=None):
+        """
+        Vega magnitudes of many spectra sharing a wavelength grid as
+        (n_spectra, n_filters) array, see `calculate_f_lambda_batch`
+        """
+        return self._calculate_batch(wavelength, flux, 'vega', chunk_size,
+                                     cache, executor, n_workers)[1]
+
+    def calculate_blackbody_magnitudes(self, temperature, radius,
+                                       distance=10 * u.pc,
+                                       magnitude_system='ab', **kwargs):
+        """
+        Magnitudes of blackbodies for a grid of temperatures (and radii)
+        as (n_temperature, n_filters) DataFrame indexed by temperature
+
+        Parameters
+        ----------
+
+        temperature: numpy.ndarray or astropy.units.Quantity
+            blackbody temperatures (plain arrays in Kelvin)
 
-        if len(magnitudes) != len(self.filter_set):
+        radius: astropy.units.Quantity
+            radius of the blackbody, either a scalar or one per temperature
+
+        distance: astropy.units.Quantity, optional
+            distance of the blackbody source (default is 10 pc)
+
+        magnitude_system: str, optional
+            'ab' or 'vega'
+
+        kwargs:
+            wavelength grid and `chunk_size`, see
+            `~wsynphot.batch.calculate_blackbody_magnitudes`
+        """
+        return calculate_blackbody_magnitudes(
+            self, temperature, radius, distance=distance,
+            magnitude_system=magnitude_system, **kwargs)
+
+    @property
+    def zp_ab_f_lambda(self):
+        """(n_filters,) AB zero points"""
+        return u.Quantity([item.zp_ab_f_lambda.to_value(FLAM_UNIT)
+                           for item in self.filter_set], FLAM_UNIT)
+
+    @property
+    def zp_vega_f_lambda(self):
+        """(n_filters,) Vega zero points"""
+        return u.Quantity([item.zp_vega_f_lambda.to_value(FLAM_UNIT)
+                           for item in self.filter_set], FLAM_UNIT)
+
+    def calculate_zero_points(self, magnitude_system='vega', executor=None,
+                              n_workers=None):
+        """
+        Zero points of all filters
+
+        Vega zero points not computed yet (one integral over the Vega
+        spectrum per filter) are computed with `executor` and kept on the
+        filters.
+
+        Parameters
+        ----------
+
+        magnitude_system: str, optional
+            'ab' or 'vega'
+
+        executor: str or object, optional
+            see `~wsynphot.executors`
+
+        n_workers: int, optional
+            number of workers of a new executor pool
+
+        Returns
+        -------
+            : ~astropy.units.Quantity
+            (n_filters,) zero points
+        """
+        if magnitude_system not in ('ab', 'vega'):
+            raise ValueError("magnitude_system needs to be 'ab' or 'vega', "
+                             "not {0!r}".format(magnitude_system))
+        if magnitude_system == 'ab':
+            return self.zp_ab_f_lambda
+        missing = [item for item in self.filter_set
+                   if not type(item).zp_vega_f_lambda.is_set(item)]
+        zero_points = map_chunks(
+            _calculate_vega_zero_point,
+            [(item.wavelength, item.transmission_lambda, item.detector_type,
+              item.interpolation_kind, item.vega_fpath) for item in missing],
+            executor, n_workers)
+        for item, zero_point in zip(missing, zero_points):
+            item.zp_vega_f_lambda = zero_point * FLAM_UNIT
+        return self.zp_vega_f_lambda
+
+    def _check_magnitudes(self, magnitudes):
+        if np.shape(magnitudes)[-1:] != (len(self.filter_set),):
             raise ValueError("Filter set and magnitudes need to have the same "
                              "number of items")
-        f_lambda_positive_uncertainties = u.Quantity(
-            [filter.convert_vega_magnitude_to_f_lambda(mag +  mag_uncertainty)
-                     for filter, mag, mag_uncertainty in zip(
-                self.filter_set, magnitudes, magnitude_uncertainties, )])
+        return np.asarray(magnitudes, dtype=np.float64)
+
+    def _convert_magnitudes_to_f_lambda(self, magnitudes, zero_points):
+        return 10**(-0.4 * self._check_magnitudes(magnitudes)) * zero_points
+
+    def _convert_magnitude_uncertainties_to_f_lambda_uncertainties(
+            self, magnitudes, magnitude_uncertainties, zero_points):
+        magnitudes = self._check_magnitudes(magnitudes)
+        magnitude_uncertainties = np.asarray(magnitude_uncertainties)
+        f_lambda = self._convert_magnitudes_to_f_lambda(magnitudes,
+                                                        zero_points)
+        return np.abs(u.Quantity((
+            self._convert_magnitudes_to_f_lambda(
+                magnitudes + magnitude_uncertainties, zero_points),
+            self._convert_magnitudes_to_f_lambda(
+                magnitudes - magnitude_uncertainties, zero_points)))
+                      - f_lambda)
 
-        f_lambda_negative_uncertainties = u.Quantity(
-            [filter.convert_vega_magnitude_to_f_lambda(mag -  mag_uncertainty)
-                     for filter, mag, mag_uncertainty in zip(
-                self.filter_set, magnitudes, magnitude_uncertainties)])
+    def convert_ab_magnitudes_to_f_lambda(self, magnitudes):
+        """
+        Flux densities of AB magnitudes
 
-        return np.abs(u.Quantity((f_lambda_positive_uncertainties,
-                                  f_lambda_negative_uncertainties))
-                      -  self.convert_vega_magnitudes_to_f_lambda(magnitudes))
+        Parameters
+        ----------
+        magnitudes : numpy.ndarray
+            (..., n_filters) magnitudes, e.g. one row per object
 
+        Returns
+        -------
+        ~astropy.units.Quantity
+            (..., n_filters) flux densities
+        """
+        return self._convert_magnitudes_to_f_lambda(magnitudes,
+                                                    self.zp_ab_f_lambda)
+
+    def convert_ab_magnitude_uncertainties_to_f_lambda_uncertainties(
+            self, magnitudes, magnitude_uncertainties):
+        """
+        Upper and lower flux density uncertainties of AB magnitudes
+
+        Returns
+        -------
+        ~astropy.units.Quantity
+            (2, ..., n_filters) positive and negative uncertainties
+        """
+        return self._convert_magnitude_uncertainties_to_f_lambda_uncertainties(
+            magnitudes, magnitude_uncertainties, self.zp_ab_f_lambda)
+
+    def convert_vega_magnitude_uncertainties_to_f_lambda_uncertainties(
+            self, magnitudes, magnitude_uncertainties):
+        """
+        Upper and lower flux density uncertainties of Vega magnitudes
+
+        Returns
+        -------
+        ~astropy.units.Quantity
+            (2, ..., n_filters) positive and negative uncertainties
+        """
+        return self._convert_magnitude_uncertainties_to_f_lambda_uncertainties(
+            magnitudes, magnitude_uncertainties, self.zp_vega_f_lambda)
 
     def convert_vega_magnitudes_to_f_lambda(self, magnitudes):
-        if len(magnitudes) != len(self.filter_set):
-            raise ValueError("Filter set and magnitudes need to have the same "
-                             "number of items")
-        f_lambdas = [filter.convert_vega_magnitude_to_f_lambda(mag)
-                     for filter, mag in zip(self.filter_set, magnitudes)]
-        return u.Quantity(f_lambdas)
+        """Flux densities of (..., n_filters) Vega magnitudes, see
+        `convert_ab_magnitudes_to_f_lambda`"""
+        return self._convert_magnitudes_to_f_lambda(magnitudes,
+                                                    self.zp_vega_f_lambda)
 
     def plot_spectrum(self, spectrum, ax, make_labels=True,
                       spectrum_plot_kwargs={}, filter_plot_kwargs={},
@@ -487,7 +981,9 @@ class MagnitudeSet(FilterSet):
                                            interpolation_kind=
                                            interpolation_kind)
         self.magnitudes = np.array(magnitudes)
-        self.magnitude_uncertainties = np.array(magnitude_uncertainties)
+        if magnitude_uncertainties is not None:
+            magnitude_uncertainties = np.array(magnitude_uncertainties)
+        self.magnitude_uncertainties = magnitude_uncertainties
 
     def __repr__(self):
         mag_str = '{0} {1:.4f} +/- {2:.4f}'
@@ -500,3 +996,203 @@ class MagnitudeSet(FilterSet):
 
         return "<{0} \n{1}>".format(self.__class__.__name__,
                                     '\n'.join(mag_data))
+
+
+class MagnitudeCatalog(FilterSet):
+    """
+    Magnitudes of many objects in a set of filters, stored as columns
+
+    Parameters
+    ----------
+
+    filter_set: ~list
+        a list of strings or a list of filters
+
+    magnitudes: ~numpy.ndarray
+        (n_objects, n_filters) magnitudes, NaN marks missing values
+
+    magnitude_uncertainties: ~numpy.ndarray, optional
+        (n_objects, n_filters) uncertainties
+
+    magnitude_system: str, optional
+        'ab' or 'vega'
+
+    index: ~pandas.Index or list, optional
+        labels of the objects
+
+    All other keyword arguments are passed to `FilterSet`
+    """
+
+    def __init__(self, filter_set, magnitudes, magnitude_uncertainties=None,
+                 magnitude_system='ab', index=None, **kwargs):
+        super(MagnitudeCatalog, self).__init__(filter_set, **kwargs)
+        if magnitude_system not in ('ab', 'vega'):
+            raise ValueError("magnitude_system needs to be 'ab' or 'vega', "
+                             "not {0!r}".format(magnitude_system))
+        self.magnitude_system = magnitude_system
+        self.magnitudes = np.atleast_2d(self._check_magnitudes(magnitudes))
+        if magnitude_uncertainties is not None:
+            magnitude_uncertainties = np.broadcast_to(
+                np.asarray(magnitude_uncertainties, dtype=np.float64),
+                self.magnitudes.shape)
+        self.magnitude_uncertainties = magnitude_uncertainties
+        self.index = index
+
+    @classmethod
+    def from_dataframe(cls, dataframe, filter_set, magnitude_columns=None,
+                       uncertainty_columns=None, **kwargs):
+        """
+        Catalogue from the columns of a DataFrame
+
+        Parameters
+        ----------
+
+        dataframe: ~pandas.DataFrame
+
+        filter_set: ~list or FilterSet
+
+        magnitude_columns: list of str, optional
+            columns of the magnitudes in the order of the filters (default:
+            the filter IDs)
+
+        uncertainty_columns: list of str or str, optional
+            columns of the uncertainties, or a format string applied to each
+            magnitude column (e.g. '{0}_err')
+
+        Returns
+        -------
+            : MagnitudeCatalog
+        """
+        if not isinstance(filter_set, FilterSet):
+            filter_set = FilterSet(filter_set)
+        if magnitude_columns is None:
+            magnitude_columns = [item.filter_id for item in filter_set]
+        if isinstance(uncertainty_columns, str):
+            uncertainty_columns = [uncertainty_columns.format(column)
+                                   for column in magnitude_columns]
+        magnitude_uncertainties = None
+        if uncertainty_columns is not None:
+            magnitude_uncertainties = dataframe[uncertainty_columns].to_numpy(
+                dtype=np.float64)
+        return cls(filter_set.filter_set,
+                   dataframe[magnitude_columns].to_numpy(dtype=np.float64),
+                   magnitude_uncertainties, index=dataframe.index, **kwargs)
+
+    def __repr__(self):
+        return "<{0} {1} objects x {2} filters ({3})>".format(
+            self.__class__.__name__, self.n_objects, len(self.filter_set),
+            self.magnitude_system)
+
+    @property
+    def n_objects(self):
+        return len(self.magnitudes)
+
+    @property
+    def filter_ids(self):
+        return [item.filter_id for item in self.filter_set]
+
+    @property
+    def zero_points(self):
+        """(n_filters,) zero points of the magnitude system"""
+        return getattr(self, 'zp_{0}_f_lambda'.format(self.magnitude_system))
+
+    @property
+    def f_lambda(self):
+        """(n_objects, n_filters) flux densities"""
+        return self._convert_magnitudes_to_f_lambda(self.magnitudes,
+                                                    self.zero_points)
+
+    @property
+    def f_lambda_uncertainties(self):
+        """(2, n_objects, n_filters) positive and negative flux density
+        uncertainties"""
+        if self.magnitude_uncertainties is None:
+            raise ValueError('Catalogue has no magnitude uncertainties')
+        return self._convert_magnitude_uncertainties_to_f_lambda_uncertainties(
+            self.magnitudes, self.magnitude_uncertainties, self.zero_points)
+
+    def convert_to_magnitude_system(self, magnitude_system):
+        """
+        Same catalogue in another magnitude system
+
+        Parameters
+        ----------
+        magnitude_system : str
+            'ab' or 'vega'
+
+        Returns
+        -------
+        MagnitudeCatalog
+        """
+        catalog = MagnitudeCatalog(self.filter_set, self.magnitudes,
+                                   self.magnitude_uncertainties,
+                                   magnitude_system=magnitude_system,
+                                   index=self.index)
+        offset = -2.5 * np.log10((self.zero_points /
+                                  catalog.zero_points).to_value(
+            u.dimensionless_unscaled))
+        catalog.magnitudes = self.magnitudes + offset
+        return catalog
+
+    def _get_color_indices(self, filter_pairs):
+        if filter_pairs is None:
+            n_filters = len(self.filter_set)
+            return np.arange(n_filters - 1), np.arange(1, n_filters)
+        filter_ids = self.filter_ids
+        first, second = zip(*[
+            [item if isinstance(item, numbers.Integral)
+             else filter_ids.index(item)
+             for item in pair] for pair in filter_pairs])
+        return np.array(first), np.array(second)
+
+    def calculate_colors(self, filter_pairs=None):
+        """
+        Colours of all objects
+
+        Parameters
+        ----------
+        filter_pairs : list of tuple, optional
+            pairs of filter IDs or indices (default: consecutive filters)
+
+        Returns
+        -------
+        numpy.ndarray
+            (n_objects, n_pairs) colours
+        """
+        first, second = self._get_color_indices(filter_pairs)
+        return self.magnitudes[:, first] - self.magnitudes[:, second]
+
+    def calculate_color_uncertainties(self, filter_pairs=None):
+        """(n_objects, n_pairs) uncertainties of `calculate_colors`"""
+        if self.magnitude_uncertainties is None:
+            raise ValueError('Catalogue has no magnitude uncertainties')
+        first, second = self._get_color_indices(filter_pairs)
+        return np.hypot(self.magnitude_uncertainties[:, first],
+                        self.magnitude_uncertainties[:, second])
+
+    def get_magnitude_set(self, idx):
+        """Observations of object number `idx` as `MagnitudeSet`"""
+        return MagnitudeSet(
+            self.filter_set, self.magnitudes[idx],
+            None if self.magnitude_uncertainties is None
+            else self.magnitude_uncertainties[idx])
+
+    def to_dataframe(self, uncertainty_format='{0}_err'):
+        """
+        Magnitudes (and uncertainties) as DataFrame
+
+        Parameters
+        ----------
+        uncertainty_format : str, optional
+            format of the uncertainty column names
+        """
+        filter_ids = self.filter_ids
+        dataframe = pd.DataFrame(self.magnitudes, columns=filter_ids,
+                                 index=self.index)
+        if self.magnitude_uncertainties is not None:
+            uncertainties = pd.DataFrame(
+                self.magnitude_uncertainties, index=dataframe.index,
+                columns=[uncertainty_format.format(item)
+                         for item in filter_ids])
+            dataframe = pd.concat([dataframe, uncertainties], axis=1)
+        return dataframe
@@ -0,0 +1,360 @@
+"""Synthetic photometry of many spectra sharing a wavelength grid
+
+For a fixed wavelength grid, the average flux density through a filter is a
+weighted sum over the flux of a spectrum
+
+.. math::
+
+    f_\\lambda = \\frac{\\int S(\\lambda) F(\\lambda) \\lambda^n d\\lambda}
+    {\\int S(\\lambda) \\lambda^n d\\lambda} = \\sum_j w_j F(\\lambda_j)
+
+with :math:`n = 1` for photon counters and :math:`n = 0` for energy counters.
+`BatchPhotometry` precomputes the weights of all filters of a
+`~wsynphot.FilterSet` once, so the photometry of a whole block of spectra is a
+single matrix product on plain numpy arrays.
+"""
+from functools import partial
+import threading
+
+import numpy as np
+import pandas as pd
+from astropy import units as u
+
+from wsynphot.executors import get_chunks, map_chunks
+from wsynphot.io.cache_filters import DetectorType
+from wsynphot.spectrum1d import FLAM_UNIT, blackbody_lambda_grid
+from wsynphot.util.profiling import timed
+
+# default number of spectra processed at once, bounding the temporary memory
+DEFAULT_CHUNK_SIZE = 1000
+
+
+def trapezoid_weights(x):
+    """
+    Weights `w` such that ``np.trapz(y, x) == np.dot(y, w)``
+
+    Parameters
+    ----------
+    x : numpy.ndarray
+        sample points
+
+    Returns
+    -------
+    numpy.ndarray
+    """
+    x = np.asarray(x, dtype=np.float64)
+    dx = np.diff(x)
+    weights = np.zeros_like(x)
+    weights[:-1] += dx / 2.
+    weights[1:] += dx / 2.
+    return weights
+
+
+def to_angstrom(wavelength):
+    """Wavelength as float64 array in Angstrom, plain arrays are assumed to
+    be in Angstrom already"""
+    if hasattr(wavelength, 'unit'):
+        return wavelength.to_value(u.angstrom, u.spectral()).astype(
+            np.float64, copy=False)
+    return np.asarray(wavelength, dtype=np.float64)
+
+
+def to_f_lambda(flux, wavelength):
+    """Flux as array in erg/s/cm^2/Angstrom, plain arrays are assumed to be
+    in these units already
+
+    Parameters
+    ----------
+    flux : numpy.ndarray or ~astropy.units.Quantity
+    wavelength : numpy.ndarray
+        wavelength in Angstrom, used for converting f_nu
+    """
+    if hasattr(flux, 'unit'):
+        return flux.to_value(FLAM_UNIT,
+                             u.spectral_density(wavelength * u.angstrom))
+    return np.asarray(flux)
+
+
+def filter_weights(filter, wavelength):
+    """
+    Weights of a filter on a wavelength grid, such that the average flux
+    density through the filter is ``np.dot(flux, weights)``
+
+    Parameters
+    ----------
+    filter : ~wsynphot.FilterCurve
+    wavelength : numpy.ndarray
+        wavelength grid in Angstrom
+
+    Returns
+    -------
+    numpy.ndarray
+    """
+    transmission = filter.interpolate(wavelength * u.angstrom)
+    weights = transmission * trapezoid_weights(wavelength)
+    if filter.detector_type == DetectorType.PHOTON_COUNTER:
+        weights = weights * wavelength
+        wavelength_delta = filter.calculate_wavelength_delta().to_value(
+            u.angstrom**2)
+    else:  # DetectorType.ENERGY_COUNTER
+        wavelength_delta = filter.calculate_wavelength_delta().to_value(
+            u.angstrom)
+    return weights / wavelength_delta
+
+
+def _calculate_f_lambda_chunk(flux, wavelength, weights):
+    # module level, so that process and dask executors can pickle it
+    return np.dot(to_f_lambda(flux, wavelength), weights.T)
+
+
+class BatchPhotometry(object):
+    """
+    Photometry of many spectra on a common wavelength grid through a filter
+    set
+
+    Parameters
+    ----------
+
+    filter_set: ~wsynphot.FilterSet
+        filters to calculate the photometry for
+
+    wavelength: ~astropy.units.Quantity or numpy.ndarray
+        wavelength grid of the spectra (plain arrays are in Angstrom)
+
+    Instances can be shared between threads; the weights and zero points are
+    computed once, on first use.
+    """
+
+    def __init__(self, filter_set, wavelength):
+        self.filter_set = filter_set
+        self.wavelength = to_angstrom(wavelength)
+        self._weights = None
+        self._zp_ab_f_lambda = None
+        self._zp_vega_f_lambda = None
+        self._lock = threading.RLock()
+
+    def __len__(self):
+        return len(self.filter_set.filter_set)
+
+    @property
+    def filter_ids(self):
+        return [item.filter_id for item in self.filter_set]
+
+    @property
+    def weights(self):
+        """(n_filters, n_wavelength) weights of the filters on the grid"""
+        if self._weights is None:
+            with self._lock:
+                if self._weights is None:
+                    self._weights = np.array(
+                        [filter_weights(item, self.wavelength)
+                         for item in self.filter_set])
+        return self._weights
+
+    @property
+    def zp_ab_f_lambda(self):
+        """AB zero points of the filters in erg/s/cm^2/Angstrom"""
+        if self._zp_ab_f_lambda is None:
+            with self._lock:
+                if self._zp_ab_f_lambda is None:
+                    self._zp_ab_f_lambda = np.array(
+                        [item.zp_ab_f_lambda.to_value(FLAM_UNIT)
+                         for item in self.filter_set])
+        return self._zp_ab_f_lambda
+
+    @property
+    def zp_vega_f_lambda(self):
+        """Vega zero points of the filters in erg/s/cm^2/Angstrom"""
+        if self._zp_vega_f_lambda is None:
+            with self._lock:
+                if self._zp_vega_f_lambda is None:
+                    self._zp_vega_f_lambda = np.array(
+                        [item.zp_vega_f_lambda.to_value(FLAM_UNIT)
+                         for item in self.filter_set])
+        return self._zp_vega_f_lambda
+
+    def get_zero_points(self, magnitude_system):
+        """Zero points for `magnitude_system` ('ab' or 'vega')"""
+        if magnitude_system not in ('ab', 'vega'):
+            raise ValueError("magnitude_system needs to be 'ab' or 'vega', "
+                             "not {0!r}".format(magnitude_system))
+        return getattr(self, 'zp_{0}_f_lambda'.format(magnitude_system))
+
+    def iter_f_lambda(self, flux, chunk_size=DEFAULT_CHUNK_SIZE):
+        """
+        Average flux densities of blocks of spectra
+
+        Parameters
+        ----------
+
+        flux: numpy.ndarray or ~astropy.units.Quantity
+            (n_spectra, n_wavelength) fluxes (plain arrays in
+            erg/s/cm^2/Angstrom)
+
+        chunk_size: int, optional
+            number of spectra per block
+
+        Yields
+        ------
+            : slice, numpy.ndarray
+            rows of `flux` in the block and their (n_rows, n_filters) flux
+            densities in erg/s/cm^2/Angstrom
+        """
+        n_spectra = len(flux)
+        if chunk_size is None:
+            chunk_size = max(n_spectra, 1)
+        for start in range(0, n_spectra, chunk_size):
+            rows = slice(start, min(start + chunk_size, n_spectra))
+            yield rows, self._calculate_f_lambda(flux[rows])
+
+    @timed('BatchPhotometry.calculate_f_lambda')
+    def _calculate_f_lambda(self, flux):
+        return _calculate_f_lambda_chunk(flux, self.wavelength, self.weights)
+
+    def calculate_f_lambda(self, flux, chunk_size=DEFAULT_CHUNK_SIZE,
+                           executor=None, n_workers=None):
+        """
+        Average flux densities of spectra through all filters
+
+        Parameters
+        ----------
+
+        flux: numpy.ndarray or ~astropy.units.Quantity
+            (n_wavelength,) flux of one spectrum or (n_spectra, n_wavelength)
+            fluxes (plain arrays in erg/s/cm^2/Angstrom)
+
+        chunk_size: int, optional
+            number of spectra processed at once
+
+        executor: str or object, optional
+            where the chunks are computed, see `~wsynphot.executors`
+            (default: serially in the calling thread)
+
+        n_workers: int, optional
+            number of workers of a new executor pool
+
+        Returns
+        -------
+            : numpy.ndarray
+            (n_filters,) or (n_spectra, n_filters) in erg/s/cm^2/Angstrom
+        """
+        if np.ndim(flux) == 1:
+            return self._calculate_f_lambda(flux)
+        f_lambda = np.empty((len(flux), len(self)))
+        if executor is None or executor == 'serial':
+            for rows, block in self.iter_f_lambda(flux, chunk_size):
+                f_lambda[rows] = block
+            return f_lambda
+        chunks = get_chunks(len(flux), chunk_size)
+        blocks = map_chunks(
+            partial(_calculate_f_lambda_chunk, wavelength=self.wavelength,
+                    weights=self.weights),
+            [flux[rows] for rows in chunks], executor, n_workers)
+        for rows, block in zip(chunks, blocks):
+            f_lambda[rows] = block
+        return f_lambda
+
+    def calculate_magnitudes(self, flux, magnitude_system='ab',
+                             chunk_size=DEFAULT_CHUNK_SIZE, executor=None,
+                             n_workers=None):
+        """
+        Magnitudes of spectra through all filters
+
+        Parameters
+        ----------
+
+        flux: numpy.ndarray or ~astropy.units.Quantity
+            see `calculate_f_lambda`
+
+        magnitude_system: str, optional
+            'ab' or 'vega'
+
+        chunk_size: int, optional
+            number of spectra processed at once
+
+        executor, n_workers: optional
+            see `calculate_f_lambda`
+
+        Returns
+        -------
+            : numpy.ndarray
+            (n_filters,) or (n_spectra, n_filters)
+        """
+        zero_points = self.get_zero_points(magnitude_system)
+        return self.convert_f_lambda_to_magnitudes(
+            self.calculate_f_lambda(flux, chunk_size, executor, n_workers),
+            zero_points)
+
+    def calculate_ab_magnitudes(self, flux, chunk_size=DEFAULT_CHUNK_SIZE):
+        return self.calculate_magnitudes(flux, 'ab', chunk_size)
+
+    def calculate_vega_magnitudes(self, flux, chunk_size=DEFAULT_CHUNK_SIZE):
+        return self.calculate_magnitudes(flux, 'vega', chunk_size)
+
+    @staticmethod
+    def convert_f_lambda_to_magnitudes(f_lambda, zero_points):
+        return -2.5 * np.log10(f_lambda / zero_points)
+
+
+def calculate_blackbody_magnitudes(filter_set, temperature, radius,
+                                   distance=10 * u.pc, magnitude_system='ab',
+                                   lambda_min=2000, lambda_max=10000,
+                                   dlambda=1, chunk_size=DEFAULT_CHUNK_SIZE):
+    """
+    Magnitudes of blackbodies for a grid of temperatures (and radii)
+
+    The (n_temperature, n_wavelength) flux is evaluated in blocks of
+    `chunk_size` temperatures without units and fed straight into the
+    photometry of `filter_set`, so memory stays bounded for any number of
+    temperatures.
+
+    Parameters
+    ----------
+    filter_set : ~wsynphot.FilterSet
+    temperature : ~numpy.ndarray or ~astropy.units.Quantity
+        Blackbody temperatures (plain arrays in Kelvin)
+    radius : ~astropy.units.Quantity
+        Radius of the blackbody, either a scalar or one per temperature
+    distance : ~astropy.units.Quantity
+        Distance of the blackbody source (default is 10 pc)
+    magnitude_system : str, optional
+        'ab' or 'vega'
+    lambda_min, lambda_max, dlambda : float
+        Wavelength grid in Angstrom, see `~wsynphot.spectrum1d.blackbody1d`
+    chunk_size : int, optional
+        Number of temperatures evaluated at once
+
+    Returns
+    -------
+    pandas.core.frame.DataFrame
+        (n_temperature, n_filters) magnitudes indexed by temperature
+    """
+    if not hasattr(radius, 'unit'):
+        raise ValueError("radius needs to be a quantity (e.g., 1 * u.cm)")
+
+    if not hasattr(distance, 'unit'):
+        raise ValueError("distance needs to be a quantity (e.g., 1 * u.pc)")
+
+    if hasattr(temperature, 'unit'):
+        temperature = temperature.to_value(u.K, u.temperature())
+    temperature = np.atleast_1d(np.asarray(temperature, dtype=np.float64))
+
+    # the factor of pi sr is from the angular integral
+    scale = np.broadcast_to(
+        np.pi * (radius / distance).to_value(u.dimensionless_unscaled)**2,
+        temperature.shape)
+
+    wavelength = np.arange(lambda_min, lambda_max, dlambda, dtype=np.float64)
+    photometry = filter_set.get_batch_photometry(wavelength)
+    zero_points = photometry.get_zero_points(magnitude_system)
+
+    magnitudes = np.empty((len(temperature), len(photometry)))
+    for start in range(0, len(temperature), chunk_size):
+        rows = slice(start, start + chunk_size)
+        flux = blackbody_lambda_grid(wavelength, temperature[rows])
+        flux *= scale[rows, None]
+        magnitudes[rows] = photometry.convert_f_lambda_to_magnitudes(
+            photometry._calculate_f_lambda(flux), zero_points)
+
+    return pd.DataFrame(magnitudes, columns=photometry.filter_ids,
+                        index=pd.Index(temperature, name='temperature'))
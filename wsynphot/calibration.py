@@ -4,9 +4,11 @@ from astropy.io import fits
 from astropy import units as u
 from wsynphot.spectrum1d import SKSpectrum1D as Spectrum1D
 from wsynphot.data.base import ALPHA_LYR_PATH
+from wsynphot.util.profiling import timed
 
 default_vega_path = ALPHA_LYR_PATH
 
+@timed('get_vega_calibration_spectrum')
 def get_vega_calibration_spectrum(vega_file=None):
     """Get vega spectrum from a calibration file
 
@@ -0,0 +1,297 @@
+"""The ``wsynphot`` command
+
+::
+
+    wsynphot photometry -f SDSS/SDSS.g,SDSS/SDSS.r -o mags.csv spectra/*.fits
+    wsynphot cache warm -f SDSS/SDSS.g,SDSS/SDSS.r spectra/*.fits
+    wsynphot cache stats
+    wsynphot serve --filter-set sdss=SDSS/SDSS.g,SDSS/SDSS.r
+
+Long lists of arguments can be read from text files with one argument per
+line by prefixing their name with ``@`` (``@spectra.txt``).
+"""
+import argparse
+import json
+import logging
+import os
+import sys
+
+import numpy as np
+
+from wsynphot.base import FilterSet
+from wsynphot.batch import to_angstrom, to_f_lambda
+from wsynphot.config import get_cache_updation_date
+from wsynphot.executors import EXECUTOR_BACKENDS
+from wsynphot.io.cache_filters import CACHE_DIR
+from wsynphot.io.photometry_cache import PhotometryCache
+from wsynphot.io.spectra import read_spectrum
+from wsynphot.jobs import PhotometryJob, get_table_format, write_table
+from wsynphot.server import DEFAULT_HOST, DEFAULT_PORT, serve
+from wsynphot.util.cache import array_fingerprint
+
+logger = logging.getLogger(__name__)
+
+# spectra read per job shard or cache batch
+DEFAULT_SHARD_SIZE = 100
+
+
+def load_filter_set(filter_ids, filter_cache_dir=None, vega_fpath=None):
+    """FilterSet of filter IDs (or lists of them, as given to
+    ``--filters``)"""
+    filter_ids = [filter_id for item in filter_ids for filter_id in
+                  ([item] if isinstance(item, str) else item)]
+    kwargs = {'vega_fpath': vega_fpath}
+    if filter_cache_dir is not None:
+        kwargs['cache_dir'] = filter_cache_dir
+    return FilterSet(filter_ids, **kwargs)
+
+
+def iter_spectrum_batches(fpaths, chunk_size=DEFAULT_SHARD_SIZE):
+    """
+    Read spectrum files into batches of consecutive spectra on the same
+    wavelength grid
+
+    Files that cannot be read are logged and skipped.
+
+    Yields
+    ------
+        : numpy.ndarray, numpy.ndarray
+        wavelength in Angstrom and (n_spectra, n_wavelength) flux in
+        erg/s/cm^2/Angstrom
+    """
+    wavelength = grid_key = None
+    batch = []
+    for fpath in fpaths:
+        try:
+            spectrum_wavelength, flux = read_spectrum(fpath)
+        except Exception as e:
+            logger.warning('Skipping {0}: {1}: {2}'.format(
+                fpath, type(e).__name__, e))
+            continue
+        spectrum_wavelength = to_angstrom(spectrum_wavelength)
+        spectrum_grid_key = array_fingerprint(spectrum_wavelength)
+        if batch and (spectrum_grid_key != grid_key or
+                      len(batch) >= chunk_size):
+            yield wavelength, np.array(batch)
+            batch = []
+        wavelength, grid_key = spectrum_wavelength, spectrum_grid_key
+        batch.append(to_f_lambda(flux, wavelength))
+    if batch:
+        yield wavelength, np.array(batch)
+
+
+def run_photometry(args):
+    get_table_format(args.output)
+    filter_set = load_filter_set(args.filters, args.filter_cache_dir,
+                                 args.vega_fpath)
+    work_dir = args.work_dir or args.output + '.parts'
+    job = PhotometryJob(filter_set, args.spectra, work_dir,
+                        magnitude_system=args.magnitude_system,
+                        shard_size=args.chunk_size, n_workers=args.workers,
+                        executor=args.executor)
+    job.run(resume=not args.no_resume)
+    results = job.read_results()
+    write_table(results, args.output)
+    if not args.keep_parts:
+        job.clean()
+    n_failed = int((results['error'] != '').sum())
+    logger.info('Wrote photometry of {0} spectra to {1}'.format(
+        len(results), args.output))
+    if n_failed:
+        logger.warning('{0} spectra could not be read, see the error '
+                       'column'.format(n_failed))
+        return 1
+    return 0
+
+
+def run_cache_warm(args):
+    filter_set = load_filter_set(args.filters, args.filter_cache_dir,
+                                 args.vega_fpath)
+    filter_set.calculate_zero_points(args.magnitude_system)
+    cache = PhotometryCache(args.cache_dir)
+    calculate = getattr(filter_set, 'calculate_{0}_magnitudes_batch'.format(
+        args.magnitude_system))
+    for wavelength, flux in iter_spectrum_batches(args.spectra,
+                                                  args.chunk_size):
+        calculate(wavelength, flux, cache=cache)
+    info = cache.info()
+    logger.info('Cached photometry of {0} spectra ({1} already cached) in '
+                '{2}'.format(info['misses'], info['hits'], cache.cache_dir))
+    return 0
+
+
+def _count_filter_files(cache_dir):
+    return sum(fname.endswith('.vot') and fname != 'svo_index.vot'
+               for _, _, fnames in os.walk(cache_dir) for fname in fnames)
+
+
+def run_cache_stats(args):
+    filter_cache_dir = args.filter_cache_dir or CACHE_DIR
+    cache = PhotometryCache(args.cache_dir)
+    updated = get_cache_updation_date()
+    stats = {'filter_cache': {'cache_dir': filter_cache_dir,
+                              'n_filters': _count_filter_files(
+                                  filter_cache_dir),
+                              'updated': updated and updated.isoformat()},
+             'photometry_cache': {'cache_dir': cache.cache_dir,
+                                  'tables': cache.list_tables()}}
+    if args.json:
+        print(json.dumps(stats, indent=1))
+        return 0
+
+    print('Filter cache {0}: {1} filters, last updated {2}'.format(
+        filter_cache_dir, stats['filter_cache']['n_filters'],
+        stats['filter_cache']['updated'] or 'never'))
+    tables = stats['photometry_cache']['tables']
+    print('Photometry cache {0}: {1} tables, {2} spectra, {3:.1f} MB'.format(
+        cache.cache_dir, len(tables),
+        sum(table['n_spectra'] for table in tables),
+        sum(table['nbytes'] for table in tables) / 1e6))
+    for table in tables:
+        print('  {0}  {1:<4}  {2:>8} spectra  {3:>8.1f} MB  {4}'.format(
+            table['table_key'][:12], table['magnitude_system'],
+            table['n_spectra'], table['nbytes'] / 1e6,
+            ', '.join(table['filter_ids'][:3] +
+                      ['...'] * (len(table['filter_ids']) > 3))))
+    return 0
+
+
+def _parse_filter_ids(value):
+    return [filter_id for filter_id in value.split(',') if filter_id]
+
+
+def _parse_filter_set(value):
+    name, separator, filter_ids = value.partition('=')
+    if not separator or not name or not _parse_filter_ids(filter_ids):
+        raise argparse.ArgumentTypeError(
+            'filter sets need to be given as NAME=ID,ID,..., not '
+            '{0!r}'.format(value))
+    return name, _parse_filter_ids(filter_ids)
+
+
+def run_serve(args):
+    filter_sets = {name: load_filter_set(filter_ids, args.filter_cache_dir,
+                                         args.vega_fpath)
+                   for name, filter_ids in args.filter_sets}
+    serve(filter_sets, args.host, args.port,
+          magnitude_systems=tuple(args.magnitude_systems),
+          max_wait=args.max_wait)
+    return 0
+
+
+def _add_filter_arguments(parser, filters=True):
+    if filters:
+        parser.add_argument('-f', '--filters', action='append',
+                            type=_parse_filter_ids, required=True,
+                            metavar='ID,ID,...',
+                            help='filter IDs, e.g. SDSS/SDSS.g,SDSS/SDSS.r '
+                                 '(repeatable)')
+    parser.add_argument('--filter-cache-dir',
+                        help='directory of the filter data (default: the '
+                             'wsynphot filter cache)')
+    parser.add_argument('--vega-fpath',
+                        help='Vega calibration spectrum for Vega magnitudes')
+
+
+def _add_photometry_arguments(parser):
+    parser.add_argument('spectra', nargs='+', metavar='SPECTRUM',
+                        help='FITS, HDF5 or text spectrum files')
+    parser.add_argument('-m', '--magnitude-system', choices=('ab', 'vega'),
+                        default='ab')
+    parser.add_argument('--chunk-size', type=int, default=DEFAULT_SHARD_SIZE,
+                        help='spectra per unit of work (default: '
+                             '%(default)s)')
+
+
+def get_parser():
+    parser = argparse.ArgumentParser(
+        prog='wsynphot', fromfile_prefix_chars='@',
+        description='Synthetic photometry of spectra through filter curves')
+    parser.add_argument('-v', '--verbose', action='store_true',
+                        help='log debugging information')
+    parser.add_argument('-q', '--quiet', action='store_true',
+                        help='only log warnings and errors')
+    subparsers = parser.add_subparsers(dest='command', metavar='COMMAND')
+    subparsers.required = True
+
+    photometry = subparsers.add_parser(
+        'photometry', help='magnitudes of many spectrum files as one table',
+        description='Magnitudes of spectrum files, computed in parallel '
+                    'chunks. Finished chunks are kept in a work directory, '
+                    'so an interrupted run continues where it stopped.')
+    _add_filter_arguments(photometry)
+    _add_photometry_arguments(photometry)
+    photometry.add_argument('-o', '--output', required=True,
+                            help='output table (.csv, .parquet or .npz)')
+    photometry.add_argument('-j', '--workers', type=int,
+                            help='number of workers (default: all cores)')
+    photometry.add_argument('--executor', choices=EXECUTOR_BACKENDS,
+                            default='processes',
+                            help='where chunks run (default: %(default)s)')
+    photometry.add_argument('--work-dir',
+                            help='directory of finished chunks (default: '
+                                 'OUTPUT.parts)')
+    photometry.add_argument('--keep-parts', action='store_true',
+                            help='keep the finished chunks after writing the '
+                                 'table')
+    photometry.add_argument('--no-resume', action='store_true',
+                            help='recompute chunks finished before')
+    photometry.set_defaults(func=run_photometry)
+
+    cache = subparsers.add_parser('cache', help='photometry and filter caches')
+    cache_commands = cache.add_subparsers(dest='cache_command',
+                                          metavar='COMMAND')
+    cache_commands.required = True
+    warm = cache_commands.add_parser(
+        'warm', help='load filters and store the photometry of spectra in '
+                     'the photometry cache')
+    _add_filter_arguments(warm)
+    _add_photometry_arguments(warm)
+    warm.add_argument('--cache-dir',
+                      help='photometry cache (default: in the data directory)')
+    warm.set_defaults(func=run_cache_warm)
+    stats = cache_commands.add_parser('stats', help='contents of the caches')
+    stats.add_argument('--cache-dir',
+                       help='photometry cache (default: in the data '
+                            'directory)')
+    stats.add_argument('--filter-cache-dir',
+                       help='filter cache (default: the wsynphot filter '
+                            'cache)')
+    stats.add_argument('--json', action='store_true',
+                       help='print the statistics as JSON')
+    stats.set_defaults(func=run_cache_stats)
+
+    server = subparsers.add_parser(
+        'serve', help='serve photometry over local HTTP, see '
+                      'wsynphot.server')
+    server.add_argument('--filter-set', dest='filter_sets', action='append',
+                       type=_parse_filter_set, required=True,
+                       metavar='NAME=ID,ID,...',
+                       help='named filter set to preload (repeatable)')
+    _add_filter_arguments(server, filters=False)
+    server.add_argument('--host', default=DEFAULT_HOST)
+    server.add_argument('--port', type=int, default=DEFAULT_PORT)
+    server.add_argument('--magnitude-systems', nargs='+',
+                       choices=('ab', 'vega'), default=['ab', 'vega'],
+                       help='zero points computed at startup')
+    server.add_argument('--max-wait', type=float, default=0.002,
+                       help='seconds requests wait to be batched together')
+    server.set_defaults(func=run_serve)
+    return parser
+
+
+def main(argv=None):
+    """Run the ``wsynphot`` command, returns the exit status"""
+    args = get_parser().parse_args(argv)
+    if args.verbose or args.quiet:
+        logging.getLogger('wsynphot').setLevel(
+            logging.DEBUG if args.verbose else logging.WARNING)
+    try:
+        return args.func(args)
+    except (IOError, ValueError, ImportError, KeyError) as e:
+        sys.stderr.write('wsynphot: error: {0}\n'.format(e))
+        return 1
+
+
+if __name__ == '__main__':
+    sys.exit(main())
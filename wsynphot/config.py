@@ -62,6 +62,16 @@ def get_calibration_dir():
     return calibration_dir
 
 
+def get_photometry_cache_dir():
+    """Returns the path of the directory for storing computed synthetic
+    photometry in a subdirectory of data_dir (i.e. defined in configuration
+    file)"""
+    photometry_cache_dir = os.path.join(get_data_dir(), 'photometry')
+    if not os.path.exists(photometry_cache_dir):
+        os.makedirs(photometry_cache_dir)
+    return photometry_cache_dir
+
+
 def get_cache_updation_date():
     """Gets value of cache_updation_date from the configuration file and 
     handles the exceptions when unexpected value is encountered
@@ -0,0 +1,211 @@
+"""Broadband images from spectral (IFU) data cubes
+
+The flux density of every spaxel through a filter is the dot product of its
+spectrum with the filter weights on the cube's wavelength grid (see
+`~wsynphot.batch`). `CubePhotometry` reads the cube in spatial tiles, so
+memory-mapped cubes larger than the available memory are processed with a
+peak memory of about ``tile_size**2 * n_wavelength`` values.
+"""
+import numpy as np
+from astropy import units as u
+from astropy.io import fits
+
+from wsynphot.spectrum1d import FLAM_UNIT
+
+DEFAULT_TILE_SIZE = 64
+
+
+def read_fits_cube(fpath, extension=0):
+    """
+    Memory-map a FITS cube with a linear wavelength axis
+
+    Parameters
+    ----------
+    fpath : str
+    extension : int or str, optional
+        HDU holding the cube, with the spectral axis as third FITS axis
+
+    Returns
+    -------
+    ~astropy.units.Quantity, numpy.ndarray, ~astropy.units.Unit or None
+        wavelength, memory-mapped (n_wavelength, ny, nx) data and the flux
+        unit given by BUNIT
+    """
+    with fits.open(fpath, memmap=True) as hdul:
+        hdu = hdul[extension]
+        header = hdu.header
+        data = hdu.data
+    n_wavelength = header['NAXIS3']
+    delta = header.get('CDELT3', header.get('CD3_3'))
+    if delta is None:
+        raise ValueError('{0} has no linear wavelength axis (CDELT3 or '
+                         'CD3_3)'.format(fpath))
+    wavelength = (header['CRVAL3'] + delta *
+                  (np.arange(n_wavelength) + 1 - header.get('CRPIX3', 1.)))
+    wavelength_unit = u.Unit(header.get('CUNIT3', 'Angstrom'))
+    flux_unit = header.get('BUNIT')
+    if flux_unit is not None:
+        flux_unit = u.Unit(flux_unit, parse_strict='silent')
+    return wavelength * wavelength_unit, data, flux_unit
+
+
+class CubePhotometry(object):
+    """
+    Filter images of spectral cubes sharing a wavelength grid
+
+    Parameters
+    ----------
+
+    filter_set: ~wsynphot.FilterSet
+
+    wavelength: ~astropy.units.Quantity or numpy.ndarray
+        wavelength grid of the cube (plain arrays are in Angstrom)
+
+    flux_unit: ~astropy.units.Unit, optional
+        unit of the cube values (default: erg/s/cm^2/Angstrom), folded into
+        the filter weights so the cube is never converted
+    """
+
+    def __init__(self, filter_set, wavelength, flux_unit=FLAM_UNIT):
+        self.photometry = filter_set.get_batch_photometry(wavelength)
+        self.flux_unit = u.Unit(flux_unit)
+        self._weights = None
+
+    @property
+    def weights(self):
+        """(n_filters, n_wavelength) weights applied to the raw cube
+        values"""
+        if self._weights is None:
+            wavelength = self.photometry.wavelength
+            conversion = (np.ones_like(wavelength) * self.flux_unit).to_value(
+                FLAM_UNIT, u.spectral_density(wavelength * u.angstrom))
+            self._weights = self.photometry.weights * conversion
+        return self._weights
+
+    def iter_tiles(self, cube, spectral_axis=-1, tile_size=DEFAULT_TILE_SIZE):
+        """
+        Flux density images of spatial tiles of a cube
+
+        Parameters
+        ----------
+
+        cube: numpy.ndarray
+            (ny, nx, n_wavelength) or, with ``spectral_axis=0``,
+            (n_wavelength, ny, nx) cube, e.g. a `numpy.memmap`
+
+        spectral_axis: int, optional
+            0 or -1
+
+        tile_size: int, optional
+            edge length of the square tiles in pixels
+
+        Yields
+        ------
+            : tuple of slice, numpy.ndarray
+            (y, x) slices of the tile and its (n_filters, tile_ny, tile_nx)
+            flux densities in erg/s/cm^2/Angstrom
+        """
+        if spectral_axis not in (0, -1, 2):
+            raise ValueError('spectral_axis needs to be 0 or -1')
+        spectral_first = spectral_axis == 0
+        ny, nx = cube.shape[1:] if spectral_first else cube.shape[:2]
+        n_wavelength = cube.shape[0] if spectral_first else cube.shape[-1]
+        if n_wavelength != len(self.photometry.wavelength):
+            raise ValueError('cube has {0} wavelengths, the photometry '
+                             '{1}'.format(n_wavelength,
+                                          len(self.photometry.wavelength)))
+        weights = self.weights
+        for y_start in range(0, ny, tile_size):
+            for x_start in range(0, nx, tile_size):
+                tile = (slice(y_start, min(y_start + tile_size, ny)),
+                        slice(x_start, min(x_start + tile_size, nx)))
+                if spectral_first:
+                    block = np.asarray(cube[(slice(None),) + tile],
+                                       dtype=np.float64)
+                    images = np.tensordot(weights, block, axes=(1, 0))
+                else:
+                    block = np.asarray(cube[tile], dtype=np.float64)
+                    images = np.moveaxis(np.dot(block, weights.T), -1, 0)
+                yield tile, images
+
+    def calculate_f_lambda_images(self, cube, spectral_axis=-1,
+                                  tile_size=DEFAULT_TILE_SIZE, out=None):
+        """
+        Flux density images of a cube through all filters
+
+        Parameters
+        ----------
+
+        cube, spectral_axis, tile_size:
+            see `iter_tiles`
+
+        out: numpy.ndarray, optional
+            (n_filters, ny, nx) array to write into, e.g. a `numpy.memmap`
+
+        Returns
+        -------
+            : numpy.ndarray
+            (n_filters, ny, nx) in erg/s/cm^2/Angstrom
+        """
+        spatial_shape = (cube.shape[1:] if spectral_axis == 0
+                         else cube.shape[:2])
+        if out is None:
+            out = np.empty((len(self.photometry),) + tuple(spatial_shape))
+        for tile, images in self.iter_tiles(cube, spectral_axis, tile_size):
+            out[(slice(None),) + tile] = images
+        return out
+
+    def calculate_magnitude_images(self, cube, magnitude_system='ab',
+                                   spectral_axis=-1,
+                                   tile_size=DEFAULT_TILE_SIZE, out=None):
+        """
+        Magnitude images of a cube through all filters, NaN where the flux is
+        not positive
+
+        Parameters
+        ----------
+
+        cube, spectral_axis, tile_size:
+            see `iter_tiles`
+
+        magnitude_system: str, optional
+            'ab' or 'vega'
+
+        out: numpy.ndarray, optional
+            (n_filters, ny, nx) array for the intermediate flux density
+            images
+
+        Returns
+        -------
+            : numpy.ndarray
+            (n_filters, ny, nx)
+        """
+        zero_points = self.photometry.get_zero_points(magnitude_system)
+        f_lambda = self.calculate_f_lambda_images(cube, spectral_axis,
+                                                  tile_size, out)
+        with np.errstate(invalid='ignore', divide='ignore'):
+            magnitudes = self.photometry.convert_f_lambda_to_magnitudes(
+                np.moveaxis(f_lambda, 0, -1), zero_points)
+        magnitudes[~np.isfinite(magnitudes)] = np.nan
+        return np.moveaxis(magnitudes, -1, 0)
+
+    def write_fits(self, images, fpath, header=None, overwrite=False):
+        """
+        Write (n_filters, ny, nx) images to a FITS file with one image HDU
+        per filter, named by filter ID
+
+        Parameters
+        ----------
+        images : numpy.ndarray
+        fpath : str
+        header : ~astropy.io.fits.Header, optional
+            header (e.g. spatial WCS) copied to every image HDU
+        overwrite : bool, optional
+        """
+        hdus = [fits.PrimaryHDU()]
+        for filter_id, image in zip(self.photometry.filter_ids, images):
+            hdu = fits.ImageHDU(image, header=header,
+                                name=filter_id.replace('/', '.'))
+            hdu.header['FILTER'] = filter_id
+            hdus.append(hdu)
+        fits.HDUList(hdus).writeto(fpath, overwrite=overwrite)
@@ -6,6 +6,7 @@ import logging
 import requests
 from tqdm.autonotebook import tqdm
 from wsynphot.config import get_calibration_dir
+from wsynphot.util.profiling import timed
 
 logger = logging.getLogger(__name__)
 
@@ -46,6 +47,7 @@ def download_from_url(url, dst):
     return file_size
 
 
+@timed('download_calibration_data')
 def download_calibration_data():
     if os.path.exists(ALPHA_LYR_PATH):
         logger.error('Alpha Lyra calibration already exists - not downloading')
@@ -0,0 +1,246 @@
+"""Executor backends for chunked computations
+
+The batch photometry, filter loading, template fitting and grid computation
+split their work into chunks (of spectra, filters or objects) and map a
+function over them. The `executor` argument of these functions selects where
+the chunks run:
+
+* ``None`` or ``'serial'``: in the calling thread
+* ``'threads'``: a thread pool, useful because numpy releases the GIL in the
+  matrix products
+* ``'processes'``: a process pool, the mapped function and its arguments
+  need to be picklable
+* ``'dask'``: a local `dask.distributed` cluster (requires dask)
+
+or an existing `concurrent.futures.Executor`, `dask.distributed.Client` or
+executor object from this module, which is used but not shut down. `map`
+returns results in the order of the chunks; `map_as_completed` yields them
+as they finish, for callers that checkpoint progress.
+"""
+from concurrent.futures import (Executor, ProcessPoolExecutor,
+                                ThreadPoolExecutor, as_completed)
+from contextlib import contextmanager
+import os
+
+EXECUTOR_BACKENDS = ('serial', 'threads', 'processes', 'dask')
+
+
+def get_n_workers(n_workers=None):
+    """`n_workers`, defaulting to the number of cores"""
+    return n_workers or os.cpu_count() or 1
+
+
+class SerialExecutor(object):
+    """Runs all chunks one after the other in the calling thread"""
+
+    n_workers = 1
+
+    def map(self, function, *iterables):
+        return [function(*args) for args in zip(*iterables)]
+
+    def map_as_completed(self, function, iterable):
+        for i, item in enumerate(iterable):
+            yield i, function(item)
+
+    def shutdown(self):
+        pass
+
+
+class PoolExecutor(object):
+    """
+    Runs chunks on a `concurrent.futures` executor
+
+    Parameters
+    ----------
+
+    executor: concurrent.futures.Executor
+
+    n_workers: int, optional
+        number of workers of `executor`, if known
+    """
+
+    def __init__(self, executor, n_workers=None):
+        self.executor = executor
+        self.n_workers = n_workers or getattr(executor, '_max_workers', None)
+
+    def map(self, function, *iterables):
+        return list(self.executor.map(function, *iterables))
+
+    def map_as_completed(self, function, iterable):
+        futures = {self.executor.submit(function, item): i
+                   for i, item in enumerate(iterable)}
+        for future in as_completed(futures):
+            yield futures[future], future.result()
+
+    def shutdown(self):
+        self.executor.shutdown()
+
+
+class DaskExecutor(object):
+    """
+    Runs chunks on a dask.distributed cluster
+
+    Parameters
+    ----------
+
+    client: dask.distributed.Client, optional
+        client of a running cluster (default: start a local cluster)
+
+    n_workers: int, optional
+        number of worker processes of a new local cluster
+    """
+
+    def __init__(self, client=None, n_workers=None):
+        self._owns_client = client is None
+        if client is None:
+            try:
+                from dask.distributed import Client, LocalCluster
+            except ImportError:
+                raise ImportError("executor='dask' requires dask.distributed")
+            client = Client(LocalCluster(n_workers=get_n_workers(n_workers),
+                                         threads_per_worker=1))
+        self.client = client
+        self.n_workers = n_workers or len(
+            client.scheduler_info().get('workers', ())) or None
+
+    def map(self, function, *iterables):
+        # pure=False, the same chunk may be computed again intentionally
+        return self.client.gather(
+            self.client.map(function, *iterables, pure=False))
+
+    def map_as_completed(self, function, iterable):
+        from dask.distributed import as_completed as dask_as_completed
+        futures = self.client.map(function, list(iterable), pure=False)
+        index = {future.key: i for i, future in enumerate(futures)}
+        for future in dask_as_completed(futures):
+            yield index[future.key], future.result()
+
+    def shutdown(self):
+        if self._owns_client:
+            cluster = getattr(self.client, 'cluster', None)
+            self.client.close()
+            if cluster is not None:
+                cluster.close()
+
+
+def _is_dask_client(executor):
+    return type(executor).__module__.split('.')[0] == 'distributed'
+
+
+def get_executor(executor=None, n_workers=None):
+    """
+    Executor object for the `executor` argument of the chunked computations
+
+    Parameters
+    ----------
+
+    executor: str or object, optional
+        one of `EXECUTOR_BACKENDS`, a `concurrent.futures.Executor`, a
+        `dask.distributed.Client` or an executor from this module (default:
+        'serial')
+
+    n_workers: int, optional
+        number of workers of a new pool (default: all cores); a single
+        worker runs in the calling thread
+
+    Returns
+    -------
+        : SerialExecutor, PoolExecutor or DaskExecutor
+        an executor with ``map(function, *iterables)`` returning a list in
+        input order
+    """
+    if executor is None:
+        executor = 'serial'
+    if isinstance(executor, str):
+        if executor not in EXECUTOR_BACKENDS:
+            raise ValueError('executor needs to be one of {0}, not '
+                             '{1!r}'.format(EXECUTOR_BACKENDS, executor))
+        if executor == 'serial' or n_workers == 1:
+            return SerialExecutor()
+        if executor == 'dask':
+            return DaskExecutor(n_workers=n_workers)
+        n_workers = get_n_workers(n_workers)
+        if executor == 'threads':
+            return PoolExecutor(ThreadPoolExecutor(n_workers), n_workers)
+        return PoolExecutor(ProcessPoolExecutor(n_workers), n_workers)
+    if isinstance(executor, (SerialExecutor, PoolExecutor, DaskExecutor)):
+        return executor
+    if isinstance(executor, Executor):
+        return PoolExecutor(executor)
+    if _is_dask_client(executor):
+        return DaskExecutor(executor)
+    raise ValueError('Unknown executor {0!r}'.format(executor))
+
+
+def is_in_process(executor):
+    """Whether `executor` (as accepted by `get_executor`) runs chunks in the
+    calling process, so they can share unpicklable state"""
+    if executor is None or executor in ('serial', 'threads'):
+        return True
+    if isinstance(executor, SerialExecutor):
+        return True
+    if isinstance(executor, PoolExecutor):
+        executor = executor.executor
+    return isinstance(executor, ThreadPoolExecutor)
+
+
+def is_process_pool(executor):
+    """Whether `executor` (as accepted by `get_executor`) runs chunks in
+    worker processes on this machine"""
+    if executor == 'processes':
+        return True
+    if isinstance(executor, PoolExecutor):
+        executor = executor.executor
+    return isinstance(executor, ProcessPoolExecutor)
+
+
+@contextmanager
+def open_executor(executor=None, n_workers=None):
+    """
+    Context manager resolving `executor` with `get_executor`; executors
+    started here are shut down on exit, ones passed in are left running
+    """
+    resolved = get_executor(executor, n_workers)
+    try:
+        yield resolved
+    finally:
+        if executor is None or isinstance(executor, str):
+            resolved.shutdown()
+
+
+def get_chunks(n, chunk_size):
+    """Slices splitting ``range(n)`` into chunks of `chunk_size`"""
+    if chunk_size is None:
+        chunk_size = max(n, 1)
+    return [slice(start, min(start + chunk_size, n))
+            for start in range(0, n, chunk_size)]
+
+
+def map_chunks(function, chunks, executor=None, n_workers=None):
+    """
+    Map `function` over `chunks` with `executor`
+
+    A single chunk is always computed in the calling thread, without
+    starting a pool.
+
+    Parameters
+    ----------
+
+    function: callable
+
+    chunks: list
+        arguments of the calls, one per chunk
+
+    executor, n_workers:
+        see `get_executor`
+
+    Returns
+    -------
+        : list
+        results in the order of `chunks`
+    """
+    chunks = list(chunks)
+    if len(chunks) <= 1:
+        return [function(chunk) for chunk in chunks]
+    with open_executor(executor, n_workers) as resolved:
+        return resolved.map(function, chunks)
@@ -0,0 +1,282 @@
+"""Synthetic photometry of reddened spectra
+
+Extinction with total extinction `A_V` and ratio `R_V` scales a spectrum by
+
+.. math::
+
+    10^{-0.4 A_V k(\\lambda; R_V)}, \\qquad
+    k(\\lambda; R_V) = A_\\lambda / A_V
+
+so for fixed filter weights `W` (see `~wsynphot.batch`) the flux densities
+of a spectrum `F` under many extinction values are one matrix product of
+the attenuated spectra with `W`. `ExtinctionPhotometry` evaluates the
+attenuation of all (A_V, R_V) pairs without units and without building new
+spectrum objects.
+"""
+import numpy as np
+import pandas as pd
+
+from wsynphot.batch import DEFAULT_CHUNK_SIZE, to_angstrom, to_f_lambda
+
+
+def ccm89_coefficients(wavelength):
+    """
+    Coefficients `a` and `b` of the Cardelli, Clayton & Mathis (1989)
+    extinction law :math:`A_\\lambda / A_V = a + b / R_V`
+
+    The law is defined for 1000 to 33333 Angstrom; longer wavelengths
+    continue the infrared power law and shorter wavelengths use the value
+    at 1000 Angstrom.
+
+    Parameters
+    ----------
+    wavelength : numpy.ndarray or ~astropy.units.Quantity
+        wavelength (plain arrays in Angstrom)
+
+    Returns
+    -------
+    numpy.ndarray, numpy.ndarray
+    """
+    x = 1e4 / to_angstrom(wavelength)
+    x = np.minimum(x, 10.)
+    a = np.empty_like(x)
+    b = np.empty_like(x)
+
+    infrared = x < 1.1
+    a[infrared] = 0.574 * x[infrared] ** 1.61
+    b[infrared] = -0.527 * x[infrared] ** 1.61
+
+    optical = (x >= 1.1) & (x < 3.3)
+    y = x[optical] - 1.82
+    a[optical] = np.polyval([0.32999, -0.77530, 0.01979, 0.72085, -0.02427,
+                             -0.50447, 0.17699, 1.], y)
+    b[optical] = np.polyval([-2.09002, 5.30260, -0.62251, -5.38434, 1.07233,
+                             2.28305, 1.41338, 0.], y)
+
+    ultraviolet = (x >= 3.3) & (x < 8.)
+    y = x[ultraviolet]
+    y_bump = np.maximum(y - 5.9, 0.)
+    a[ultraviolet] = (1.752 - 0.316 * y - 0.104 / ((y - 4.67) ** 2 + 0.341)
+                      - 0.04473 * y_bump ** 2 - 0.009779 * y_bump ** 3)
+    b[ultraviolet] = (-3.090 + 1.825 * y + 1.206 / ((y - 4.62) ** 2 + 0.263)
+                      + 0.2130 * y_bump ** 2 + 0.1207 * y_bump ** 3)
+
+    far_ultraviolet = x >= 8.
+    y = x[far_ultraviolet] - 8.
+    a[far_ultraviolet] = np.polyval([-0.070, 0.137, -0.628, -1.073], y)
+    b[far_ultraviolet] = np.polyval([0.374, -0.420, 4.257, 13.670], y)
+    return a, b
+
+
+def ccm89(wavelength, r_v=3.1):
+    """
+    Cardelli, Clayton & Mathis (1989) extinction law
+
+    Parameters
+    ----------
+    wavelength : numpy.ndarray or ~astropy.units.Quantity
+        (n_wavelength,) wavelength (plain arrays in Angstrom)
+    r_v : float or numpy.ndarray
+        ratio of total to selective extinction, scalar or (n_r_v,)
+
+    Returns
+    -------
+    numpy.ndarray
+        :math:`A_\\lambda / A_V` with shape (n_wavelength,) or
+        (n_r_v, n_wavelength)
+    """
+    a, b = ccm89_coefficients(wavelength)
+    r_v = np.asarray(r_v, dtype=np.float64)
+    return a + b / r_v[..., None] if r_v.ndim else a + b / r_v
+
+
+def tabulated_extinction_law(law_wavelength, extinction_ratio):
+    """
+    Extinction law from a tabulated curve, linearly interpolated (and
+    constant beyond its ends); it does not depend on R_V
+
+    Parameters
+    ----------
+    law_wavelength : numpy.ndarray or ~astropy.units.Quantity
+        increasing wavelength of the curve (plain arrays in Angstrom)
+    extinction_ratio : numpy.ndarray
+        :math:`A_\\lambda / A_V` on `law_wavelength`
+
+    Returns
+    -------
+    callable
+        law with the signature of `ccm89`
+    """
+    law_wavelength = to_angstrom(law_wavelength)
+    extinction_ratio = np.asarray(extinction_ratio, dtype=np.float64)
+
+    def extinction_law(wavelength, r_v=None):
+        ratio = np.interp(to_angstrom(wavelength), law_wavelength,
+                          extinction_ratio)
+        if np.ndim(r_v):
+            return np.broadcast_to(ratio, np.shape(r_v) + ratio.shape)
+        return ratio
+    return extinction_law
+
+
+class ExtinctionPhotometry(object):
+    """
+    Photometry of spectra on a common wavelength grid under many extinction
+    values
+
+    Parameters
+    ----------
+
+    filter_set: ~wsynphot.FilterSet
+
+    wavelength: ~astropy.units.Quantity or numpy.ndarray
+        wavelength grid of the spectra (plain arrays are in Angstrom)
+
+    extinction_law: callable, optional
+        function of wavelength (in Angstrom) and R_V returning
+        :math:`A_\\lambda / A_V`, see `ccm89` (default) and
+        `tabulated_extinction_law`
+    """
+
+    def __init__(self, filter_set, wavelength, extinction_law=ccm89):
+        self.photometry = filter_set.get_batch_photometry(wavelength)
+        self.extinction_law = extinction_law
+        self._extinction_ratios = {}
+
+    @property
+    def wavelength(self):
+        return self.photometry.wavelength
+
+    def _get_extinction_ratio(self, r_v):
+        """(n_r_v, n_wavelength) extinction law on the grid, evaluated once
+        per distinct R_V"""
+        r_v_values, inverse = np.unique(r_v, return_inverse=True)
+        missing = [value for value in r_v_values
+                   if value not in self._extinction_ratios]
+        if missing:
+            ratios = np.atleast_2d(self.extinction_law(
+                self.wavelength, np.array(missing)))
+            self._extinction_ratios.update(zip(missing, ratios))
+        return np.array([self._extinction_ratios[value]
+                         for value in r_v_values])[inverse]
+
+    def calculate_attenuation(self, a_v, r_v=3.1):
+        """
+        (n_extinction, n_wavelength) factors the flux is multiplied with for
+        the (broadcast) pairs of `a_v` and `r_v`
+        """
+        a_v, r_v = np.broadcast_arrays(
+            np.atleast_1d(np.asarray(a_v, dtype=np.float64)),
+            np.asarray(r_v, dtype=np.float64))
+        extinction_ratio = self._get_extinction_ratio(r_v)
+        return 10 ** (-0.4 * a_v[:, None] * extinction_ratio)
+
+    def calculate_f_lambda(self, flux, a_v, r_v=3.1,
+                           chunk_size=DEFAULT_CHUNK_SIZE):
+        """
+        Average flux densities of reddened spectra
+
+        Parameters
+        ----------
+
+        flux: numpy.ndarray or ~astropy.units.Quantity
+            (n_wavelength,) or (n_spectra, n_wavelength) intrinsic fluxes
+            (plain arrays in erg/s/cm^2/Angstrom)
+
+        a_v: float or numpy.ndarray
+            (n_extinction,) total extinction in V
+
+        r_v: float or numpy.ndarray, optional
+            R_V, scalar or one per `a_v`
+
+        chunk_size: int, optional
+            number of attenuated spectra evaluated at once
+
+        Returns
+        -------
+            : numpy.ndarray
+            (n_extinction, n_filters) or (n_spectra, n_extinction, n_filters)
+            in erg/s/cm^2/Angstrom
+        """
+        flux = to_f_lambda(flux, self.wavelength)
+        single = flux.ndim == 1
+        flux = np.atleast_2d(flux)
+        attenuation = self.calculate_attenuation(a_v, r_v)
+        weights = self.photometry.weights
+        f_lambda = np.empty((len(flux), len(attenuation), len(weights)))
+        # bound the number of attenuated spectra held at once: blocks of
+        # spectra times blocks of extinction values
+        spectra_step = min(len(flux), max(chunk_size, 1))
+        step = max(chunk_size // spectra_step, 1)
+        for spectra_start in range(0, len(flux), spectra_step):
+            spectra = slice(spectra_start, spectra_start + spectra_step)
+            for start in range(0, len(attenuation), step):
+                rows = slice(start, start + step)
+                # (n_block_spectra, n_rows, n_wavelength) attenuated spectra
+                f_lambda[spectra, rows] = np.dot(
+                    flux[spectra, None, :] * attenuation[rows], weights.T)
+        return f_lambda[0] if single else f_lambda
+
+    def calculate_magnitudes(self, flux, a_v, r_v=3.1, magnitude_system='ab',
+                             chunk_size=DEFAULT_CHUNK_SIZE):
+        """Magnitudes of reddened spectra, see `calculate_f_lambda`"""
+        return self.photometry.convert_f_lambda_to_magnitudes(
+            self.calculate_f_lambda(flux, a_v, r_v, chunk_size),
+            self.photometry.get_zero_points(magnitude_system))
+
+    def calculate_extinction_coefficients(self, flux, a_v=1., r_v=3.1):
+        """
+        Extinction in each filter relative to A_V, i.e.
+        ``(m(A_V) - m(0)) / A_V``, which depends on the spectrum and (weakly)
+        on A_V
+
+        Parameters
+        ----------
+
+        flux: numpy.ndarray or ~astropy.units.Quantity
+            (n_wavelength,) or (n_spectra, n_wavelength) intrinsic fluxes
+
+        a_v: float or numpy.ndarray, optional
+            non-zero A_V to evaluate the coefficients at
+
+        r_v: float or numpy.ndarray, optional
+
+        Returns
+        -------
+            : numpy.ndarray
+            same shape as the result of `calculate_f_lambda`
+        """
+        a_v, r_v = np.broadcast_arrays(
+            np.atleast_1d(np.asarray(a_v, dtype=np.float64)),
+            np.asarray(r_v, dtype=np.float64))
+        reddened = self.calculate_f_lambda(flux, a_v, r_v)
+        intrinsic = self.calculate_f_lambda(flux, 0.)
+        return -2.5 * np.log10(reddened / intrinsic) / a_v[:, None]
+
+    def tabulate_extinction_coefficients(self, flux, a_v=1., r_v=3.1,
+                                         index=None):
+        """
+        Extinction coefficients of spectra for catalogue corrections
+        ``m_intrinsic = m - coefficient * A_V``
+
+        Parameters
+        ----------
+
+        flux: numpy.ndarray or ~astropy.units.Quantity
+            (n_spectra, n_wavelength) intrinsic fluxes
+
+        a_v, r_v: float, optional
+            extinction the coefficients are evaluated at
+
+        index: list, optional
+            labels of the spectra
+
+        Returns
+        -------
+            : pandas.DataFrame
+            (n_spectra, n_filters) coefficients
+        """
+        coefficients = self.calculate_extinction_coefficients(
+            np.atleast_2d(flux), a_v, r_v)[:, 0]
+        return pd.DataFrame(coefficients, columns=self.photometry.filter_ids,
+                            index=index)
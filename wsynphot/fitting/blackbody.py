@@ -0,0 +1,302 @@
+"""Blackbody temperatures and radii from observed magnitudes
+
+Changing the radius (or distance) of a blackbody only shifts all its
+magnitudes by the same amount, so the colours depend on the temperature
+alone. `BlackbodyLookupTable` tabulates the synthetic magnitudes of a filter
+set once on a fine temperature grid for a reference radius and distance; a
+fit then only needs the best constant magnitude offset per grid temperature,
+which has a closed form and is evaluated for whole catalogues at once.
+"""
+import numpy as np
+import pandas as pd
+from astropy import units as u
+
+from wsynphot.batch import calculate_blackbody_magnitudes
+
+REFERENCE_RADIUS = 1 * u.R_sun
+REFERENCE_DISTANCE = 10 * u.pc
+
+
+class BlackbodyLookupTable(object):
+    """
+    Synthetic blackbody magnitudes on a temperature grid
+
+    Parameters
+    ----------
+
+    filter_ids: list of str
+        filters of the magnitudes
+
+    temperature: numpy.ndarray
+        (n_temperature,) increasing temperature grid in Kelvin
+
+    magnitudes: numpy.ndarray
+        (n_temperature, n_filters) magnitudes of a blackbody with radius
+        `REFERENCE_RADIUS` at distance `REFERENCE_DISTANCE`
+
+    magnitude_system: str
+        'ab' or 'vega'
+    """
+
+    def __init__(self, filter_ids, temperature, magnitudes,
+                 magnitude_system='ab'):
+        self.filter_ids = list(filter_ids)
+        self.temperature = np.asarray(temperature, dtype=np.float64)
+        self.magnitudes = np.asarray(magnitudes, dtype=np.float64)
+        self.magnitude_system = magnitude_system
+        if self.magnitudes.shape != (len(self.temperature),
+                                     len(self.filter_ids)):
+            raise ValueError('magnitudes need to have the shape '
+                             '(n_temperature, n_filters)')
+
+    @classmethod
+    def compute(cls, filter_set, temperature=None, magnitude_system='ab',
+                lambda_min=None, lambda_max=None, n_wavelength=20000,
+                chunk_size=1000):
+        """
+        Compute the lookup table for a filter set
+
+        Parameters
+        ----------
+
+        filter_set: ~wsynphot.FilterSet
+
+        temperature: ~numpy.ndarray or ~astropy.units.Quantity, optional
+            temperature grid (default: 2000 log-spaced values between 1000 K
+            and 100000 K)
+
+        magnitude_system: str, optional
+            'ab' or 'vega'
+
+        lambda_min, lambda_max: float, optional
+            wavelength range of the blackbody spectra in Angstrom (default:
+            the range covered by the filters)
+
+        n_wavelength: int, optional
+            number of wavelength points
+
+        chunk_size: int, optional
+            number of temperatures evaluated at once
+
+        Returns
+        -------
+            : BlackbodyLookupTable
+        """
+        if temperature is None:
+            temperature = np.logspace(3, 5, 2000)
+        if lambda_min is None:
+            lambda_min = min(item.wavelength.to_value(u.angstrom).min()
+                             for item in filter_set)
+        if lambda_max is None:
+            lambda_max = max(item.wavelength.to_value(u.angstrom).max()
+                             for item in filter_set)
+        dlambda = (lambda_max - lambda_min) / float(n_wavelength - 1)
+
+        magnitudes = calculate_blackbody_magnitudes(
+            filter_set, temperature, REFERENCE_RADIUS,
+            distance=REFERENCE_DISTANCE, magnitude_system=magnitude_system,
+            lambda_min=lambda_min, lambda_max=lambda_max + dlambda / 2.,
+            dlambda=dlambda, chunk_size=chunk_size)
+        return cls(magnitudes.columns, magnitudes.index.values,
+                   magnitudes.values, magnitude_system=magnitude_system)
+
+    def write(self, fpath):
+        """Write the lookup table to `fpath` (numpy .npz format)"""
+        np.savez(fpath, filter_ids=np.array(self.filter_ids),
+                 temperature=self.temperature, magnitudes=self.magnitudes,
+                 magnitude_system=self.magnitude_system)
+
+    @classmethod
+    def read(cls, fpath):
+        """Read a lookup table written by `write`"""
+        with np.load(fpath) as data:
+            return cls(data['filter_ids'].tolist(), data['temperature'],
+                       data['magnitudes'],
+                       magnitude_system=str(data['magnitude_system']))
+
+    @property
+    def colors(self):
+        """(n_temperature, n_filters - 1) colours of consecutive filters"""
+        return self.magnitudes[:, :-1] - self.magnitudes[:, 1:]
+
+    def to_dataframe(self):
+        return pd.DataFrame(self.magnitudes, columns=self.filter_ids,
+                            index=pd.Index(self.temperature,
+                                           name='temperature'))
+
+    def calculate_chi2(self, magnitudes, magnitude_uncertainties=None):
+        """
+        Chi^2 and best magnitude offset of every object at every grid
+        temperature
+
+        Parameters
+        ----------
+
+        magnitudes: numpy.ndarray
+            (n_objects, n_filters) observed magnitudes, NaN marks missing
+            values
+
+        magnitude_uncertainties: numpy.ndarray, optional
+            (n_objects, n_filters) positive uncertainties (default: all 1),
+            NaN marks missing values
+
+        Returns
+        -------
+            : numpy.ndarray, numpy.ndarray
+            (n_objects, n_temperature) chi^2 and magnitude offsets with
+            respect to the reference blackbody
+        """
+        weights, magnitudes = _prepare_weights(magnitudes,
+                                               magnitude_uncertainties)
+        sum_w = weights.sum(axis=1)[:, None]
+        sum_wm = (weights * magnitudes).sum(axis=1)[:, None]
+        sum_wmm = (weights * magnitudes ** 2).sum(axis=1)[:, None]
+        sum_wt = np.dot(weights, self.magnitudes.T)
+        sum_wmt = np.dot(weights * magnitudes, self.magnitudes.T)
+        sum_wtt = np.dot(weights, (self.magnitudes ** 2).T)
+
+        with np.errstate(invalid='ignore', divide='ignore'):
+            offset = (sum_wm - sum_wt) / sum_w
+            chi2 = sum_wmm - 2 * sum_wmt + sum_wtt - offset ** 2 * sum_w
+        return np.maximum(chi2, 0.), offset
+
+    def fit(self, magnitudes, magnitude_uncertainties=None,
+            distance=REFERENCE_DISTANCE, chunk_size=10000, coarse_step=16):
+        """
+        Fit blackbody temperatures and radii to observed magnitudes
+
+        The chi^2 is first evaluated on every `coarse_step`-th grid
+        temperature, then on all grid temperatures around the coarse minimum.
+        The best grid temperature is refined by a parabola through the chi^2
+        of it and its neighbours in log temperature.
+
+        Parameters
+        ----------
+
+        magnitudes: numpy.ndarray
+            (n_objects, n_filters) observed magnitudes in the filters and
+            magnitude system of the table, NaN marks missing values
+
+        magnitude_uncertainties: numpy.ndarray, optional
+            (n_objects, n_filters) positive uncertainties (default: all 1),
+            NaN marks missing values
+
+        distance: ~astropy.units.Quantity, optional
+            distance of the objects, a scalar or one per object (default is
+            10 pc)
+
+        chunk_size: int, optional
+            number of objects fitted at once
+
+        coarse_step: int, optional
+            stride of the coarse search, 1 searches the full grid
+
+        Returns
+        -------
+            : pandas.DataFrame
+            'temperature' (K), 'radius' (solar radii) and 'chi2' per object
+        """
+        magnitudes = np.atleast_2d(np.asarray(magnitudes, dtype=np.float64))
+        if magnitudes.shape[1] != len(self.filter_ids):
+            raise ValueError('magnitudes need to have one column per filter '
+                             '({0})'.format(len(self.filter_ids)))
+        if magnitude_uncertainties is not None:
+            magnitude_uncertainties = np.broadcast_to(
+                magnitude_uncertainties, magnitudes.shape)
+
+        n_objects = len(magnitudes)
+        best_log_temperature = np.empty(n_objects)
+        best_offset = np.empty(n_objects)
+        best_chi2 = np.empty(n_objects)
+        for start in range(0, n_objects, chunk_size):
+            rows = slice(start, min(start + chunk_size, n_objects))
+            (best_log_temperature[rows], best_offset[rows],
+             best_chi2[rows]) = self._fit_chunk(
+                magnitudes[rows], None if magnitude_uncertainties is None
+                else magnitude_uncertainties[rows], coarse_step)
+
+        distance_ratio = (distance / REFERENCE_DISTANCE).to_value(
+            u.dimensionless_unscaled)
+        radius = (REFERENCE_RADIUS.to_value(u.R_sun) * distance_ratio *
+                  10 ** (-0.2 * best_offset))
+        return pd.DataFrame({'temperature': 10 ** best_log_temperature,
+                             'radius': radius, 'chi2': best_chi2})
+
+    def _fit_chunk(self, magnitudes, magnitude_uncertainties, coarse_step):
+        n_temperature = len(self.temperature)
+        coarse_step = max(min(coarse_step, n_temperature // 3), 1)
+        coarse_idx = np.arange(0, n_temperature, coarse_step)
+        coarse_table = BlackbodyLookupTable(
+            self.filter_ids, self.temperature[coarse_idx],
+            self.magnitudes[coarse_idx])
+        chi2, _ = coarse_table.calculate_chi2(magnitudes,
+                                              magnitude_uncertainties)
+        chi2 = np.where(np.isfinite(chi2), chi2, np.inf)
+        center = coarse_idx[np.argmin(chi2, axis=1)]
+
+        # all grid temperatures within one coarse step of the coarse minimum
+        window = np.arange(min(2 * coarse_step + 1, n_temperature))
+        first = np.clip(center - coarse_step, 0, n_temperature - len(window))
+        idx = first[:, None] + window
+
+        weights, magnitudes = _prepare_weights(magnitudes,
+                                               magnitude_uncertainties)
+        residual = magnitudes[:, None, :] - self.magnitudes[idx]
+        sum_w = weights.sum(axis=1)[:, None]
+        with np.errstate(invalid='ignore', divide='ignore'):
+            offset = np.einsum('ij,ikj->ik', weights, residual) / sum_w
+            chi2 = (np.einsum('ij,ikj->ik', weights, residual ** 2) -
+                    offset ** 2 * sum_w)
+        return _refine_minimum(np.log10(self.temperature)[idx],
+                               np.maximum(chi2, 0.), offset)
+
+
+def _prepare_weights(magnitudes, magnitude_uncertainties):
+    """Weights 1/sigma^2 (all 1 without uncertainties), zeroing the weights
+    and magnitudes of missing values"""
+    magnitudes = np.atleast_2d(np.asarray(magnitudes, dtype=np.float64))
+    if magnitude_uncertainties is None:
+        weights = np.ones_like(magnitudes)
+    else:
+        magnitude_uncertainties = np.atleast_2d(
+            np.asarray(magnitude_uncertainties, dtype=np.float64))
+        if (magnitude_uncertainties <= 0).any():
+            raise ValueError('magnitude_uncertainties need to be positive')
+        weights = magnitude_uncertainties ** -2
+    missing = ~np.isfinite(magnitudes) | np.isnan(weights)
+    return (np.where(missing, 0., weights),
+            np.where(missing, 0., magnitudes))
+
+
+def _refine_minimum(x, chi2, offset):
+    """
+    Minimum of each row of `chi2` on the grids `x` (one row per object),
+    refined by a parabola through the minimum and its two neighbours
+
+    Returns
+    -------
+        : numpy.ndarray, numpy.ndarray, numpy.ndarray
+        x, linearly interpolated offset and chi^2 at the minimum per row
+    """
+    rows = np.arange(len(chi2))
+    chi2 = np.where(np.isfinite(chi2), chi2, np.inf)
+    idx = np.clip(np.argmin(chi2, axis=1), 1, chi2.shape[1] - 2)
+
+    x0, x1, x2 = x[rows, idx - 1], x[rows, idx], x[rows, idx + 1]
+    y0, y1, y2 = chi2[rows, idx - 1], chi2[rows, idx], chi2[rows, idx + 1]
+    with np.errstate(invalid='ignore', divide='ignore'):
+        numerator = ((x1 - x0) ** 2 * (y1 - y2) - (x1 - x2) ** 2 * (y1 - y0))
+        denominator = ((x1 - x0) * (y1 - y2) - (x1 - x2) * (y1 - y0))
+        x_min = x1 - 0.5 * numerator / denominator
+    # fall back to the grid point at the edges and for non-convex triplets
+    x_min = np.where(np.isfinite(x_min) & (denominator != 0),
+                     np.clip(x_min, x0, x2), x1)
+
+    lower = np.where(x_min < x1, idx - 1, idx)
+    fraction = (x_min - x[rows, lower]) / (x[rows, lower + 1] -
+                                           x[rows, lower])
+    offset_min = ((1 - fraction) * offset[rows, lower] +
+                  fraction * offset[rows, lower + 1])
+    chi2_min = ((1 - fraction) * chi2[rows, lower] +
+                fraction * chi2[rows, lower + 1])
+    return x_min, offset_min, chi2_min
@@ -0,0 +1,272 @@
+"""Fitting of template spectra to observed magnitudes
+
+The synthetic fluxes of all templates through a filter set are computed once
+as a (n_templates, n_filters) matrix `T`. For observed fluxes `F` with weights
+`w` the best normalisation of template `t` and its chi^2 are
+
+.. math::
+
+    a_t = \\frac{\\sum w F T_t}{\\sum w T_t^2}, \\qquad
+    \\chi^2_t = \\sum w F^2 - \\frac{(\\sum w F T_t)^2}{\\sum w T_t^2}
+
+which for a block of objects are two matrix products with `T`.
+"""
+from functools import partial
+
+import numpy as np
+import pandas as pd
+
+from wsynphot.batch import DEFAULT_CHUNK_SIZE
+from wsynphot.executors import get_chunks, map_chunks
+
+
+def convert_magnitudes_to_f_lambda(magnitudes, magnitude_uncertainties,
+                                   zero_points):
+    """
+    Observed magnitudes as fluxes and (linearised) flux uncertainties
+
+    Parameters
+    ----------
+    magnitudes : numpy.ndarray
+        (n_objects, n_filters) magnitudes, NaN marks missing values
+    magnitude_uncertainties : numpy.ndarray or None
+        (n_objects, n_filters) uncertainties, None weights all magnitudes
+        equally with 0.1 mag
+    zero_points : numpy.ndarray
+        (n_filters,) zero points in erg/s/cm^2/Angstrom
+
+    Returns
+    -------
+    numpy.ndarray, numpy.ndarray
+        fluxes and weights (1/sigma^2); missing values have both set to 0
+    """
+    magnitudes = np.atleast_2d(np.asarray(magnitudes, dtype=np.float64))
+    if magnitude_uncertainties is None:
+        magnitude_uncertainties = 0.1
+    magnitude_uncertainties = np.broadcast_to(
+        np.asarray(magnitude_uncertainties, dtype=np.float64),
+        magnitudes.shape)
+    f_lambda = zero_points * 10 ** (-0.4 * magnitudes)
+    f_lambda_uncertainties = 0.4 * np.log(10) * f_lambda * \
+        magnitude_uncertainties
+    with np.errstate(divide='ignore'):
+        weights = f_lambda_uncertainties ** -2
+    missing = ~np.isfinite(f_lambda) | ~np.isfinite(weights)
+    return np.where(missing, 0., f_lambda), np.where(missing, 0., weights)
+
+
+def stack_magnitude_sets(magnitude_sets):
+    """
+    Magnitudes and uncertainties of a list of `~wsynphot.MagnitudeSet` with
+    the same filters as (n_objects, n_filters) arrays, missing uncertainties
+    are 0.1 mag
+    """
+    magnitudes = np.array([item.magnitudes for item in magnitude_sets],
+                          dtype=np.float64)
+    uncertainties = np.full_like(magnitudes, 0.1)
+    for i, item in enumerate(magnitude_sets):
+        if np.ndim(item.magnitude_uncertainties) > 0:
+            uncertainties[i] = item.magnitude_uncertainties
+    return magnitudes, uncertainties
+
+
+def _calculate_chi2(magnitudes, magnitude_uncertainties, template_f_lambda,
+                    zero_points):
+    f_lambda, weights = convert_magnitudes_to_f_lambda(
+        magnitudes, magnitude_uncertainties, zero_points)
+    sum_wff = (weights * f_lambda ** 2).sum(axis=1)[:, None]
+    sum_wft = np.dot(weights * f_lambda, template_f_lambda.T)
+    sum_wtt = np.dot(weights, (template_f_lambda ** 2).T)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        scale = np.maximum(sum_wft / sum_wtt, 0.)
+    chi2 = sum_wff - 2 * scale * sum_wft + scale ** 2 * sum_wtt
+    return np.maximum(chi2, 0.), scale
+
+
+# the chunk functions are module level, so that process and dask executors
+# can pickle them
+
+def _fit_chunk(chunk, template_f_lambda, zero_points):
+    chi2, scale = _calculate_chi2(chunk[0], chunk[1], template_f_lambda,
+                                  zero_points)
+    best = np.argmin(chi2, axis=1)
+    idx = np.arange(len(best))
+    return best, scale[idx, best], chi2[idx, best]
+
+
+def _likelihood_chunk(chunk, template_f_lambda, zero_points):
+    chi2, _ = _calculate_chi2(chunk[0], chunk[1], template_f_lambda,
+                              zero_points)
+    likelihood = np.exp(-0.5 * (chi2 - chi2.min(axis=1)[:, None]))
+    return likelihood / likelihood.sum(axis=1)[:, None]
+
+
+class TemplateFitter(object):
+    """
+    Fit a library of template spectra to catalogues of observed magnitudes
+
+    Parameters
+    ----------
+
+    template_f_lambda: numpy.ndarray
+        (n_templates, n_filters) synthetic flux densities of the templates
+        in erg/s/cm^2/Angstrom
+
+    zero_points: numpy.ndarray
+        (n_filters,) zero points of the magnitude system
+
+    template_names: list, optional
+        names of the templates (default: their indices)
+
+    n_workers: int, optional
+        number of workers the chunks are fitted in (default: all cores)
+
+    executor: str or object, optional
+        where the chunks are fitted, see `~wsynphot.executors` (default:
+        a thread pool, numpy releases the GIL in the matrix products)
+    """
+
+    def __init__(self, template_f_lambda, zero_points, template_names=None,
+                 n_workers=None, executor='threads'):
+        self.template_f_lambda = np.atleast_2d(
+            np.asarray(template_f_lambda, dtype=np.float64))
+        self.zero_points = np.asarray(zero_points, dtype=np.float64)
+        if template_names is None:
+            template_names = np.arange(len(self.template_f_lambda))
+        self.template_names = np.asarray(template_names)
+        self.n_workers = n_workers
+        self.executor = executor
+
+    @classmethod
+    def from_spectra(cls, filter_set, wavelength, template_flux,
+                     magnitude_system='ab', template_names=None,
+                     chunk_size=DEFAULT_CHUNK_SIZE, **kwargs):
+        """
+        Compute the template flux matrix from template spectra on a common
+        wavelength grid
+
+        Parameters
+        ----------
+
+        filter_set: ~wsynphot.FilterSet
+
+        wavelength: ~astropy.units.Quantity or numpy.ndarray
+            (n_wavelength,) grid (plain arrays are in Angstrom)
+
+        template_flux: ~astropy.units.Quantity or numpy.ndarray
+            (n_templates, n_wavelength) fluxes (plain arrays are in
+            erg/s/cm^2/Angstrom)
+
+        magnitude_system: str, optional
+            'ab' or 'vega', the system of the magnitudes to be fitted
+
+        template_names: list, optional
+            names of the templates
+
+        chunk_size: int, optional
+            number of templates integrated at once
+
+        Returns
+        -------
+            : TemplateFitter
+        """
+        photometry = filter_set.get_batch_photometry(wavelength)
+        return cls(photometry.calculate_f_lambda(template_flux, chunk_size),
+                   photometry.get_zero_points(magnitude_system),
+                   template_names=template_names, **kwargs)
+
+    @property
+    def template_magnitudes(self):
+        """(n_templates, n_filters) magnitudes of the unscaled templates"""
+        return -2.5 * np.log10(self.template_f_lambda / self.zero_points)
+
+    def calculate_chi2(self, magnitudes, magnitude_uncertainties=None):
+        """
+        Chi^2 and best normalisation of every object for every template
+
+        Parameters
+        ----------
+
+        magnitudes: numpy.ndarray
+            (n_objects, n_filters) observed magnitudes, NaN marks missing
+            values
+
+        magnitude_uncertainties: numpy.ndarray, optional
+            (n_objects, n_filters) uncertainties
+
+        Returns
+        -------
+            : numpy.ndarray, numpy.ndarray
+            (n_objects, n_templates) chi^2 and scale factors; negative
+            scales are clipped to 0
+        """
+        return _calculate_chi2(magnitudes, magnitude_uncertainties,
+                               self.template_f_lambda, self.zero_points)
+
+    def _map_chunks(self, function, magnitudes, magnitude_uncertainties,
+                    chunk_size):
+        magnitudes = np.atleast_2d(magnitudes)
+        if magnitude_uncertainties is not None:
+            magnitude_uncertainties = np.broadcast_to(magnitude_uncertainties,
+                                                      magnitudes.shape)
+        chunks = get_chunks(len(magnitudes), chunk_size)
+        return map_chunks(
+            partial(function, template_f_lambda=self.template_f_lambda,
+                    zero_points=self.zero_points),
+            [(magnitudes[rows], None if magnitude_uncertainties is None
+              else magnitude_uncertainties[rows]) for rows in chunks],
+            self.executor, self.n_workers)
+
+    def fit(self, magnitudes, magnitude_uncertainties=None,
+            chunk_size=DEFAULT_CHUNK_SIZE):
+        """
+        Best fitting template and normalisation for every object
+
+        Parameters
+        ----------
+
+        magnitudes: numpy.ndarray
+            (n_objects, n_filters) observed magnitudes, NaN marks missing
+            values
+
+        magnitude_uncertainties: numpy.ndarray, optional
+            (n_objects, n_filters) uncertainties
+
+        chunk_size: int, optional
+            number of objects fitted at once
+
+        Returns
+        -------
+            : pandas.DataFrame
+            per object: index and name of the best 'template', its 'scale'
+            and 'chi2', and the number of filters used ('n_filters')
+        """
+        magnitudes = np.atleast_2d(magnitudes)
+        results = self._map_chunks(_fit_chunk, magnitudes,
+                                   magnitude_uncertainties, chunk_size)
+        best, scale, chi2 = [np.concatenate(values)
+                             for values in zip(*results)]
+        return pd.DataFrame({
+            'template_index': best,
+            'template': self.template_names[best],
+            'scale': scale, 'chi2': chi2,
+            'n_filters': np.isfinite(magnitudes).sum(axis=1)})
+
+    def fit_magnitude_sets(self, magnitude_sets, **kwargs):
+        """`fit` a list of `~wsynphot.MagnitudeSet` observations"""
+        return self.fit(*stack_magnitude_sets(magnitude_sets), **kwargs)
+
+    def calculate_likelihood(self, magnitudes, magnitude_uncertainties=None,
+                             chunk_size=DEFAULT_CHUNK_SIZE):
+        """
+        Likelihood grid exp(-chi^2 / 2) over the templates, normalised to a
+        sum of 1 per object
+
+        Returns
+        -------
+            : numpy.ndarray
+            (n_objects, n_templates)
+        """
+        return np.concatenate(self._map_chunks(
+            _likelihood_chunk, magnitudes, magnitude_uncertainties,
+            chunk_size))
@@ -0,0 +1,50 @@
+import os
+
+import numpy as np
+import pytest
+from astropy import units as u
+
+from wsynphot.fitting.blackbody import BlackbodyLookupTable
+from wsynphot.tests.helpers import make_filter_set
+
+
+@pytest.fixture(scope='module')
+def filter_set():
+    return make_filter_set([3500, 4500, 5500, 7000, 9000])
+
+
+@pytest.fixture(scope='module')
+def lookup_table(filter_set):
+    return BlackbodyLookupTable.compute(filter_set,
+                                        temperature=np.logspace(3, 4.5, 500))
+
+
+def test_fit(filter_set, lookup_table):
+    temperature = np.array([3100., 5780., 12345.])
+    radius = [0.5, 1., 3.] * u.R_sun
+    magnitudes = filter_set.calculate_blackbody_magnitudes(
+        temperature, radius, lambda_min=1000, lambda_max=15000).values
+
+    fit = lookup_table.fit(magnitudes, 0.01, chunk_size=2)
+    np.testing.assert_allclose(fit['temperature'], temperature, rtol=2e-3)
+    np.testing.assert_allclose(fit['radius'], radius.value, rtol=5e-3)
+
+    # missing magnitudes are ignored
+    magnitudes[1, 2] = np.nan
+    fit = lookup_table.fit(magnitudes)
+    np.testing.assert_allclose(fit['temperature'][1], 5780., rtol=2e-3)
+
+    # exact measurements are not taken as missing ones
+    with pytest.raises(ValueError):
+        lookup_table.fit(magnitudes, np.where(np.isnan(magnitudes), 0.01, 0.))
+
+
+def test_write_read(lookup_table, tmpdir):
+    fpath = os.path.join(str(tmpdir), 'lookup_table.npz')
+    lookup_table.write(fpath)
+    lookup_table_read = BlackbodyLookupTable.read(fpath)
+    assert lookup_table_read.filter_ids == lookup_table.filter_ids
+    assert lookup_table_read.magnitude_system == 'ab'
+    np.testing.assert_array_equal(lookup_table_read.magnitudes,
+                                  lookup_table.magnitudes)
+    assert lookup_table_read.colors.shape == (500, 4)
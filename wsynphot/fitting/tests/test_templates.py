@@ -0,0 +1,48 @@
+import numpy as np
+import pytest
+
+from wsynphot import MagnitudeSet
+from wsynphot.fitting.templates import TemplateFitter
+from wsynphot.spectrum1d import blackbody_lambda_grid
+from wsynphot.tests.helpers import make_filter_set
+
+
+@pytest.fixture(scope='module')
+def filter_set():
+    return make_filter_set([3500, 4500, 5500, 7000, 9000])
+
+
+@pytest.fixture(scope='module')
+def fitter(filter_set):
+    wavelength = np.linspace(1000, 15000, 5000)
+    temperature = np.linspace(3000, 20000, 50)
+    return TemplateFitter.from_spectra(
+        filter_set, wavelength, blackbody_lambda_grid(wavelength, temperature),
+        template_names=temperature, n_workers=2)
+
+
+def test_fit(fitter):
+    template_idx = np.array([3, 17, 42, 17])
+    scale = np.array([1e-20, 2e-21, 5e-22, 1e-19])
+    magnitudes = fitter.template_magnitudes[template_idx] - \
+        2.5 * np.log10(scale)[:, None]
+    magnitudes[3, 1] = np.nan
+
+    fit = fitter.fit(magnitudes, 0.01, chunk_size=3)
+    np.testing.assert_array_equal(fit['template_index'], template_idx)
+    np.testing.assert_allclose(fit['template'], fitter.template_names[
+        template_idx])
+    np.testing.assert_allclose(fit['scale'], scale, rtol=1e-10)
+    np.testing.assert_allclose(fit['chi2'], 0., atol=1e-8)
+    np.testing.assert_array_equal(fit['n_filters'], [5, 5, 5, 4])
+
+    likelihood = fitter.calculate_likelihood(magnitudes, 0.01, chunk_size=3)
+    np.testing.assert_allclose(likelihood.sum(axis=1), 1.)
+    np.testing.assert_array_equal(likelihood.argmax(axis=1), template_idx)
+
+
+def test_fit_magnitude_sets(filter_set, fitter):
+    magnitude_sets = [MagnitudeSet(filter_set, magnitudes)
+                      for magnitudes in fitter.template_magnitudes[[5, 9]]]
+    fit = fitter.fit_magnitude_sets(magnitude_sets)
+    np.testing.assert_array_equal(fit['template_index'], [5, 9])
@@ -0,0 +1,280 @@
+"""Synthetic photometry on regular grids of model parameters
+
+Model atmosphere libraries tabulate spectra on regular grids of parameters
+such as (Teff, logg, [Fe/H]). `PhotometricGrid` integrates all grid spectra
+through a `~wsynphot.FilterSet` once and afterwards interpolates in
+magnitude space, so evaluating magnitudes at arbitrary parameters neither
+interpolates spectra nor integrates them.
+"""
+from functools import partial
+
+import numpy as np
+from scipy import ndimage
+
+from wsynphot.batch import (DEFAULT_CHUNK_SIZE, BatchPhotometry,
+                            _calculate_f_lambda_chunk)
+from wsynphot.executors import get_chunks, is_in_process, map_chunks
+from wsynphot.io.photometry_cache import get_photometry_cache
+
+INTERPOLATION_ORDERS = {'nearest': 0, 'linear': 1, 'cubic': 3}
+
+
+def _compute_grid_chunk(chunk, flux, wavelength, weights, zero_points):
+    # module level, so that process and dask executors can pickle it
+    if callable(flux):
+        chunk = flux(chunk)
+    return BatchPhotometry.convert_f_lambda_to_magnitudes(
+        _calculate_f_lambda_chunk(chunk, wavelength, weights), zero_points)
+
+
+def _is_evenly_spaced(values):
+    steps = np.diff(values)
+    return len(steps) == 0 or np.allclose(steps, steps[0], rtol=1e-8, atol=0)
+
+
+class PhotometricGrid(object):
+    """
+    Magnitudes of a filter set on a regular grid of model parameters
+
+    Parameters
+    ----------
+
+    parameter_names: list of str
+        names of the grid axes, e.g. ['teff', 'logg', 'feh']
+
+    parameter_values: list of numpy.ndarray
+        strictly increasing grid values of each axis
+
+    filter_ids: list of str
+        filters of the magnitudes
+
+    magnitudes: numpy.ndarray
+        magnitudes with shape (n_1, ..., n_d, n_filters)
+
+    magnitude_system: str
+        'ab' or 'vega'
+    """
+
+    def __init__(self, parameter_names, parameter_values, filter_ids,
+                 magnitudes, magnitude_system='ab'):
+        self.parameter_names = list(parameter_names)
+        self.parameter_values = [np.asarray(values, dtype=np.float64)
+                                 for values in parameter_values]
+        self.filter_ids = list(filter_ids)
+        self.magnitudes = np.asarray(magnitudes, dtype=np.float64)
+        self.magnitude_system = magnitude_system
+        if len(self.parameter_names) != len(self.parameter_values):
+            raise ValueError('parameter_names and parameter_values need to '
+                             'have the same length')
+        if self.magnitudes.shape != self.shape + (len(self.filter_ids),):
+            raise ValueError('magnitudes need to have the shape {0}'.format(
+                self.shape + (len(self.filter_ids),)))
+        for name, values in zip(self.parameter_names, self.parameter_values):
+            if np.any(np.diff(values) <= 0):
+                raise ValueError('values of parameter {0} need to be strictly '
+                                 'increasing'.format(name))
+        self._spline_coefficients = {}
+
+    @property
+    def shape(self):
+        """Shape of the parameter grid"""
+        return tuple(len(values) for values in self.parameter_values)
+
+    @property
+    def points(self):
+        """(n_grid_points, n_parameters) parameters of all grid points in C
+        order"""
+        return np.stack([axis.ravel() for axis in np.meshgrid(
+            *self.parameter_values, indexing='ij')], axis=-1)
+
+    @classmethod
+    def compute(cls, filter_set, parameter_names, parameter_values,
+                wavelength, flux, magnitude_system='ab',
+                chunk_size=DEFAULT_CHUNK_SIZE, n_workers=None, cache=None,
+                executor='threads'):
+        """
+        Integrate the spectra of a parameter grid through a filter set
+
+        Parameters
+        ----------
+
+        filter_set: ~wsynphot.FilterSet
+
+        parameter_names: list of str
+
+        parameter_values: list of numpy.ndarray
+            strictly increasing grid values of each axis
+
+        wavelength: ~astropy.units.Quantity or numpy.ndarray
+            (n_wavelength,) common grid of the spectra (plain arrays are in
+            Angstrom)
+
+        flux: numpy.ndarray or callable
+            (n_1, ..., n_d, n_wavelength) fluxes (plain arrays are in
+            erg/s/cm^2/Angstrom, memory maps are read chunk by chunk) or a
+            function returning the (n_points, n_wavelength) fluxes for an
+            (n_points, n_parameters) array of grid parameters
+
+        magnitude_system: str, optional
+            'ab' or 'vega'
+
+        chunk_size: int, optional
+            number of spectra integrated at once
+
+        n_workers: int, optional
+            number of workers the chunks are integrated in (default: all
+            cores)
+
+        cache: ~wsynphot.io.photometry_cache.PhotometryCache, str or bool
+            persistent photometry cache, see
+            `~wsynphot.FilterSet.calculate_f_lambda_batch`; only usable with
+            the 'serial' and 'threads' executors
+
+        executor: str or object, optional
+            where the chunks are integrated, see `~wsynphot.executors`
+            (default: a thread pool); with processes or dask a callable
+            `flux` needs to be picklable
+
+        Returns
+        -------
+            : PhotometricGrid
+        """
+        grid = cls(parameter_names, parameter_values,
+                   [item.filter_id for item in filter_set],
+                   np.empty(tuple(len(values) for values in parameter_values)
+                            + (len(filter_set.filter_set),)),
+                   magnitude_system=magnitude_system)
+        photometry = filter_set.get_batch_photometry(wavelength)
+        zero_points = photometry.get_zero_points(magnitude_system)
+        cache = get_photometry_cache(cache)
+        if cache is not None and not is_in_process(executor):
+            raise ValueError('The photometry cache can only be used with the '
+                             "'serial' and 'threads' executors")
+        points = grid.points
+        magnitudes = grid.magnitudes.reshape(len(points), -1)
+        chunks = get_chunks(len(points), chunk_size)
+        if callable(flux):
+            chunk_data = [points[rows] for rows in chunks]
+        else:
+            flux_rows = flux.reshape(len(points), -1)
+            chunk_data = [flux_rows[rows] for rows in chunks]
+
+        if cache is None:
+            compute_chunk = partial(
+                _compute_grid_chunk, flux=flux if callable(flux) else None,
+                wavelength=photometry.wavelength, weights=photometry.weights,
+                zero_points=zero_points)
+        else:
+            def compute_chunk(chunk):
+                if callable(flux):
+                    chunk = flux(chunk)
+                return cache.calculate(photometry, chunk, magnitude_system,
+                                       chunk_size)[1]
+
+        results = map_chunks(compute_chunk, chunk_data, executor, n_workers)
+        for rows, chunk_magnitudes in zip(chunks, results):
+            magnitudes[rows] = chunk_magnitudes
+        return grid
+
+    def write(self, fpath):
+        """Write the grid to `fpath` (numpy .npz format)"""
+        arrays = {'parameter_{0}'.format(i): values
+                  for i, values in enumerate(self.parameter_values)}
+        np.savez(fpath, parameter_names=np.array(self.parameter_names),
+                 filter_ids=np.array(self.filter_ids),
+                 magnitudes=self.magnitudes,
+                 magnitude_system=self.magnitude_system, **arrays)
+
+    @classmethod
+    def read(cls, fpath):
+        """Read a grid written by `write`"""
+        with np.load(fpath) as data:
+            parameter_names = data['parameter_names'].tolist()
+            return cls(parameter_names,
+                       [data['parameter_{0}'.format(i)]
+                        for i in range(len(parameter_names))],
+                       data['filter_ids'].tolist(), data['magnitudes'],
+                       magnitude_system=str(data['magnitude_system']))
+
+    def _get_fractional_indices(self, points):
+        """(n_parameters, n_points) positions of `points` in grid index
+        space, NaN outside of the grid"""
+        indices = np.empty(points.shape[::-1])
+        for i, values in enumerate(self.parameter_values):
+            indices[i] = np.interp(points[:, i], values,
+                                   np.arange(len(values)),
+                                   left=np.nan, right=np.nan)
+        return indices
+
+    def _get_spline_coefficients(self, order):
+        if order not in self._spline_coefficients:
+            self._spline_coefficients[order] = np.stack(
+                [ndimage.spline_filter(self.magnitudes[..., i], order=order,
+                                       mode='nearest')
+                 for i in range(len(self.filter_ids))], axis=-1)
+        return self._spline_coefficients[order]
+
+    def interpolate(self, points, method='linear'):
+        """
+        Magnitudes at arbitrary parameters
+
+        'linear' is multilinear interpolation between the surrounding grid
+        points. 'cubic' evaluates a cubic spline through the grid in index
+        space and therefore requires evenly spaced grid axes.
+
+        Parameters
+        ----------
+
+        points: numpy.ndarray
+            (n_points, n_parameters) or (n_parameters,) parameters in the
+            order of `parameter_names`
+
+        method: str, optional
+            'nearest', 'linear' or 'cubic'
+
+        Returns
+        -------
+            : numpy.ndarray
+            (n_points, n_filters) or (n_filters,) magnitudes, NaN outside
+            of the grid
+        """
+        try:
+            order = INTERPOLATION_ORDERS[method]
+        except KeyError:
+            raise ValueError('method needs to be one of {0}, not {1!r}'.format(
+                sorted(INTERPOLATION_ORDERS), method))
+        if order > 1:
+            uneven = [name for name, values in zip(self.parameter_names,
+                                                   self.parameter_values)
+                      if not _is_evenly_spaced(values)]
+            if uneven:
+                raise ValueError(
+                    "method {0!r} requires evenly spaced grid axes, but {1} "
+                    "are not; use method='linear'".format(
+                        method, ', '.join(uneven)))
+        points = np.asarray(points, dtype=np.float64)
+        single = points.ndim == 1
+        points = np.atleast_2d(points)
+        if points.shape[1] != len(self.parameter_names):
+            raise ValueError('points need to have one column per parameter '
+                             '({0})'.format(len(self.parameter_names)))
+
+        indices = self._get_fractional_indices(points)
+        outside = np.isnan(indices).any(axis=0)
+        indices[:, outside] = 0.
+        if order == 0:
+            indices = np.round(indices)
+        if order > 1:
+            values = self._get_spline_coefficients(order)
+        else:
+            values = self.magnitudes
+        magnitudes = np.empty((len(points), len(self.filter_ids)))
+        for i in range(len(self.filter_ids)):
+            magnitudes[:, i] = ndimage.map_coordinates(
+                values[..., i], indices, order=max(order, 1), mode='nearest',
+                prefilter=False)
+        magnitudes[outside] = np.nan
+        return magnitudes[0] if single else magnitudes
+
+    def __call__(self, points, method='linear'):
+        return self.interpolate(points, method=method)
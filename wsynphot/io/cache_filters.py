@@ -12,6 +12,7 @@ from astropy.io.votable import parse, parse_single_table
 from wsynphot.io.get_filter_data import (get_filter_index_in_batches,
                                          get_transmission_data)
 from wsynphot.config import get_cache_dir, set_cache_updation_date
+from wsynphot.util.profiling import timed
 
 CACHE_DIR = get_cache_dir()
 logger = logging.getLogger(__name__)
@@ -63,6 +64,7 @@ def download_filter_data(filter_ids=None, cache_dir=CACHE_DIR):
     return failed_filter_ids
 
 
+@timed('download_svo_filters_index')
 def download_svo_filters_index(cache_dir=CACHE_DIR):
     """Downloads index of all filters present at SVO in the cache.
 
@@ -76,6 +78,7 @@ def download_svo_filters_index(cache_dir=CACHE_DIR):
     index_table.write(fpath, format='votable', overwrite=True)
 
 
+@timed('download_transmission_data')
 def download_transmission_data(filter_id, cache_dir=CACHE_DIR):
     """Downloads transmission data for the requested filter ID systematically  
     on disk as cache (in facility/instrument/ directory).
@@ -245,6 +248,7 @@ def load_svo_filters_index(cache_dir=CACHE_DIR):
     return df_from_votable(svo_filter_index_loc)
 
 
+@timed('load_transmission_data')
 def load_transmission_data(filter_id, cache_dir=CACHE_DIR):
     """Loads transmission data (and metadata) of the requested filter from the 
     cached filter data present on disk.
@@ -282,6 +286,7 @@ def load_transmission_data(filter_id, cache_dir=CACHE_DIR):
     return transmission_df, detector_type
 
 
+@timed('df_from_votable')
 def df_from_votable(votable_path):
     """Parses the passed VOTable to produce data in a usable table format as 
     pandas dataframe.
@@ -328,6 +333,7 @@ def remove_empty_dirs(root_dir):
                 os.rmdir(dirpath)
 
 
+@timed('detector_type_from_votable')
 def detector_type_from_votable(votable_path):
     """Parses the passed VOTable to fetch detector type.
 
@@ -0,0 +1,424 @@
+"""Persistent, content-addressed cache of synthetic photometry
+
+Results are addressed by content rather than by name: a spectrum by a hash of
+its wavelength grid and flux, a filter by a hash of its transmission curve,
+detector type and interpolation, and Vega magnitudes additionally by a hash
+of the calibration file. Renaming or re-downloading identical data therefore
+still hits the cache, while any change to the inputs misses it.
+
+The results for one ordered list of filters in one magnitude system form a
+table, stored in its own directory as segments of columns (spectrum keys,
+f_lambda and magnitudes) in numpy .npz files. Segments are only ever added,
+each written atomically, so several jobs can share a cache directory.
+"""
+import hashlib
+import json
+import logging
+import os
+import shutil
+import tempfile
+import threading
+
+import numpy as np
+from astropy import units as u
+
+from wsynphot.batch import DEFAULT_CHUNK_SIZE, to_f_lambda
+from wsynphot.config import get_photometry_cache_dir
+from wsynphot.util.cache import LRUCache
+
+logger = logging.getLogger(__name__)
+
+FORMAT_VERSION = 1
+SEGMENT_PREFIX = 'segment-'
+SEGMENT_SUFFIX = '.npz'
+
+# hashes of calibration files by (path, size, modification time)
+_calibration_hashes = {}
+
+
+def hash_arrays(*arrays):
+    """Hex digest of the content (dtype, shape and data) of arrays"""
+    digest = hashlib.sha1()
+    for array in arrays:
+        array = np.ascontiguousarray(array)
+        digest.update(array.dtype.str.encode())
+        digest.update(str(array.shape).encode())
+        digest.update(array.tobytes())
+    return digest.hexdigest()
+
+
+def calibration_file_hash(fpath):
+    """Hex digest of the content of a calibration file"""
+    stat = os.stat(fpath)
+    key = (os.path.abspath(fpath), stat.st_size, stat.st_mtime)
+    if key not in _calibration_hashes:
+        digest = hashlib.sha1()
+        with open(fpath, 'rb') as fh:
+            for block in iter(lambda: fh.read(1 << 20), b''):
+                digest.update(block)
+        _calibration_hashes[key] = digest.hexdigest()
+    return _calibration_hashes[key]
+
+
+def filter_content_hash(filter, magnitude_system='ab'):
+    """
+    Hex digest identifying the photometry of a filter in a magnitude system
+
+    Parameters
+    ----------
+    filter : ~wsynphot.FilterCurve
+    magnitude_system : str
+        'ab' or 'vega', the latter includes the hash of the calibration file
+        of the filter
+
+    Returns
+    -------
+    str
+    """
+    if magnitude_system not in ('ab', 'vega'):
+        raise ValueError("magnitude_system needs to be 'ab' or 'vega', "
+                         "not {0!r}".format(magnitude_system))
+    digest = hashlib.sha1(hash_arrays(
+        filter.wavelength.to_value(u.angstrom).astype(np.float64),
+        np.asarray(filter.transmission_lambda, dtype=np.float64)).encode())
+    digest.update('{0}|{1}|{2}'.format(
+        int(filter.detector_type), filter.interpolation_kind,
+        magnitude_system).encode())
+    if magnitude_system == 'vega':
+        from wsynphot.calibration import default_vega_path
+        digest.update(calibration_file_hash(
+            filter.vega_fpath or default_vega_path).encode())
+    return digest.hexdigest()
+
+
+def spectrum_hashes(wavelength, flux):
+    """
+    Hex digests of spectra on a common wavelength grid
+
+    Parameters
+    ----------
+    wavelength : numpy.ndarray
+        (n_wavelength,) grid in Angstrom
+    flux : numpy.ndarray
+        (n_spectra, n_wavelength) fluxes in erg/s/cm^2/Angstrom
+
+    Returns
+    -------
+    numpy.ndarray
+        (n_spectra,) digests
+    """
+    grid_digest = hashlib.sha1(hash_arrays(
+        np.asarray(wavelength, dtype=np.float64)).encode())
+    keys = []
+    for row in np.asarray(flux, dtype=np.float64):
+        digest = grid_digest.copy()
+        digest.update(np.ascontiguousarray(row).tobytes())
+        keys.append(digest.hexdigest())
+    return np.array(keys, dtype='S40')
+
+
+class PhotometryCacheTable(object):
+    """
+    Cached photometry of one ordered list of filters in one magnitude system
+
+    Tables can be shared between threads.
+
+    Parameters
+    ----------
+    table_dir : str
+        directory of the segment files
+    """
+
+    def __init__(self, table_dir):
+        self.table_dir = table_dir
+        self._index = {}
+        self._segments = set()
+        self._columns = LRUCache(16)
+        self._lock = threading.RLock()
+
+    def __len__(self):
+        self.refresh()
+        return len(self._index)
+
+    def refresh(self):
+        """Index segments written since the last call (e.g. by other
+        jobs)"""
+        with self._lock:
+            self._refresh()
+
+    def _refresh(self):
+        if not os.path.isdir(self.table_dir):
+            return
+        for fname in sorted(os.listdir(self.table_dir)):
+            if (fname in self._segments or
+                    not fname.startswith(SEGMENT_PREFIX) or
+                    not fname.endswith(SEGMENT_SUFFIX)):
+                continue
+            try:
+                with np.load(os.path.join(self.table_dir, fname)) as data:
+                    keys = data['spectrum_keys']
+            except (IOError, ValueError, KeyError):
+                logger.warning('Ignoring unreadable photometry cache segment '
+                               '{0}'.format(fname))
+                continue
+            for row, key in enumerate(keys):
+                self._index.setdefault(key, (fname, row))
+            self._segments.add(fname)
+
+    def _load_segment(self, fname):
+        columns = self._columns.get(fname)
+        if columns is None:
+            with np.load(os.path.join(self.table_dir, fname)) as data:
+                columns = (data['f_lambda'], data['magnitudes'])
+            self._columns.put(fname, columns)
+        return columns
+
+    def lookup(self, keys):
+        """
+        Cached results for spectrum keys
+
+        Parameters
+        ----------
+        keys : numpy.ndarray
+            (n_spectra,) spectrum keys
+
+        Returns
+        -------
+        numpy.ndarray, numpy.ndarray, numpy.ndarray
+            (n_spectra,) mask of hits and the (n_hits, n_filters) f_lambda
+            and magnitudes of the hits
+        """
+        with self._lock:
+            if any(key not in self._index for key in keys):
+                self._refresh()
+            locations = [self._index.get(key) for key in keys]
+        found = np.array([location is not None for location in locations],
+                         dtype=bool)
+        f_lambda, magnitudes = [], []
+        for location in locations:
+            if location is None:
+                continue
+            segment_f_lambda, segment_magnitudes = self._load_segment(
+                location[0])
+            f_lambda.append(segment_f_lambda[location[1]])
+            magnitudes.append(segment_magnitudes[location[1]])
+        return found, np.array(f_lambda), np.array(magnitudes)
+
+    def append(self, keys, f_lambda, magnitudes):
+        """Store results for new spectrum keys as a segment"""
+        with self._lock:
+            self._append(keys, f_lambda, magnitudes)
+
+    def _append(self, keys, f_lambda, magnitudes):
+        new = np.array([key not in self._index for key in keys], dtype=bool)
+        keys, rows = np.unique(np.asarray(keys)[new], return_index=True)
+        if len(keys) == 0:
+            return
+        fname = '{0}{1}{2}'.format(SEGMENT_PREFIX, hash_arrays(keys),
+                                   SEGMENT_SUFFIX)
+        if not os.path.isdir(self.table_dir):
+            os.makedirs(self.table_dir)
+        # write to a temporary file first so readers never see partial files
+        fd, tmp_fpath = tempfile.mkstemp(dir=self.table_dir, suffix='.tmp')
+        try:
+            with os.fdopen(fd, 'wb') as fh:
+                np.savez(fh, spectrum_keys=keys,
+                         f_lambda=np.asarray(f_lambda)[new][rows],
+                         magnitudes=np.asarray(magnitudes)[new][rows])
+            os.replace(tmp_fpath, os.path.join(self.table_dir, fname))
+        except BaseException:
+            os.remove(tmp_fpath)
+            raise
+        self._refresh()
+
+
+class PhotometryCache(object):
+    """
+    On-disk cache of synthetic photometry
+
+    Parameters
+    ----------
+    cache_dir : str, optional
+        root directory of the cache (default: 'photometry' in the data
+        directory)
+    """
+
+    def __init__(self, cache_dir=None):
+        if cache_dir is None:
+            cache_dir = get_photometry_cache_dir()
+        self.cache_dir = cache_dir
+        self._tables = {}
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get_table(self, filter_set, magnitude_system='ab'):
+        """
+        Table of `filter_set` (in its order) in `magnitude_system`
+
+        Returns
+        -------
+        PhotometryCacheTable
+        """
+        filter_keys = [filter_content_hash(item, magnitude_system)
+                       for item in filter_set]
+        table_key = hashlib.sha1('|'.join(
+            [str(FORMAT_VERSION)] + filter_keys).encode()).hexdigest()
+        with self._lock:
+            table = self._tables.get(table_key)
+            if table is None:
+                table_dir = os.path.join(self.cache_dir, table_key)
+                table = PhotometryCacheTable(table_dir)
+                metadata_fpath = os.path.join(table_dir, 'table.json')
+                if not os.path.exists(metadata_fpath):
+                    os.makedirs(table_dir, exist_ok=True)
+                    fd, tmp_fpath = tempfile.mkstemp(dir=table_dir,
+                                                     suffix='.tmp')
+                    with os.fdopen(fd, 'w') as fh:
+                        json.dump({'format_version': FORMAT_VERSION,
+                                   'magnitude_system': magnitude_system,
+                                   'filter_ids': [item.filter_id
+                                                  for item in filter_set],
+                                   'filter_keys': filter_keys}, fh,
+                                  indent=1)
+                    os.replace(tmp_fpath, metadata_fpath)
+                self._tables[table_key] = table
+        return table
+
+    def calculate(self, photometry, flux, magnitude_system='ab',
+                  chunk_size=DEFAULT_CHUNK_SIZE, executor=None,
+                  n_workers=None):
+        """
+        Photometry of spectra, served from the cache where possible; only
+        missing spectra are computed (and then stored)
+
+        Parameters
+        ----------
+        photometry : ~wsynphot.batch.BatchPhotometry
+        flux : numpy.ndarray or ~astropy.units.Quantity
+            (n_spectra, n_wavelength) fluxes on the grid of `photometry`
+        magnitude_system : str, optional
+            'ab' or 'vega'
+        chunk_size : int, optional
+            number of missing spectra computed at once
+        executor, n_workers : optional
+            where the missing spectra are computed, see
+            `~wsynphot.batch.BatchPhotometry.calculate_f_lambda`
+
+        Returns
+        -------
+        numpy.ndarray, numpy.ndarray
+            (n_spectra, n_filters) f_lambda in erg/s/cm^2/Angstrom and
+            magnitudes
+        """
+        zero_points = photometry.get_zero_points(magnitude_system)
+        table = self.get_table(photometry.filter_set, magnitude_system)
+        flux = to_f_lambda(flux, photometry.wavelength)
+        keys = spectrum_hashes(photometry.wavelength, flux)
+
+        f_lambda = np.empty((len(keys), len(photometry)))
+        magnitudes = np.empty_like(f_lambda)
+        found, cached_f_lambda, cached_magnitudes = table.lookup(keys)
+        if found.any():
+            f_lambda[found] = cached_f_lambda
+            magnitudes[found] = cached_magnitudes
+
+        missing = np.flatnonzero(~found)
+        with self._lock:
+            self.hits += int(found.sum())
+            self.misses += len(missing)
+        if executor is None or executor == 'serial':
+            for start in range(0, len(missing), chunk_size):
+                rows = missing[start:start + chunk_size]
+                f_lambda[rows] = photometry._calculate_f_lambda(flux[rows])
+                magnitudes[rows] = photometry.convert_f_lambda_to_magnitudes(
+                    f_lambda[rows], zero_points)
+                table.append(keys[rows], f_lambda[rows], magnitudes[rows])
+        elif len(missing):
+            f_lambda[missing] = photometry.calculate_f_lambda(
+                flux[missing], chunk_size, executor, n_workers)
+            magnitudes[missing] = photometry.convert_f_lambda_to_magnitudes(
+                f_lambda[missing], zero_points)
+            table.append(keys[missing], f_lambda[missing],
+                         magnitudes[missing])
+        return f_lambda, magnitudes
+
+    def clear(self):
+        """Remove all cached results"""
+        # nothing has been cached yet
+        table_keys = (os.listdir(self.cache_dir)
+                      if os.path.isdir(self.cache_dir) else [])
+        for table_key in table_keys:
+            table_dir = os.path.join(self.cache_dir, table_key)
+            if os.path.isdir(table_dir):
+                shutil.rmtree(table_dir)
+        self._tables.clear()
+        self.hits = self.misses = 0
+
+    def info(self):
+        """Number of hits and misses (in spectra) since creation"""
+        return {'hits': self.hits, 'misses': self.misses}
+
+    def list_tables(self):
+        """
+        Tables stored in the cache directory
+
+        Returns
+        -------
+        list of dict
+            key, magnitude system, filter IDs, number of spectra and size on
+            disk (in bytes) of each table
+        """
+        tables = []
+        if not os.path.isdir(self.cache_dir):
+            return tables
+        for table_key in sorted(os.listdir(self.cache_dir)):
+            table_dir = os.path.join(self.cache_dir, table_key)
+            metadata_fpath = os.path.join(table_dir, 'table.json')
+            if not os.path.exists(metadata_fpath):
+                continue
+            with open(metadata_fpath) as fh:
+                metadata = json.load(fh)
+            with self._lock:
+                table = self._tables.get(table_key)
+            if table is None:
+                table = PhotometryCacheTable(table_dir)
+            tables.append({
+                'table_key': table_key,
+                'magnitude_system': metadata['magnitude_system'],
+                'filter_ids': metadata['filter_ids'],
+                'n_spectra': len(table),
+                'nbytes': sum(os.path.getsize(os.path.join(table_dir, fname))
+                              for fname in os.listdir(table_dir))})
+        return tables
+
+
+# caches resolved from the `cache` argument, by absolute directory (None for
+# the default cache), so their segment indices are built only once
+_caches = {}
+_caches_lock = threading.Lock()
+
+
+def get_photometry_cache(cache):
+    """
+    Resolve the `cache` argument of the batch photometry calls
+
+    Parameters
+    ----------
+    cache : PhotometryCache, str, bool or None
+        a cache, the root directory of one, True for the default cache or
+        None/False for no cache
+
+    Returns
+    -------
+    PhotometryCache or None
+    """
+    if cache is None or cache is False:
+        return None
+    if cache is not True and not isinstance(cache, str):
+        return cache
+    cache_dir = None if cache is True else os.path.abspath(cache)
+    with _caches_lock:
+        if cache_dir not in _caches:
+            _caches[cache_dir] = PhotometryCache(cache_dir)
+        return _caches[cache_dir]
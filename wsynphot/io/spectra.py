@@ -0,0 +1,134 @@
+"""Readers for spectra on disk
+
+All readers return the wavelength and flux of one spectrum as
+`~astropy.units.Quantity` arrays.
+"""
+import os
+
+import numpy as np
+from astropy import units as u
+from astropy.io import fits
+
+from wsynphot.spectrum1d import FLAM_UNIT
+
+
+def _get_unit(unit, default):
+    if not unit:
+        return default
+    return u.Unit(unit, parse_strict='silent')
+
+
+def read_fits_spectrum(fpath, extension=None, wavelength_column='wavelength',
+                       flux_column='flux'):
+    """
+    Read a spectrum from a FITS file
+
+    Binary tables need wavelength and flux columns (units from TUNITn,
+    default Angstrom and erg/s/cm^2/Angstrom), like the CALSPEC calibration
+    files. One-dimensional images need a linear wavelength axis (CRVAL1,
+    CDELT1 or CD1_1, CRPIX1, CUNIT1) and take the flux unit from BUNIT.
+
+    Parameters
+    ----------
+    fpath : str
+    extension : int or str, optional
+        HDU of the spectrum (default: the first HDU with data)
+    wavelength_column, flux_column : str, optional
+        column names for binary tables
+
+    Returns
+    -------
+    ~astropy.units.Quantity, ~astropy.units.Quantity
+        wavelength and flux
+    """
+    with fits.open(fpath) as hdul:
+        if extension is None:
+            extension = next((i for i, hdu in enumerate(hdul)
+                              if hdu.data is not None), None)
+            if extension is None:
+                raise ValueError('{0} contains no data'.format(fpath))
+        hdu = hdul[extension]
+        if isinstance(hdu, (fits.BinTableHDU, fits.TableHDU)):
+            columns = hdu.columns
+            wavelength = (np.array(hdu.data[wavelength_column],
+                                   dtype=np.float64) *
+                          _get_unit(columns[wavelength_column].unit,
+                                    u.angstrom))
+            flux = (np.array(hdu.data[flux_column], dtype=np.float64) *
+                    _get_unit(columns[flux_column].unit, FLAM_UNIT))
+            return wavelength, flux
+
+        header = hdu.header
+        if header.get('NAXIS') != 1:
+            raise ValueError('{0}[{1}] is not a one-dimensional spectrum'.format(
+                fpath, extension))
+        delta = header.get('CDELT1', header.get('CD1_1'))
+        if delta is None:
+            raise ValueError('{0}[{1}] has no linear wavelength axis (CDELT1 '
+                             'or CD1_1)'.format(fpath, extension))
+        wavelength = (header['CRVAL1'] + delta *
+                      (np.arange(header['NAXIS1']) + 1 -
+                       header.get('CRPIX1', 1.)))
+        return (wavelength * _get_unit(header.get('CUNIT1'), u.angstrom),
+                np.array(hdu.data, dtype=np.float64) *
+                _get_unit(header.get('BUNIT'), FLAM_UNIT))
+
+
+def read_ascii_spectrum(fpath, wavelength_unit=u.angstrom,
+                        flux_unit=FLAM_UNIT, **kwargs):
+    """
+    Read a spectrum from a text file with wavelength and flux columns
+
+    Further keyword arguments are passed to `numpy.loadtxt`.
+    """
+    data = np.loadtxt(fpath, unpack=True, **kwargs)
+    return data[0] * u.Unit(wavelength_unit), data[1] * u.Unit(flux_unit)
+
+
+def read_hdf5_spectrum(fpath, wavelength_key='wavelength', flux_key='flux',
+                       wavelength_unit=u.angstrom, flux_unit=FLAM_UNIT):
+    """
+    Read a spectrum from one-dimensional wavelength and flux datasets of an
+    HDF5 file (requires h5py)
+
+    Units are taken from a 'unit' attribute of the datasets if present.
+    Libraries of many spectra in one file are better converted with
+    `~wsynphot.io.spectral_store.convert_hdf5_spectra`.
+    """
+    try:
+        import h5py
+    except ImportError:
+        raise ImportError('Reading HDF5 spectra requires h5py')
+
+    with h5py.File(fpath, 'r') as fh:
+        wavelength_dataset = fh[wavelength_key]
+        flux_dataset = fh[flux_key]
+        if flux_dataset.ndim != 1:
+            raise ValueError('{0}:{1} holds {2} spectra, convert it to a '
+                             'spectral store instead'.format(
+                fpath, flux_key, len(flux_dataset)))
+        return (np.array(wavelength_dataset, dtype=np.float64) *
+                u.Unit(wavelength_dataset.attrs.get('unit', wavelength_unit)),
+                np.array(flux_dataset, dtype=np.float64) *
+                u.Unit(flux_dataset.attrs.get('unit', flux_unit)))
+
+
+def read_spectrum(fpath, **kwargs):
+    """
+    Read a spectrum, choosing the reader by file extension (FITS for .fits,
+    .fit, .fts, optionally gzipped, HDF5 for .h5, .hdf5, .he5, text
+    otherwise)
+
+    Returns
+    -------
+    ~astropy.units.Quantity, ~astropy.units.Quantity
+        wavelength and flux
+    """
+    fname = os.path.basename(fpath).lower()
+    if fname.endswith('.gz'):
+        fname = fname[:-3]
+    if os.path.splitext(fname)[1] in ('.fits', '.fit', '.fts'):
+        return read_fits_spectrum(fpath, **kwargs)
+    if os.path.splitext(fname)[1] in ('.h5', '.hdf5', '.he5'):
+        return read_hdf5_spectrum(fpath, **kwargs)
+    return read_ascii_spectrum(fpath, **kwargs)
@@ -0,0 +1,382 @@
+"""Memory-mapped spectral libraries
+
+A spectral store is a directory holding the spectra of a model library on a
+shared wavelength grid, in the units the batch photometry works in, so the
+flux matrix is memory-mapped and handed to `~wsynphot.batch.BatchPhotometry`
+as plain array views without any copy or unit conversion::
+
+    store/
+        store.json      format version, shape, dtype and units
+        wavelength.npy  (n_wavelength,) float64 in Angstrom
+        flux.npy        (n_spectra, n_wavelength) in erg/s/cm^2/Angstrom
+        metadata.csv    optional table with one row per spectrum
+
+`convert_spectra` and `convert_hdf5_spectra` build stores from FITS/text
+spectrum files and HDF5 libraries.
+"""
+import json
+import logging
+import os
+import shutil
+
+import numpy as np
+import pandas as pd
+from astropy import units as u
+
+from wsynphot.batch import DEFAULT_CHUNK_SIZE, to_angstrom, to_f_lambda
+from wsynphot.io.spectra import read_spectrum
+from wsynphot.spectrum1d import FLAM_UNIT
+
+logger = logging.getLogger(__name__)
+
+STORE_VERSION = 1
+STORE_FNAME = 'store.json'
+WAVELENGTH_FNAME = 'wavelength.npy'
+FLUX_FNAME = 'flux.npy'
+METADATA_FNAME = 'metadata.csv'
+
+
+def _prepare_store_dir(path, overwrite):
+    if os.path.exists(path):
+        if not overwrite:
+            raise IOError('{0} exists already, use overwrite=True to '
+                          'replace it'.format(path))
+        if not os.path.exists(os.path.join(path, STORE_FNAME)):
+            raise IOError('{0} exists and is not a spectral store, refusing '
+                          'to overwrite it'.format(path))
+        shutil.rmtree(path)
+    os.makedirs(path)
+
+
+class SpectralStore(object):
+    """
+    Memory-mapped library of spectra sharing a wavelength grid
+
+    Parameters
+    ----------
+
+    path: str
+        store directory
+
+    mode: str, optional
+        'r' for read-only or 'r+' for writing into the flux matrix
+    """
+
+    def __init__(self, path, mode='r'):
+        if mode not in ('r', 'r+'):
+            raise ValueError("mode needs to be 'r' or 'r+', not {0!r}".format(
+                mode))
+        store_fpath = os.path.join(path, STORE_FNAME)
+        if not os.path.exists(store_fpath):
+            raise IOError('{0} is not a spectral store (no {1})'.format(
+                path, STORE_FNAME))
+        with open(store_fpath) as fh:
+            self.info = json.load(fh)
+        if self.info['version'] > STORE_VERSION:
+            raise IOError('{0} has store version {1}, this wsynphot reads up '
+                          'to version {2}'.format(path, self.info['version'],
+                                                  STORE_VERSION))
+        self.path = path
+        self.mode = mode
+        self.wavelength = np.load(os.path.join(path, WAVELENGTH_FNAME))
+        self.flux = np.load(os.path.join(path, FLUX_FNAME), mmap_mode=mode)
+        if self.flux.shape != (self.info['n_spectra'],
+                               self.info['n_wavelength']):
+            raise IOError('{0} is inconsistent: flux has shape {1}, expected '
+                          '{2}'.format(path, self.flux.shape,
+                                       (self.info['n_spectra'],
+                                        self.info['n_wavelength'])))
+        self._metadata = None
+
+    @classmethod
+    def create(cls, path, wavelength, n_spectra, dtype=np.float32,
+               metadata=None, overwrite=False):
+        """
+        Create an empty store to be filled row by row
+
+        Parameters
+        ----------
+
+        path: str
+            store directory
+
+        wavelength: ~astropy.units.Quantity or numpy.ndarray
+            (n_wavelength,) wavelength grid (plain arrays are in Angstrom)
+
+        n_spectra: int
+
+        dtype: numpy.dtype, optional
+            dtype of the flux matrix (float32 halves the size on disk)
+
+        metadata: pandas.DataFrame, optional
+            one row per spectrum
+
+        overwrite: bool, optional
+            replace an existing store at `path`
+
+        Returns
+        -------
+            : SpectralStore
+            store opened with mode 'r+', with the flux set to zero
+        """
+        wavelength = to_angstrom(wavelength)
+        if metadata is not None and len(metadata) != n_spectra:
+            raise ValueError('metadata has {0} rows for {1} spectra'.format(
+                len(metadata), n_spectra))
+        _prepare_store_dir(path, overwrite)
+        np.save(os.path.join(path, WAVELENGTH_FNAME), wavelength)
+        flux = np.lib.format.open_memmap(
+            os.path.join(path, FLUX_FNAME), mode='w+', dtype=dtype,
+            shape=(n_spectra, len(wavelength)))
+        del flux
+        if metadata is not None:
+            metadata.to_csv(os.path.join(path, METADATA_FNAME))
+        info = {'version': STORE_VERSION, 'n_spectra': int(n_spectra),
+                'n_wavelength': len(wavelength),
+                'dtype': np.dtype(dtype).name,
+                'wavelength_unit': u.angstrom.to_string(),
+                'flux_unit': FLAM_UNIT.to_string()}
+        with open(os.path.join(path, STORE_FNAME), 'w') as fh:
+            json.dump(info, fh, indent=1)
+        return cls(path, mode='r+')
+
+    def __len__(self):
+        return self.flux.shape[0]
+
+    @property
+    def metadata(self):
+        """Table with one row per spectrum, or None"""
+        if self._metadata is None:
+            metadata_fpath = os.path.join(self.path, METADATA_FNAME)
+            if os.path.exists(metadata_fpath):
+                self._metadata = pd.read_csv(metadata_fpath, index_col=0)
+        return self._metadata
+
+    @property
+    def spectrum_ids(self):
+        """Index of the metadata table, otherwise the row numbers"""
+        if self.metadata is not None:
+            return self.metadata.index.values
+        return np.arange(len(self))
+
+    def get_spectrum(self, idx):
+        """Wavelength and flux of spectrum `idx` as Quantities (the flux is a
+        view into the memory-mapped matrix)"""
+        return (self.wavelength * u.angstrom,
+                u.Quantity(self.flux[idx], FLAM_UNIT, copy=False))
+
+    def __iter__(self):
+        """(spectrum_id, (wavelength, flux)) pairs of plain arrays, the input
+        format of `~wsynphot.stream.PhotometryStream`"""
+        for spectrum_id, flux in zip(self.spectrum_ids, self.flux):
+            yield spectrum_id, (self.wavelength, flux)
+
+    def iter_chunks(self, chunk_size=DEFAULT_CHUNK_SIZE):
+        """
+        Blocks of consecutive spectra
+
+        Yields
+        ------
+            : slice, numpy.ndarray
+            rows of the block and their memory-mapped (n_rows, n_wavelength)
+            flux
+        """
+        for start in range(0, len(self), chunk_size):
+            rows = slice(start, min(start + chunk_size, len(self)))
+            yield rows, self.flux[rows]
+
+    def write(self, rows, flux):
+        """Write flux (Quantity, or plain array in erg/s/cm^2/Angstrom) on the
+        store's wavelength grid into `rows`"""
+        if self.mode != 'r+':
+            raise IOError("{0} is opened read-only, use mode='r+'".format(
+                self.path))
+        self.flux[rows] = to_f_lambda(flux, self.wavelength)
+
+    def flush(self):
+        if self.mode == 'r+':
+            self.flux.flush()
+
+    def calculate_f_lambda(self, filter_set, rows=slice(None),
+                           chunk_size=DEFAULT_CHUNK_SIZE, cache=None):
+        """
+        Average flux densities of the stored spectra through `filter_set`,
+        see `~wsynphot.FilterSet.calculate_f_lambda_batch`
+
+        Parameters
+        ----------
+
+        filter_set: ~wsynphot.FilterSet
+
+        rows: slice or numpy.ndarray, optional
+            spectra to compute (default: all)
+
+        Returns
+        -------
+            : numpy.ndarray
+            (n_spectra, n_filters) in erg/s/cm^2/Angstrom
+        """
+        return filter_set.calculate_f_lambda_batch(
+            self.wavelength, self.flux[rows], chunk_size=chunk_size,
+            cache=cache)
+
+    def calculate_magnitudes(self, filter_set, magnitude_system='ab',
+                             rows=slice(None), chunk_size=DEFAULT_CHUNK_SIZE,
+                             cache=None):
+        """(n_spectra, n_filters) magnitudes of the stored spectra through
+        `filter_set`, see `calculate_f_lambda`"""
+        if magnitude_system not in ('ab', 'vega'):
+            raise ValueError("magnitude_system needs to be 'ab' or 'vega', "
+                             "not {0!r}".format(magnitude_system))
+        calculate = getattr(filter_set, 'calculate_{0}_magnitudes_batch'.format(
+            magnitude_system))
+        return calculate(self.wavelength, self.flux[rows],
+                         chunk_size=chunk_size, cache=cache)
+
+
+def write_spectral_store(path, wavelength, flux, metadata=None, dtype=None,
+                         overwrite=False):
+    """
+    Write spectra on a common wavelength grid into a new store
+
+    Parameters
+    ----------
+
+    path: str
+
+    wavelength: ~astropy.units.Quantity or numpy.ndarray
+        (n_wavelength,) (plain arrays are in Angstrom)
+
+    flux: ~astropy.units.Quantity or numpy.ndarray
+        (n_spectra, n_wavelength) (plain arrays are in erg/s/cm^2/Angstrom)
+
+    metadata: pandas.DataFrame, optional
+
+    dtype: numpy.dtype, optional
+        dtype of the flux matrix (default: the dtype of `flux`)
+
+    overwrite: bool, optional
+
+    Returns
+    -------
+        : SpectralStore
+        the new store, opened read-only
+    """
+    if dtype is None:
+        dtype = flux.dtype
+    store = SpectralStore.create(path, wavelength, len(flux), dtype=dtype,
+                                 metadata=metadata, overwrite=overwrite)
+    for rows, _ in store.iter_chunks():
+        store.write(rows, flux[rows])
+    store.flush()
+    return SpectralStore(path)
+
+
+def convert_spectra(fpaths, path, wavelength=None, reader=read_spectrum,
+                    dtype=np.float32, metadata=None, overwrite=False):
+    """
+    Convert spectrum files into a store
+
+    Spectra on a different grid than `wavelength` are resampled with linear
+    interpolation; the flux outside of their wavelength range is set to
+    zero.
+
+    Parameters
+    ----------
+
+    fpaths: list of str
+
+    path: str
+        store directory
+
+    wavelength: ~astropy.units.Quantity or numpy.ndarray, optional
+        wavelength grid of the store (default: the grid of the first
+        spectrum)
+
+    reader: callable, optional
+        function reading a file into (wavelength, flux), see
+        `~wsynphot.io.spectra.read_spectrum`
+
+    dtype: numpy.dtype, optional
+
+    metadata: pandas.DataFrame, optional
+        default: a table of the file names
+
+    overwrite: bool, optional
+
+    Returns
+    -------
+        : SpectralStore
+    """
+    fpaths = list(fpaths)
+    if not fpaths:
+        raise ValueError('No spectrum files given')
+    first_spectrum = reader(fpaths[0])
+    if wavelength is None:
+        wavelength = first_spectrum[0]
+    if metadata is None:
+        metadata = pd.DataFrame({'fpath': fpaths})
+    store = SpectralStore.create(path, wavelength, len(fpaths), dtype=dtype,
+                                 metadata=metadata, overwrite=overwrite)
+    n_resampled = 0
+    for i, fpath in enumerate(fpaths):
+        spectrum_wavelength, flux = (first_spectrum if i == 0
+                                     else reader(fpath))
+        spectrum_wavelength = to_angstrom(spectrum_wavelength)
+        flux = to_f_lambda(flux, spectrum_wavelength)
+        if not np.array_equal(spectrum_wavelength, store.wavelength):
+            flux = np.interp(store.wavelength, spectrum_wavelength, flux,
+                             left=0., right=0.)
+            n_resampled += 1
+        store.write(i, flux)
+    store.flush()
+    logger.info('Converted {0} spectra into {1} ({2} resampled)'.format(
+        len(fpaths), path, n_resampled))
+    return SpectralStore(path)
+
+
+def convert_hdf5_spectra(fpath, path, wavelength_key='wavelength',
+                         flux_key='flux', wavelength_unit=u.angstrom,
+                         flux_unit=FLAM_UNIT, dtype=np.float32,
+                         chunk_size=DEFAULT_CHUNK_SIZE, overwrite=False):
+    """
+    Convert an HDF5 library with a wavelength dataset and a
+    (n_spectra, n_wavelength) flux dataset into a store, copying
+    `chunk_size` spectra at a time (requires h5py)
+
+    Parameters
+    ----------
+
+    fpath: str
+        HDF5 file
+
+    path: str
+        store directory
+
+    wavelength_key, flux_key: str, optional
+        dataset names
+
+    wavelength_unit, flux_unit: ~astropy.units.Unit, optional
+        used if the datasets have no 'unit' attribute
+
+    Returns
+    -------
+        : SpectralStore
+    """
+    try:
+        import h5py
+    except ImportError:
+        raise ImportError('Converting HDF5 libraries requires h5py')
+
+    with h5py.File(fpath, 'r') as fh:
+        wavelength_dataset = fh[wavelength_key]
+        flux_dataset = fh[flux_key]
+        wavelength = np.asarray(wavelength_dataset) * u.Unit(
+            wavelength_dataset.attrs.get('unit', wavelength_unit))
+        flux_unit = u.Unit(flux_dataset.attrs.get('unit', flux_unit))
+        store = SpectralStore.create(path, wavelength, len(flux_dataset),
+                                     dtype=dtype, overwrite=overwrite)
+        for rows, _ in store.iter_chunks(chunk_size):
+            store.write(rows, np.asarray(flux_dataset[rows]) * flux_unit)
+    store.flush()
+    return SpectralStore(path)
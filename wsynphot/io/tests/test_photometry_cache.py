@@ -0,0 +1,65 @@
+import os
+
+import numpy as np
+import pytest
+
+from wsynphot.io.photometry_cache import (PhotometryCache,
+                                          get_photometry_cache)
+from wsynphot.tests.helpers import make_filter_set, make_spectrum_arrays
+
+
+@pytest.fixture
+def filter_set(tmpdir):
+    return make_filter_set([4000, 6000], vega_dir=str(tmpdir))
+
+
+@pytest.mark.parametrize('magnitude_system', ['ab', 'vega'])
+def test_cache_hits_and_misses(filter_set, magnitude_system, tmpdir):
+    wavelength, flux = make_spectrum_arrays(2000, n_spectra=6)
+    calculate = getattr(filter_set, 'calculate_{0}_magnitudes_batch'.format(
+        magnitude_system))
+    expected = calculate(wavelength, flux)
+
+    cache = PhotometryCache(str(tmpdir.mkdir('photometry')))
+    np.testing.assert_allclose(calculate(wavelength, flux[:4], cache=cache),
+                               expected[:4])
+    assert cache.info() == {'hits': 0, 'misses': 4}
+
+    # a fresh cache object on the same directory serves the stored results
+    cache = PhotometryCache(cache.cache_dir)
+    np.testing.assert_allclose(calculate(wavelength, flux, cache=cache),
+                               expected)
+    assert cache.info() == {'hits': 4, 'misses': 2}
+    np.testing.assert_allclose(
+        filter_set.calculate_f_lambda_batch(wavelength, flux,
+                                            cache=cache).value,
+        filter_set.calculate_f_lambda_batch(wavelength, flux).value)
+
+    # changed spectra and filters miss
+    misses = cache.info()['misses']
+    calculate(wavelength, flux * 2, cache=cache)
+    assert cache.info()['misses'] == misses + 6
+    filter_set.filter_set[0].transmission_lambda *= 0.5
+    filter_set.filter_set[0].interpolation_cache.clear()
+    filter_set._batch_photometry.clear()
+    calculate(wavelength, flux, cache=cache)
+    assert cache.info()['misses'] == misses + 12
+
+
+def test_cache_directories_are_resolved_once(filter_set, tmpdir):
+    cache_dir = str(tmpdir.mkdir('photometry'))
+    cache = get_photometry_cache(cache_dir)
+    assert get_photometry_cache(os.path.join(cache_dir, '.')) is cache
+    wavelength, flux = make_spectrum_arrays(2000, n_spectra=3)
+    filter_set.calculate_ab_magnitudes_batch(wavelength, flux,
+                                             cache=cache_dir)
+    filter_set.calculate_ab_magnitudes_batch(wavelength, flux,
+                                             cache=cache_dir)
+    assert cache.info() == {'hits': 3, 'misses': 3}
+
+
+def test_clear_before_caching(tmpdir):
+    cache = PhotometryCache(str(tmpdir.join('photometry')))
+    cache.clear()
+    assert cache.list_tables() == []
+    assert cache.info() == {'hits': 0, 'misses': 0}
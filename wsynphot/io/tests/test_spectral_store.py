@@ -0,0 +1,77 @@
+import os
+
+import numpy as np
+import pandas as pd
+import pytest
+from astropy import units as u
+
+from wsynphot.io.spectral_store import (SpectralStore, convert_spectra,
+                                        convert_hdf5_spectra,
+                                        write_spectral_store)
+from wsynphot.spectrum1d import FLAM_UNIT
+from wsynphot.tests.helpers import make_filter_set, make_spectrum_arrays
+
+
+@pytest.fixture
+def filter_set():
+    return make_filter_set([4000, 6000])
+
+
+def test_store_photometry(filter_set, tmpdir):
+    wavelength, flux = make_spectrum_arrays(2000, n_spectra=5)
+    path = os.path.join(str(tmpdir), 'store')
+    metadata = pd.DataFrame({'teff': np.arange(5) * 1000.},
+                            index=pd.Index(list('abcde'), name='name'))
+    store = write_spectral_store(path, wavelength * u.angstrom,
+                                 flux * FLAM_UNIT, metadata=metadata)
+
+    assert isinstance(store.flux, np.memmap)
+    assert len(store) == 5 and store.flux.dtype == np.float64
+    assert list(store.spectrum_ids) == list('abcde')
+    np.testing.assert_allclose(store.metadata['teff'], metadata['teff'])
+    np.testing.assert_allclose(
+        store.calculate_magnitudes(filter_set, rows=slice(1, 4),
+                                   chunk_size=2),
+        filter_set.calculate_ab_magnitudes_batch(wavelength, flux[1:4]))
+
+    spectrum_id, (store_wavelength, store_flux) = list(store)[2]
+    assert spectrum_id == 'c'
+    np.testing.assert_array_equal(store_flux, flux[2])
+
+    with pytest.raises(IOError):
+        write_spectral_store(path, wavelength, flux)
+    with pytest.raises(IOError):
+        store.write(0, flux[0])
+
+
+def test_convert_spectra(filter_set, tmpdir):
+    wavelength, flux = make_spectrum_arrays(2000, n_spectra=3)
+    fpaths = []
+    for i, row in enumerate(flux):
+        fpath = os.path.join(str(tmpdir), 'spectrum{0}.txt'.format(i))
+        # the last spectrum is sampled twice as finely
+        step = 2 if i < 2 else 1
+        fine_wavelength = np.linspace(wavelength[0], wavelength[-1],
+                                      len(wavelength) * step - step + 1)
+        np.savetxt(fpath, np.transpose(
+            [fine_wavelength, np.interp(fine_wavelength, wavelength, row)]))
+        fpaths.append(fpath)
+    store = convert_spectra(fpaths[::-1], os.path.join(str(tmpdir), 'store'),
+                            wavelength=wavelength)
+    assert store.flux.dtype == np.float32
+    assert list(store.metadata['fpath']) == fpaths[::-1]
+    np.testing.assert_allclose(store.flux, flux[::-1], rtol=1e-6)
+
+
+def test_convert_hdf5_spectra(filter_set, tmpdir):
+    h5py = pytest.importorskip('h5py')
+    wavelength, flux = make_spectrum_arrays(2000, n_spectra=5)
+    fpath = os.path.join(str(tmpdir), 'library.h5')
+    with h5py.File(fpath, 'w') as fh:
+        fh['wavelength'] = wavelength / 1e4
+        fh['wavelength'].attrs['unit'] = 'micron'
+        fh['flux'] = flux
+    store = convert_hdf5_spectra(fpath, os.path.join(str(tmpdir), 'store'),
+                                 dtype=np.float64, chunk_size=2)
+    np.testing.assert_allclose(store.wavelength, wavelength)
+    np.testing.assert_allclose(store.flux, flux)
@@ -0,0 +1,368 @@
+"""Checkpointed bulk photometry of many spectrum files
+
+`PhotometryJob` splits a list of spectrum files into shards of fixed size.
+Worker processes read the spectra of a shard, compute their magnitudes
+through a fixed `~wsynphot.FilterSet` with `~wsynphot.stream` micro-batches
+and write one columnar file per shard (Parquet with pyarrow, numpy .npz
+otherwise). Every finished shard is recorded in a checkpoint file in the
+output directory, so rerunning a crashed job only computes the missing
+shards.
+"""
+from collections import namedtuple
+from contextlib import nullcontext
+import hashlib
+import json
+import logging
+import os
+import threading
+import time
+
+import numpy as np
+import pandas as pd
+
+from wsynphot.executors import is_process_pool, open_executor
+from wsynphot.io.photometry_cache import filter_content_hash
+from wsynphot.io.spectra import read_spectrum
+from wsynphot.shared import SharedFilterSet, get_shared_filter_set
+from wsynphot.stream import DEFAULT_BATCH_SIZE, PhotometryStream
+
+logger = logging.getLogger(__name__)
+
+CHECKPOINT_FNAME = 'checkpoint.json'
+SHARD_FNAME = 'part-{0:05d}.{1}'
+OUTPUT_FORMATS = ('parquet', 'npz')
+TABLE_FORMATS = {'.csv': 'csv', '.parquet': 'parquet', '.npz': 'npz'}
+
+JobSummary = namedtuple('JobSummary', [
+    'n_shards', 'n_shards_skipped', 'n_spectra', 'n_failed', 'seconds',
+    'spectra_per_second'])
+
+# filter set and settings of a worker (process or thread), see
+# `_get_worker_state`
+_worker_state = threading.local()
+
+
+def parquet_available():
+    try:
+        import pyarrow
+    except ImportError:
+        return False
+    return True
+
+
+def _get_worker_state(job_key, filter_set, magnitude_system, reader,
+                      batch_size):
+    """Stream and reader of the worker, rebuilt only when the job changes;
+    `filter_set` may be a `~wsynphot.shared.SharedFilterSet` handle"""
+    if getattr(_worker_state, 'job_key', None) != job_key:
+        shared = getattr(_worker_state, 'shared', None)
+        if shared is not None:
+            shared.close()
+        _worker_state.shared = None
+        if isinstance(filter_set, SharedFilterSet):
+            _worker_state.shared = filter_set
+            filter_set = get_shared_filter_set(filter_set)
+        _worker_state.stream = PhotometryStream(
+            filter_set, magnitude_system=magnitude_system,
+            batch_size=batch_size)
+        _worker_state.reader = reader
+        _worker_state.job_key = job_key
+    return _worker_state.stream, _worker_state.reader
+
+
+def get_table_format(fpath):
+    """Format of a table file by its extension"""
+    extension = os.path.splitext(fpath)[1].lower()
+    if extension not in TABLE_FORMATS:
+        raise ValueError('Table needs to end in one of {0}, not {1!r}'.format(
+            sorted(TABLE_FORMATS), fpath))
+    return TABLE_FORMATS[extension]
+
+
+def write_table(table, fpath, output_format=None):
+    """
+    Write a DataFrame atomically as CSV, Parquet or npz
+
+    Parameters
+    ----------
+
+    table: pandas.DataFrame
+
+    fpath: str
+
+    output_format: str, optional
+        'csv', 'parquet' or 'npz' (default: by the extension of `fpath`)
+    """
+    if output_format is None:
+        output_format = get_table_format(fpath)
+    tmp_fpath = fpath + '.tmp'
+    if output_format == 'csv':
+        table.to_csv(tmp_fpath, index=False)
+    elif output_format == 'parquet':
+        table.to_parquet(tmp_fpath, index=False)
+    else:
+        with open(tmp_fpath, 'wb') as fh:
+            np.savez(fh, **{column: table[column].to_numpy(
+                dtype=str if table[column].dtype == object else None)
+                for column in table.columns})
+    os.replace(tmp_fpath, fpath)
+
+
+def _read_table(fpath):
+    if fpath.endswith('.parquet'):
+        return pd.read_parquet(fpath)
+    with np.load(fpath) as data:
+        return pd.DataFrame({column: data[column] for column in data.files})
+
+
+def _run_shard(shard):
+    """Compute and write the photometry of one shard (in a worker)"""
+    fpaths, output_fpath, output_format, worker_args = shard
+    start = time.perf_counter()
+    stream, reader = _get_worker_state(*worker_args)
+    errors = {}
+
+    def read_spectra():
+        for fpath in fpaths:
+            try:
+                yield fpath, reader(fpath)
+            except Exception as e:
+                errors[fpath] = '{0}: {1}'.format(type(e).__name__, e)
+
+    filter_ids = [item.filter_id for item in stream.filter_set]
+    magnitudes = {}
+    for record in stream.process(read_spectra()):
+        magnitudes[record.spectrum_id] = record.magnitudes
+
+    table = pd.DataFrame(
+        [magnitudes.get(fpath, np.full(len(filter_ids), np.nan))
+         for fpath in fpaths], columns=filter_ids)
+    table.insert(0, 'spectrum', list(fpaths))
+    table['error'] = [errors.get(fpath, '') for fpath in fpaths]
+    write_table(table, output_fpath, output_format)
+    return {'n_spectra': len(fpaths), 'n_failed': len(errors),
+            'seconds': time.perf_counter() - start}
+
+
+class PhotometryJob(object):
+    """
+    Resumable photometry of many spectrum files through a filter set
+
+    Parameters
+    ----------
+
+    filter_set: ~wsynphot.FilterSet
+
+    fpaths: list of str
+        spectrum files, read with `reader`
+
+    output_dir: str
+        directory of the shard files and the checkpoint
+
+    magnitude_system: str, optional
+        'ab' or 'vega'
+
+    shard_size: int, optional
+        number of files per shard (the unit of work and of checkpoints)
+
+    n_workers: int, optional
+        number of workers (default: all cores), 1 runs in the calling
+        process
+
+    output_format: str, optional
+        'parquet' (needs pyarrow) or 'npz'; default is Parquet if available
+
+    reader: callable, optional
+        function reading a file into (wavelength, flux), needs to be
+        picklable (e.g. a module level function)
+
+    batch_size: int, optional
+        micro-batch size of the photometry within a shard
+
+    executor: str or object, optional
+        where the shards are computed, see `~wsynphot.executors` (default:
+        a process pool)
+    """
+
+    def __init__(self, filter_set, fpaths, output_dir, magnitude_system='ab',
+                 shard_size=1000, n_workers=None, output_format=None,
+                 reader=read_spectrum, batch_size=DEFAULT_BATCH_SIZE,
+                 executor='processes'):
+        if output_format is None:
+            output_format = 'parquet' if parquet_available() else 'npz'
+        if output_format not in OUTPUT_FORMATS:
+            raise ValueError('output_format needs to be one of {0}, not '
+                             '{1!r}'.format(OUTPUT_FORMATS, output_format))
+        if output_format == 'parquet' and not parquet_available():
+            raise ImportError("output_format='parquet' requires pyarrow")
+        self.filter_set = filter_set
+        self.fpaths = list(fpaths)
+        self.output_dir = output_dir
+        self.magnitude_system = magnitude_system
+        self.shard_size = shard_size
+        self.n_workers = n_workers
+        self.output_format = output_format
+        self.reader = reader
+        self.batch_size = batch_size
+        self.executor = executor
+
+    @property
+    def n_shards(self):
+        return -(-len(self.fpaths) // self.shard_size)
+
+    def get_shard(self, shard_id):
+        start = shard_id * self.shard_size
+        return self.fpaths[start:start + self.shard_size]
+
+    @property
+    def job_key(self):
+        """Hash of the inputs and settings that determine the shards,
+        including the content of the filters"""
+        digest = hashlib.sha1()
+        for item in ([self.magnitude_system, self.output_format,
+                      str(self.shard_size)] +
+                     [filter_content_hash(item, self.magnitude_system)
+                      for item in self.filter_set] +
+                     self.fpaths):
+            digest.update(item.encode() + b'\0')
+        return digest.hexdigest()
+
+    @property
+    def checkpoint_fpath(self):
+        return os.path.join(self.output_dir, CHECKPOINT_FNAME)
+
+    def get_shard_fpath(self, shard_id):
+        return os.path.join(self.output_dir,
+                            SHARD_FNAME.format(shard_id, self.output_format))
+
+    def read_checkpoint(self):
+        """
+        Finished shards of a previous run
+
+        Returns
+        -------
+            : dict
+            statistics of each finished shard by shard number
+
+        Raises
+        ------
+        ValueError
+            if the output directory holds a different job
+        """
+        if not os.path.exists(self.checkpoint_fpath):
+            return {}
+        with open(self.checkpoint_fpath) as fh:
+            checkpoint = json.load(fh)
+        if checkpoint['job_key'] != self.job_key:
+            raise ValueError('{0} holds the results of a different job (other '
+                             'files, filters or settings)'.format(
+                self.output_dir))
+        return {int(shard_id): stats for shard_id, stats in
+                checkpoint['shards'].items()
+                if os.path.exists(self.get_shard_fpath(int(shard_id)))}
+
+    def _write_checkpoint(self, shards):
+        tmp_fpath = self.checkpoint_fpath + '.tmp'
+        with open(tmp_fpath, 'w') as fh:
+            json.dump({'job_key': self.job_key,
+                       'n_shards': self.n_shards,
+                       'shards': {str(shard_id): stats for shard_id, stats in
+                                  sorted(shards.items())}}, fh, indent=1)
+        os.replace(tmp_fpath, self.checkpoint_fpath)
+
+    def run(self, resume=True):
+        """
+        Compute all shards not finished yet
+
+        Parameters
+        ----------
+        resume : bool, optional
+            skip shards recorded in the checkpoint; False starts over
+
+        Returns
+        -------
+        JobSummary
+            shards and spectra processed in this run and its throughput
+        """
+        start = time.perf_counter()
+        if not os.path.exists(self.output_dir):
+            os.makedirs(self.output_dir)
+        for fpath in ([self.get_shard_fpath(shard_id)
+                       for shard_id in range(self.n_shards)] +
+                      [self.checkpoint_fpath]):
+            if os.path.exists(fpath + '.tmp'):
+                os.remove(fpath + '.tmp')
+        shards = self.read_checkpoint() if resume else {}
+        pending = [shard_id for shard_id in range(self.n_shards)
+                   if shard_id not in shards]
+        logger.info('Running {0} of {1} shards ({2} finished before)'.format(
+            len(pending), self.n_shards, len(shards)))
+        self._write_checkpoint(shards)
+
+        executor = self.executor if len(pending) > 1 else 'serial'
+        n_workers = self.n_workers
+        if isinstance(executor, str) and n_workers is None:
+            n_workers = min(os.cpu_count() or 1, len(pending))
+        # computed once here and handed to the workers with the filters
+        self.filter_set.calculate_zero_points(self.magnitude_system)
+        # worker processes attach the filters from shared memory instead of
+        # receiving a pickled copy with every shard
+        publish = (SharedFilterSet.publish(
+            self.filter_set, magnitude_systems=(self.magnitude_system,))
+            if is_process_pool(executor) and n_workers != 1
+            else nullcontext())
+        completed = []
+
+        def finish(shard_id, stats):
+            shards[shard_id] = stats
+            completed.append(stats)
+            self._write_checkpoint(shards)
+            logger.info('Finished shard {0} ({1} spectra, {2} failed) in '
+                        '{3:.2f} s'.format(shard_id, stats['n_spectra'],
+                                           stats['n_failed'],
+                                           stats['seconds']))
+
+        with publish as shared:
+            worker_args = (self.job_key, shared or self.filter_set,
+                           self.magnitude_system, self.reader,
+                           self.batch_size)
+            shards_args = [(self.get_shard(shard_id),
+                            self.get_shard_fpath(shard_id),
+                            self.output_format, worker_args)
+                           for shard_id in pending]
+            with open_executor(executor, n_workers) as resolved:
+                for i, stats in resolved.map_as_completed(_run_shard,
+                                                          shards_args):
+                    finish(pending[i], stats)
+
+        seconds = time.perf_counter() - start
+        n_spectra = sum(stats['n_spectra'] for stats in completed)
+        summary = JobSummary(
+            self.n_shards, self.n_shards - len(pending), n_spectra,
+            sum(stats['n_failed'] for stats in completed), seconds,
+            n_spectra / seconds if seconds > 0 else np.nan)
+        logger.info('Computed {0} spectra ({1} failed) in {2:.1f} s: {3:.1f} '
+                    'spectra/s'.format(summary.n_spectra, summary.n_failed,
+                                       summary.seconds,
+                                       summary.spectra_per_second))
+        return summary
+
+    def clean(self):
+        """Remove the shard files and checkpoint of this job, and the output
+        directory if nothing else is left in it"""
+        for fpath in ([self.get_shard_fpath(shard_id)
+                       for shard_id in range(self.n_shards)] +
+                      [self.checkpoint_fpath]):
+            if os.path.exists(fpath):
+                os.remove(fpath)
+        if os.path.isdir(self.output_dir) and not os.listdir(self.output_dir):
+            os.rmdir(self.output_dir)
+
+    def read_results(self):
+        """Results of all finished shards as one DataFrame"""
+        shards = self.read_checkpoint()
+        tables = [_read_table(self.get_shard_fpath(shard_id))
+                  for shard_id in sorted(shards)]
+        if not tables:
+            return pd.DataFrame()
+        return pd.concat(tables, ignore_index=True)
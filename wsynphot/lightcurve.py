@@ -0,0 +1,178 @@
+"""Synthetic light curves from spectral time series
+
+Transient models give spectra at a set of epochs. `LightCurveModel`
+integrates all epoch spectra through a `~wsynphot.FilterSet` once, in a
+batch, and answers queries at arbitrary times by interpolating these epoch
+flux densities in time, which is much cheaper than interpolating spectra.
+"""
+import numpy as np
+import pandas as pd
+from astropy import units as u
+from scipy import interpolate
+
+from wsynphot.batch import DEFAULT_CHUNK_SIZE, BatchPhotometry
+from wsynphot.io.photometry_cache import get_photometry_cache
+
+
+def to_days(time):
+    """Time as float64 array in days, plain arrays are assumed to be in days
+    already"""
+    if hasattr(time, 'unit'):
+        return time.to_value(u.day).astype(np.float64, copy=False)
+    return np.asarray(time, dtype=np.float64)
+
+
+class LightCurveModel(object):
+    """
+    Light curves of a spectral time series through a filter set
+
+    Parameters
+    ----------
+
+    filter_set: ~wsynphot.FilterSet
+
+    time: ~astropy.units.Quantity or numpy.ndarray
+        (n_epochs,) epochs of the spectra (plain arrays are in days), in any
+        order
+
+    wavelength: ~astropy.units.Quantity or numpy.ndarray
+        (n_wavelength,) common wavelength grid of the spectra (plain arrays
+        are in Angstrom)
+
+    flux: ~astropy.units.Quantity or numpy.ndarray
+        (n_epochs, n_wavelength) spectra (plain arrays are in
+        erg/s/cm^2/Angstrom)
+
+    interpolation_kind: str or int, optional
+        kind of the interpolation in time, see scipy.interpolate.interp1d
+
+    cache: ~wsynphot.io.photometry_cache.PhotometryCache, str or bool
+        persistent photometry cache for the epoch photometry, see
+        `~wsynphot.FilterSet.calculate_f_lambda_batch`
+    """
+
+    def __init__(self, filter_set, time, wavelength, flux,
+                 interpolation_kind='linear', cache=None):
+        time = to_days(time)
+        order = np.argsort(time, kind='stable')
+        if np.any(np.diff(time[order]) == 0):
+            raise ValueError('epochs need to be unique')
+        self.time = time[order]
+        self.filter_set = filter_set
+        self.wavelength = wavelength
+        self.flux = flux[order]
+        self.interpolation_kind = interpolation_kind
+        self.cache = cache
+        self._epoch_f_lambda = None
+        self._interpolation_objects = {}
+
+    @property
+    def filter_ids(self):
+        return [item.filter_id for item in self.filter_set]
+
+    @property
+    def photometry(self):
+        """`~wsynphot.batch.BatchPhotometry` of the spectrum grid"""
+        return self.filter_set.get_batch_photometry(self.wavelength)
+
+    @property
+    def epoch_f_lambda(self):
+        """(n_epochs, n_filters) flux densities of the epoch spectra in
+        erg/s/cm^2/Angstrom, computed on first use"""
+        if self._epoch_f_lambda is None:
+            cache = get_photometry_cache(self.cache)
+            if cache is None:
+                self._epoch_f_lambda = self.photometry.calculate_f_lambda(
+                    self.flux, DEFAULT_CHUNK_SIZE)
+            else:
+                self._epoch_f_lambda = cache.calculate(self.photometry,
+                                                       self.flux)[0]
+        return self._epoch_f_lambda
+
+    def get_interpolation_object(self, interpolation_kind=None):
+        """interp1d of the epoch flux densities in time, built once per
+        kind"""
+        if interpolation_kind is None:
+            interpolation_kind = self.interpolation_kind
+        interpolation_object = self._interpolation_objects.get(
+            interpolation_kind)
+        if interpolation_object is None:
+            interpolation_object = interpolate.interp1d(
+                self.time, self.epoch_f_lambda, kind=interpolation_kind,
+                axis=0, bounds_error=False, fill_value=np.nan,
+                assume_sorted=True)
+            self._interpolation_objects[interpolation_kind] = \
+                interpolation_object
+        return interpolation_object
+
+    def calculate_f_lambda(self, time, interpolation_kind=None):
+        """
+        Flux densities at arbitrary times
+
+        Parameters
+        ----------
+
+        time: ~astropy.units.Quantity or numpy.ndarray
+            (n_times,) times (plain arrays are in days)
+
+        interpolation_kind: str or int, optional
+            default: the kind of the model
+
+        Returns
+        -------
+            : numpy.ndarray
+            (n_times, n_filters) (or (n_filters,) for a scalar time) in
+            erg/s/cm^2/Angstrom, NaN outside of the epochs
+        """
+        return self.get_interpolation_object(interpolation_kind)(
+            to_days(time))
+
+    def calculate_magnitudes(self, time, magnitude_system='ab',
+                             interpolation_kind=None):
+        """(n_times, n_filters) magnitudes at arbitrary times, see
+        `calculate_f_lambda`"""
+        with np.errstate(invalid='ignore', divide='ignore'):
+            return BatchPhotometry.convert_f_lambda_to_magnitudes(
+                self.calculate_f_lambda(time, interpolation_kind),
+                self.photometry.get_zero_points(magnitude_system))
+
+    def observe(self, time, filter_ids, magnitude_system='ab',
+                interpolation_kind=None):
+        """
+        Magnitudes of individual observations, each in one filter
+
+        Parameters
+        ----------
+
+        time: ~astropy.units.Quantity or numpy.ndarray
+            (n_observations,) times
+
+        filter_ids: list of str
+            (n_observations,) filter of each observation
+
+        Returns
+        -------
+            : numpy.ndarray
+            (n_observations,) magnitudes
+        """
+        filter_idx = {filter_id: i for i, filter_id in
+                      enumerate(self.filter_ids)}
+        try:
+            columns = np.array([filter_idx[filter_id]
+                                for filter_id in filter_ids], dtype=int)
+        except KeyError as e:
+            raise ValueError('Filter {0} is not in the filter set'.format(
+                e.args[0]))
+        magnitudes = self.calculate_magnitudes(time, magnitude_system,
+                                               interpolation_kind)
+        return magnitudes[np.arange(len(columns)), columns]
+
+    def to_dataframe(self, time, magnitude_system='ab',
+                     interpolation_kind=None):
+        """Magnitudes at `time` as DataFrame indexed by time (days) with one
+        column per filter"""
+        return pd.DataFrame(
+            self.calculate_magnitudes(time, magnitude_system,
+                                      interpolation_kind),
+            columns=self.filter_ids,
+            index=pd.Index(to_days(time), name='time'))
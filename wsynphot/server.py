@@ -0,0 +1,516 @@
+"""Local HTTP service for synthetic photometry
+
+Short scripts that need the photometry of a few spectra spend most of their
+time importing wsynphot, loading filters and computing Vega zero points.
+`PhotometryServer` does this once for named filter sets and answers JSON
+requests over HTTP::
+
+    GET  /filter_sets   names, filter IDs and pivot wavelengths of the sets
+    POST /photometry    f_lambda and magnitudes of spectra
+    POST /convert       magnitudes between 'ab', 'vega' and 'f_lambda'
+    GET  /stats         request counts, latency percentiles, batching
+
+A photometry request names a filter set and gives the spectra on one
+wavelength grid (in Angstrom and erg/s/cm^2/Angstrom unless units are
+given)::
+
+    {"filter_set": "sdss", "magnitude_system": "vega",
+     "wavelength": [...], "flux": [[...], [...]]}
+
+Concurrent photometry requests are collected for up to `max_wait` seconds
+into micro-batches, so spectra of several clients on the same wavelength grid
+are integrated in one matrix product.
+"""
+from collections import defaultdict, deque
+from concurrent.futures import Future
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import json
+import logging
+import queue
+import threading
+import time
+
+import numpy as np
+from astropy import units as u
+
+from wsynphot.batch import to_angstrom, to_f_lambda
+from wsynphot.spectrum1d import FLAM_UNIT
+from wsynphot.util.cache import array_fingerprint
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_HOST = '127.0.0.1'
+DEFAULT_PORT = 8765
+CONVERSION_SYSTEMS = ('ab', 'vega', 'f_lambda')
+
+_STOP = object()
+
+
+class LatencyStats(object):
+    """
+    Latencies of the most recent requests per endpoint
+
+    Parameters
+    ----------
+
+    maxlen: int, optional
+        number of requests per endpoint kept for the percentiles
+    """
+
+    percentiles = (50, 90, 99)
+
+    def __init__(self, maxlen=10000):
+        self._latencies = defaultdict(lambda: deque(maxlen=maxlen))
+        self._counts = defaultdict(int)
+        self._errors = defaultdict(int)
+        self._lock = threading.Lock()
+
+    def record(self, endpoint, seconds, error=False):
+        with self._lock:
+            self._latencies[endpoint].append(seconds)
+            self._counts[endpoint] += 1
+            if error:
+                self._errors[endpoint] += 1
+
+    def summary(self):
+        """Request and error counts and latency percentiles (in ms) by
+        endpoint"""
+        with self._lock:
+            latencies = {endpoint: np.array(values) for endpoint, values in
+                         self._latencies.items()}
+            counts = dict(self._counts)
+            errors = dict(self._errors)
+        summary = {}
+        for endpoint, values in latencies.items():
+            stats = {'count': counts[endpoint],
+                     'errors': errors.get(endpoint, 0)}
+            for percentile, value in zip(
+                    self.percentiles,
+                    np.percentile(values * 1e3, self.percentiles)):
+                stats['p{0}_ms'.format(percentile)] = float(value)
+            stats['max_ms'] = float(values.max() * 1e3)
+            summary[endpoint] = stats
+        return summary
+
+
+class MicroBatcher(object):
+    """
+    Collects the spectra of concurrent requests into batches for one filter
+    set
+
+    A background thread takes the first waiting request, keeps collecting
+    requests for up to `max_wait` seconds or `max_batch_size` spectra and
+    computes the flux densities of all spectra on the same wavelength grid
+    at once.
+
+    Parameters
+    ----------
+
+    filter_set: ~wsynphot.FilterSet
+
+    max_batch_size: int, optional
+        spectra per batch
+
+    max_wait: float, optional
+        seconds the first request of a batch waits for others
+    """
+
+    def __init__(self, filter_set, max_batch_size=256, max_wait=0.002):
+        self.filter_set = filter_set
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait
+        self.n_batches = 0
+        self.n_spectra = 0
+        self._queue = queue.Queue()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    def submit(self, wavelength, flux):
+        """
+        Queue spectra for the next batch
+
+        Parameters
+        ----------
+
+        wavelength: numpy.ndarray
+            wavelength grid in Angstrom
+
+        flux: numpy.ndarray
+            (n_spectra, n_wavelength) flux in erg/s/cm^2/Angstrom
+
+        Returns
+        -------
+            : concurrent.futures.Future
+            resolving to the (n_spectra, n_filters) flux densities
+        """
+        future = Future()
+        self._queue.put((array_fingerprint(wavelength), wavelength, flux,
+                         future))
+        return future
+
+    def _collect(self, first):
+        batch = [first]
+        n_spectra = len(first[2])
+        deadline = time.perf_counter() + self.max_wait
+        while n_spectra < self.max_batch_size:
+            timeout = deadline - time.perf_counter()
+            try:
+                item = (self._queue.get(timeout=timeout) if timeout > 0
+                        else self._queue.get_nowait())
+            except queue.Empty:
+                break
+            if item is _STOP:
+                self._queue.put(_STOP)
+                break
+            batch.append(item)
+            n_spectra += len(item[2])
+        return batch
+
+    def _compute(self, batch):
+        self.n_batches += 1
+        self.n_spectra += sum(len(item[2]) for item in batch)
+        grids = defaultdict(list)
+        for item in batch:
+            grids[item[0]].append(item)
+        for items in grids.values():
+            try:
+                photometry = self.filter_set.get_batch_photometry(items[0][1])
+                f_lambda = photometry.calculate_f_lambda(
+                    np.concatenate([flux for _, _, flux, _ in items]),
+                    chunk_size=None)
+            except Exception as e:
+                for _, _, _, future in items:
+                    future.set_exception(e)
+                continue
+            start = 0
+            for _, _, flux, future in items:
+                future.set_result(f_lambda[start:start + len(flux)])
+                start += len(flux)
+
+    def _run(self):
+        while True:
+            first = self._queue.get()
+            if first is _STOP:
+                return
+            self._compute(self._collect(first))
+
+    def info(self):
+        """Number of batches and spectra computed"""
+        return {'n_batches': self.n_batches, 'n_spectra': self.n_spectra}
+
+    def close(self):
+        self._queue.put(_STOP)
+        self._thread.join()
+
+
+class _PhotometryRequestHandler(BaseHTTPRequestHandler):
+    """JSON requests to a `PhotometryServer` (``self.server``)"""
+
+    protocol_version = 'HTTP/1.1'
+
+    def _send_json(self, status, content):
+        body = json.dumps(content).encode()
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _read_body(self):
+        try:
+            length = int(self.headers.get('Content-Length') or 0)
+        except ValueError:
+            # the end of the body is unknown, so the connection cannot be
+            # reused
+            self.close_connection = True
+            return None
+        return self.rfile.read(length)
+
+    @staticmethod
+    def _parse_json(body):
+        try:
+            request = json.loads(body or b'{}')
+        except ValueError:
+            raise ValueError('Request body is not valid JSON')
+        if not isinstance(request, dict):
+            raise ValueError('Request body needs to be a JSON object')
+        return request
+
+    def _handle(self, method):
+        start = time.perf_counter()
+        endpoint = self.path.split('?')[0]
+        routes = self.server.photometry_server.routes
+        route = routes.get((method, endpoint))
+        # read the body of every request, also of rejected ones, so that it
+        # is not taken for the next request on a kept-alive connection
+        body = self._read_body()
+        if body is None:
+            status, content = 400, {'error': 'Invalid Content-Length'}
+        elif route is None:
+            status, content = 404, {'error': 'Unknown endpoint {0} {1}'.format(
+                method, endpoint)}
+        else:
+            try:
+                status, content = 200, route(
+                    self._parse_json(body) if method == 'POST' else None)
+            except (ValueError, KeyError, TypeError) as e:
+                status, content = 400, {'error': '{0}: {1}'.format(
+                    type(e).__name__, e)}
+            except Exception as e:
+                logger.exception('Request {0} {1} failed'.format(method,
+                                                                 endpoint))
+                status, content = 500, {'error': '{0}: {1}'.format(
+                    type(e).__name__, e)}
+        # recorded before responding, so the client sees it in /stats
+        self.server.photometry_server.latencies.record(
+            endpoint if route is not None else 'unknown',
+            time.perf_counter() - start, error=status != 200)
+        self._send_json(status, content)
+
+    def do_GET(self):
+        self._handle('GET')
+
+    def do_POST(self):
+        self._handle('POST')
+
+    def log_message(self, format, *args):
+        logger.debug('%s - %s', self.address_string(), format % args)
+
+
+class PhotometryServer(object):
+    """
+    HTTP service computing photometry with preloaded filter sets
+
+    Parameters
+    ----------
+
+    filter_sets: dict
+        filter sets by name, as `~wsynphot.FilterSet` or lists of filter IDs
+
+    host: str, optional
+        address to listen on, the local machine by default
+
+    port: int, optional
+        port to listen on, 0 picks a free one
+
+    magnitude_systems: tuple of str, optional
+        zero points computed at startup ('vega' needs the Vega calibration
+        spectrum)
+
+    wavelength_grids: list, optional
+        wavelength grids whose batch photometry weights are computed at
+        startup
+
+    max_batch_size, max_wait: optional
+        micro-batching of concurrent requests, see `MicroBatcher`
+    """
+
+    def __init__(self, filter_sets, host=DEFAULT_HOST, port=DEFAULT_PORT,
+                 magnitude_systems=('ab', 'vega'), wavelength_grids=(),
+                 max_batch_size=256, max_wait=0.002):
+        from wsynphot.base import FilterSet
+
+        start = time.perf_counter()
+        self.filter_sets = {}
+        self.zero_points = {}
+        for name, filter_set in filter_sets.items():
+            if not isinstance(filter_set, FilterSet):
+                filter_set = FilterSet(list(filter_set))
+            filter_set.lambda_pivot
+            self.zero_points[name] = {
+                magnitude_system: filter_set.calculate_zero_points(
+                    magnitude_system).to_value(FLAM_UNIT)
+                for magnitude_system in magnitude_systems}
+            for wavelength in wavelength_grids:
+                filter_set.get_batch_photometry(wavelength).weights
+            self.filter_sets[name] = filter_set
+        logger.info('Loaded {0} filter sets in {1:.2f} s'.format(
+            len(self.filter_sets), time.perf_counter() - start))
+
+        self.batchers = {name: MicroBatcher(filter_set, max_batch_size,
+                                            max_wait)
+                         for name, filter_set in self.filter_sets.items()}
+        self.latencies = LatencyStats()
+        self.routes = {('GET', '/filter_sets'): self.list_filter_sets,
+                       ('GET', '/stats'): self.stats,
+                       ('POST', '/photometry'): self.photometry,
+                       ('POST', '/convert'): self.convert}
+        self.httpd = ThreadingHTTPServer((host, port),
+                                         _PhotometryRequestHandler)
+        self.httpd.daemon_threads = True
+        self.httpd.photometry_server = self
+        self._thread = None
+
+    @property
+    def url(self):
+        host, port = self.httpd.server_address[:2]
+        return 'http://{0}:{1}'.format(host, port)
+
+    def _get_filter_set(self, request):
+        name = request['filter_set']
+        if name not in self.filter_sets:
+            raise ValueError('Unknown filter set {0!r}, available: {1}'.format(
+                name, sorted(self.filter_sets)))
+        return name, self.filter_sets[name]
+
+    def _get_zero_points(self, name, magnitude_system):
+        zero_points = self.zero_points[name]
+        if magnitude_system not in zero_points:
+            if magnitude_system not in ('ab', 'vega'):
+                raise ValueError("magnitude_system needs to be 'ab' or "
+                                 "'vega', not {0!r}".format(magnitude_system))
+            zero_points[magnitude_system] = self.filter_sets[
+                name].calculate_zero_points(magnitude_system).to_value(
+                FLAM_UNIT)
+        return zero_points[magnitude_system]
+
+    def list_filter_sets(self, request=None):
+        """Filter IDs and pivot wavelengths (Angstrom) of the filter sets"""
+        return {name: {'filter_ids': [item.filter_id for item in filter_set],
+                       'lambda_pivot': filter_set.lambda_pivot.to_value(
+                           u.angstrom).tolist()}
+                for name, filter_set in self.filter_sets.items()}
+
+    def photometry(self, request):
+        """
+        Photometry of the spectra of a request
+
+        Parameters
+        ----------
+
+        request: dict
+            'filter_set', 'wavelength' and 'flux' (one spectrum or a list
+            of spectra on that grid), optionally 'magnitude_system' (default
+            'ab'), 'wavelength_unit' and 'flux_unit'
+
+        Returns
+        -------
+            : dict
+            'filter_ids', 'f_lambda' (erg/s/cm^2/Angstrom) and 'magnitudes',
+            one list per spectrum if several were given
+        """
+        name, filter_set = self._get_filter_set(request)
+        zero_points = self._get_zero_points(
+            name, request.get('magnitude_system', 'ab'))
+        wavelength = np.asarray(request['wavelength'], dtype=np.float64)
+        if 'wavelength_unit' in request:
+            wavelength = to_angstrom(wavelength *
+                                     u.Unit(request['wavelength_unit']))
+        flux = np.asarray(request['flux'], dtype=np.float64)
+        if 'flux_unit' in request:
+            flux = to_f_lambda(flux * u.Unit(request['flux_unit']),
+                               wavelength)
+        single = flux.ndim == 1
+        flux = np.atleast_2d(flux)
+        if flux.ndim != 2 or flux.shape[1] != len(wavelength):
+            raise ValueError('flux needs to have the length of wavelength '
+                             '({0}), not shape {1}'.format(len(wavelength),
+                                                          flux.shape))
+        f_lambda = self.batchers[name].submit(wavelength, flux).result()
+        magnitudes = -2.5 * np.log10(f_lambda / zero_points)
+        if single:
+            f_lambda, magnitudes = f_lambda[0], magnitudes[0]
+        return {'filter_ids': [item.filter_id for item in filter_set],
+                'f_lambda': f_lambda.tolist(),
+                'magnitudes': magnitudes.tolist()}
+
+    def convert(self, request):
+        """
+        Convert magnitudes or flux densities between systems
+
+        Parameters
+        ----------
+
+        request: dict
+            'filter_set', 'values' (one row or a list of rows with a value
+            per filter), 'from' and 'to', each of 'ab', 'vega' and
+            'f_lambda' (erg/s/cm^2/Angstrom)
+
+        Returns
+        -------
+            : dict
+            'filter_ids' and converted 'values'
+        """
+        name, filter_set = self._get_filter_set(request)
+        systems = request['from'], request['to']
+        for system in systems:
+            if system not in CONVERSION_SYSTEMS:
+                raise ValueError('Systems need to be one of {0}, not '
+                                 '{1!r}'.format(CONVERSION_SYSTEMS, system))
+        values = np.asarray(request['values'], dtype=np.float64)
+        if np.shape(values)[-1:] != (len(filter_set.filter_set),):
+            raise ValueError('values need one entry per filter ({0})'.format(
+                len(filter_set.filter_set)))
+        from_system, to_system = systems
+        f_lambda = values
+        if from_system != 'f_lambda':
+            f_lambda = 10**(-0.4 * values) * self._get_zero_points(
+                name, from_system)
+        converted = f_lambda
+        if to_system != 'f_lambda':
+            converted = -2.5 * np.log10(
+                f_lambda / self._get_zero_points(name, to_system))
+        return {'filter_ids': [item.filter_id for item in filter_set],
+                'values': converted.tolist()}
+
+    def stats(self, request=None):
+        """Latencies by endpoint and micro-batching by filter set"""
+        return {'latency': self.latencies.summary(),
+                'batching': {name: batcher.info()
+                             for name, batcher in self.batchers.items()}}
+
+    def serve_forever(self):
+        """Handle requests until `shutdown` is called (or interrupted)"""
+        logger.info('Serving photometry on {0}'.format(self.url))
+        try:
+            self.httpd.serve_forever()
+        finally:
+            self._close()
+
+    def start(self):
+        """Handle requests in a background thread"""
+        self._thread = threading.Thread(target=self.httpd.serve_forever,
+                                        daemon=True)
+        self._thread.start()
+        return self
+
+    def _close(self):
+        self.httpd.server_close()
+        for batcher in self.batchers.values():
+            batcher.close()
+
+    def shutdown(self):
+        """Stop serving (from another thread than `serve_forever`)"""
+        self.httpd.shutdown()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+            self._close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc_info):
+        self.shutdown()
+
+
+def serve(filter_sets, host=DEFAULT_HOST, port=DEFAULT_PORT, **kwargs):
+    """
+    Run a `PhotometryServer` in the calling thread until interrupted
+
+    Parameters
+    ----------
+
+    filter_sets: dict
+        filter sets or lists of filter IDs by name
+
+    host, port: optional
+        address to listen on
+
+    Further keyword arguments are passed to `PhotometryServer`.
+    """
+    server = PhotometryServer(filter_sets, host, port, **kwargs)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        logger.info('Stopped photometry server')
@@ -0,0 +1,288 @@
+"""Filter sets in shared memory for multiprocessing workers
+
+Workers that load their own `~wsynphot.FilterSet` re-parse every filter file,
+recompute the Vega zero points and keep private copies of all arrays.
+`SharedFilterSet.publish` instead copies the arrays of a prepared filter set
+(wavelength and transmission of each filter, zero points, pivot wavelengths
+and the batch photometry weights of chosen wavelength grids) once into a
+`multiprocessing.shared_memory` block. The returned handle is small and
+picklable; workers call `attach` (or `get_shared_filter_set`) to get a filter
+set whose arrays are read-only views of the shared block, so attaching takes
+milliseconds and memory does not grow with the number of workers::
+
+    with SharedFilterSet.publish(filter_set, [wavelength]) as shared:
+        with ProcessPoolExecutor(initializer=..., initargs=(shared,)) as pool:
+            ...
+
+The publishing process owns the block and removes it with `unlink` (or on
+leaving the ``with`` block); it has to outlive the workers using it.
+"""
+from multiprocessing import resource_tracker, shared_memory
+import os
+import sys
+import weakref
+
+import numpy as np
+from astropy import units as u
+
+from wsynphot.batch import BatchPhotometry, to_angstrom
+from wsynphot.io.cache_filters import DetectorType
+from wsynphot.spectrum1d import FLAM_UNIT
+from wsynphot.util.cache import array_fingerprint
+
+# arrays in the shared block start at multiples of this many bytes
+ALIGNMENT = 64
+
+# filter sets attached in this process, by shared memory name
+_attached = {}
+
+
+def _attach_shared_memory(name):
+    """Attach to a block and drop it from the resource tracker, which would
+    otherwise unlink it when the attaching process exits; only the
+    publisher unlinks"""
+    if sys.version_info >= (3, 13):
+        return shared_memory.SharedMemory(name=name, track=False)
+    shm = shared_memory.SharedMemory(name=name)
+    if os.name == 'posix':
+        resource_tracker.unregister(shm._name, 'shared_memory')
+    return shm
+
+
+class _SharedBuffer(np.ndarray):
+    """Bytes of a mapped block; every array of the block is a view of it,
+    so the block stays mapped as long as any of them is alive"""
+
+
+def _map_shared_buffer(shm):
+    buffer = _SharedBuffer(shm.size, np.uint8, buffer=shm.buf)
+    buffer.shm = shm
+    return buffer
+
+
+class SharedFilterSet(object):
+    """
+    Picklable handle of a filter set published in shared memory, see
+    `publish`
+
+    Parameters
+    ----------
+
+    name: str
+        name of the shared memory block
+
+    layout: dict
+        offset, shape and dtype of every array in the block
+
+    filters: list of dict
+        filter ID, wavelength unit, detector type, interpolation kind and
+        Vega calibration file of every filter
+
+    wavelength_grids: int
+        number of published photometry wavelength grids
+    """
+
+    def __init__(self, name, layout, filters, wavelength_grids):
+        self.name = name
+        self.layout = layout
+        self.filters = filters
+        self.wavelength_grids = wavelength_grids
+        self._shm = None
+        self._buffer = None
+        self._owner = False
+
+    @classmethod
+    def publish(cls, filter_set, wavelength_grids=(),
+                magnitude_systems=('ab', 'vega')):
+        """
+        Copy a filter set into a new shared memory block
+
+        Parameters
+        ----------
+
+        filter_set: ~wsynphot.FilterSet
+
+        wavelength_grids: list, optional
+            wavelength grids (Quantities or plain arrays in Angstrom) whose
+            batch photometry weights are published too
+
+        magnitude_systems: tuple of str, optional
+            zero points to compute and publish, Vega zero points need the
+            Vega calibration spectrum
+
+        Returns
+        -------
+            : SharedFilterSet
+            handle owning the block
+        """
+        arrays = {}
+        filters = []
+        for i, item in enumerate(filter_set.filter_set):
+            arrays['wavelength{0}'.format(i)] = np.asarray(item.wavelength.value)
+            arrays['transmission{0}'.format(i)] = np.asarray(
+                item.transmission_lambda)
+            filters.append({'filter_id': item.filter_id,
+                            'unit': item.wavelength.unit.to_string(),
+                            'detector_type': int(item.detector_type),
+                            'interpolation_kind': item.interpolation_kind,
+                            'vega_fpath': item.vega_fpath})
+        arrays['lambda_pivot'] = filter_set.lambda_pivot.to_value(u.angstrom)
+        for magnitude_system in magnitude_systems:
+            arrays['zp_{0}'.format(magnitude_system)] = \
+                filter_set.calculate_zero_points(magnitude_system).to_value(
+                    FLAM_UNIT)
+        for i, wavelength in enumerate(wavelength_grids):
+            photometry = filter_set.get_batch_photometry(wavelength)
+            arrays['grid{0}'.format(i)] = photometry.wavelength
+            arrays['weights{0}'.format(i)] = photometry.weights
+
+        layout = {}
+        size = 0
+        for key, array in arrays.items():
+            layout[key] = (size, array.shape, array.dtype.str)
+            size += -(-array.nbytes // ALIGNMENT) * ALIGNMENT
+        shm = shared_memory.SharedMemory(create=True, size=max(size, 1))
+        shared = cls(shm.name, layout, filters, len(wavelength_grids))
+        shared._shm = shm
+        shared._owner = True
+        for key, array in arrays.items():
+            shared._get_array(key)[...] = array
+        return shared
+
+    def __getstate__(self):
+        return {'name': self.name, 'layout': self.layout,
+                'filters': self.filters,
+                'wavelength_grids': self.wavelength_grids}
+
+    def __setstate__(self, state):
+        self.__init__(**state)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        if self._owner:
+            self.unlink()
+        self.close()
+
+    @property
+    def nbytes(self):
+        """Size of the shared block in bytes"""
+        return self._get_shm().size
+
+    def _get_shm(self):
+        if self._shm is None:
+            self._shm = _attach_shared_memory(self.name)
+        return self._shm
+
+    def _get_array(self, key):
+        buffer = self._buffer and self._buffer()
+        if buffer is None:
+            buffer = _map_shared_buffer(self._get_shm())
+            self._buffer = weakref.ref(buffer)
+        offset, shape, dtype = self.layout[key]
+        return np.ndarray(shape, dtype, buffer=buffer, offset=offset)
+
+    def _get_readonly_array(self, key):
+        array = self._get_array(key)
+        array.flags.writeable = False
+        return array
+
+    def attach(self):
+        """
+        Filter set backed by the shared block
+
+        The wavelength and transmission arrays are read-only views of the
+        block, zero points and pivot wavelengths are set from it and the
+        batch photometry of the published wavelength grids is ready without
+        recomputing weights. The block stays mapped as long as the filter
+        set or any of its arrays is alive, also after `close`.
+
+        Returns
+        -------
+            : ~wsynphot.FilterSet
+        """
+        from wsynphot.base import FilterCurve, FilterSet
+
+        lambda_pivot = self._get_readonly_array('lambda_pivot')
+        zero_points = {magnitude_system: self._get_readonly_array(
+            'zp_{0}'.format(magnitude_system))
+            for magnitude_system in ('ab', 'vega')
+            if 'zp_{0}'.format(magnitude_system) in self.layout}
+        filter_curves = []
+        for i, info in enumerate(self.filters):
+            item = FilterCurve(
+                u.Quantity(self._get_readonly_array('wavelength{0}'.format(i)),
+                           info['unit'], copy=False),
+                self._get_readonly_array('transmission{0}'.format(i)),
+                DetectorType(info['detector_type']),
+                interpolation_kind=info['interpolation_kind'],
+                filter_id=info['filter_id'], vega_fpath=info['vega_fpath'])
+            item.lambda_pivot = lambda_pivot[i] * u.angstrom
+            if 'ab' in zero_points:
+                item.zp_ab_f_lambda = zero_points['ab'][i] * FLAM_UNIT
+            if 'vega' in zero_points:
+                item.zp_vega_f_lambda = zero_points['vega'][i] * FLAM_UNIT
+            filter_curves.append(item)
+        filter_set = FilterSet(filter_curves)
+
+        for i in range(self.wavelength_grids):
+            wavelength = self._get_readonly_array('grid{0}'.format(i))
+            photometry = BatchPhotometry(filter_set, wavelength)
+            photometry._weights = self._get_readonly_array(
+                'weights{0}'.format(i))
+            if 'ab' in zero_points:
+                photometry._zp_ab_f_lambda = zero_points['ab']
+            if 'vega' in zero_points:
+                photometry._zp_vega_f_lambda = zero_points['vega']
+            filter_set._batch_photometry.put(
+                array_fingerprint(to_angstrom(wavelength)), photometry)
+        return filter_set
+
+    def close(self):
+        """Release the block in this process; it is unmapped right away if
+        no array of it is in use, otherwise once the last one is freed"""
+        _attached.pop(self.name, None)
+        if self._shm is not None:
+            if self._buffer is None or self._buffer() is None:
+                self._shm.close()
+            self._shm = None
+            self._buffer = None
+
+    def unlink(self):
+        """Remove the block (publisher only); processes that attached it keep
+        their mapping until they close it"""
+        if not self._owner:
+            raise ValueError('Only the publishing handle can unlink {0}'.format(
+                self.name))
+        if self._shm is not None:
+            if os.name == 'posix':
+                # workers sharing the resource tracker of this process have
+                # unregistered the block when attaching it
+                resource_tracker.register(self._shm._name, 'shared_memory')
+            self._shm.unlink()
+        else:
+            shm = shared_memory.SharedMemory(name=self.name)
+            shm.unlink()
+            shm.close()
+        self._owner = False
+
+
+def get_shared_filter_set(shared):
+    """
+    Filter set of a `SharedFilterSet` handle, attached once per process
+
+    Parameters
+    ----------
+
+    shared: SharedFilterSet
+
+    Returns
+    -------
+        : ~wsynphot.FilterSet
+    """
+    entry = _attached.get(shared.name)
+    if entry is None:
+        entry = (shared, shared.attach())
+        _attached[shared.name] = entry
+    return entry[1]
@@ -1,15 +1,55 @@
+import numpy as np
 from scipy import interpolate
 from astropy import units as u
-from spectrum1d import SKSpectrum1D as Spectrum1D
+from wsynphot.batch import DEFAULT_CHUNK_SIZE
+from wsynphot.spectrum1d import FLAM_UNIT, SKSpectrum1D as Spectrum1D
+from wsynphot.util.cache import array_fingerprint
+
+
+def calculate_interpolation_basis(wavelength_knots, wavelength,
+                                  interpolation_kind=3):
+    """
+    Basis of the knot interpolation: the (n_wavelength, n_knots) matrix `B`
+    with ``interp1d(wavelength_knots, flux_knots)(wavelength) ==
+    B.dot(flux_knots)``, as interp1d is linear in the knot values for a
+    fixed kind
+
+    Parameters
+    ----------
+
+    wavelength_knots: ~astropy.units.Quantity
+
+    wavelength: ~astropy.units.Quantity
+
+    interpolation_kind: str or int, optional
+        see scipy.interpolate.interp1d
+
+    Returns
+    -------
+        : numpy.ndarray
+    """
+    n_knots = len(wavelength_knots)
+    interpolation_object = interpolate.interp1d(
+        wavelength_knots.value, np.eye(n_knots), kind=interpolation_kind,
+        axis=0, bounds_error=False, fill_value=0.0)
+    return interpolation_object(wavelength.to_value(wavelength_knots.unit))
+
 
 class SpectralModel(object):
     """
     Spectral model
 
-
+    The flux is interpolated from the knots onto `wavelength`. The
+    interpolator is built once per set of knots and interpolation kind and
+    shared by all evaluations; `flux` is only evaluated on first access
+    after `wavelength` or `interpolation_kind` changed.
     """
 
     def __init__(self, wavelength_knots, flux_knots, wavelength=None, interpolation_kind=3):
+        self._interpolation_objects = {}
+        self._interpolation_knots = None
+        self._flux = None
+        self._flux_knots = None
         self.wavelength_knots = wavelength_knots
         self.flux_knots = flux_knots
         self._interpolation_kind = interpolation_kind
@@ -27,7 +67,7 @@ class SpectralModel(object):
     @wavelength.setter
     def wavelength(self, wavelength):
         self._wavelength = wavelength
-        self._flux = self.interpolate(self._wavelength, self.interpolation_kind)
+        self._flux = None
 
     @property
     def interpolation_kind(self):
@@ -36,15 +76,54 @@ class SpectralModel(object):
     @interpolation_kind.setter
     def interpolation_kind(self, interpolation_kind):
         self._interpolation_kind = interpolation_kind
-        self._flux = self.interpolate(self.wavelength, self.interpolation_kind)
+        self._flux = None
 
 
 
     @property
     def flux(self):
+        knots_fingerprint = self._knots_fingerprint()
+        if self._flux is None or self._flux_knots != knots_fingerprint:
+            self._flux = self.interpolate(self.wavelength,
+                                          self.interpolation_kind)
+            self._flux_knots = knots_fingerprint
         return self._flux
 
-    def interpolate(self, wavelength, interpolation_kind=3):
+    def _knots_fingerprint(self):
+        return (array_fingerprint(self.wavelength_knots),
+                array_fingerprint(self.flux_knots))
+
+    def get_interpolation_object(self, interpolation_kind=None):
+        """
+        Interpolator through the knots; it is rebuilt only when the knots
+        change (checked by a fingerprint of the knots, which are small)
+
+        Parameters
+        ----------
+
+        interpolation_kind: str or int, optional
+            see scipy.interpolate.interp1d (default: `interpolation_kind`)
+
+        """
+        if interpolation_kind is None:
+            interpolation_kind = self.interpolation_kind
+        knots_fingerprint = self._knots_fingerprint()
+        if self._interpolation_knots != knots_fingerprint:
+            self._interpolation_objects = {}
+            self._interpolation_knots = knots_fingerprint
+
+        interpolation_object = self._interpolation_objects.get(
+            interpolation_kind)
+        if interpolation_object is None:
+            interpolation_object = interpolate.interp1d(
+                u.Quantity(self.wavelength_knots).value,
+                u.Quantity(self.flux_knots).value, kind=interpolation_kind,
+                bounds_error=False, fill_value=0.0)
+            self._interpolation_objects[interpolation_kind] = \
+                interpolation_object
+        return interpolation_object
+
+    def interpolate(self, wavelength, interpolation_kind=None):
         """
         Interpolate the filter onto new wavelength grid
 
@@ -54,16 +133,17 @@ class SpectralModel(object):
         wavelength: ~astropy.units.Quantity
             wavelength grid to interpolate on
 
+        interpolation_kind: str or int, optional
+            see scipy.interpolate.interp1d (default: `interpolation_kind`)
+
         """
 
-        converted_wavelength = wavelength.to(self.wavelength.unit)
-        interpolation_object = interpolate.interp1d(self.wavelength_knots,
-                                                         self.flux_knots,
-                                                         kind=interpolation_kind,
-                                                         bounds_error=False,
-                                                         fill_value=0.0)
+        converted_wavelength = wavelength.to(self.wavelength_knots.unit)
+        interpolation_object = self.get_interpolation_object(
+            interpolation_kind)
 
-        return interpolation_object(converted_wavelength) * self.flux_knots.unit
+        return (interpolation_object(converted_wavelength.value) *
+                self.flux_knots.unit)
 
 
 
@@ -113,7 +193,10 @@ class MagnitudeSpectralModel(SpectralModel):
 
 
         self.magnitude_set = magnitude_set
+        self.magnitude_system = magnitude_system
+        self.end_point_flux = end_point_flux
         self.flux_err = flux_err
+        self._response_operators = {}
         super(MagnitudeSpectralModel, self).__init__(wavelength, flux,
                                                      interpolation_kind=
                                                      interpolation_kind)
@@ -127,3 +210,300 @@ class MagnitudeSpectralModel(SpectralModel):
     def calculate_ab_magnitudes(self):
         return self.magnitude_set.calculate_ab_magnitudes(self)
 
+    def get_response_operator(self):
+        """
+        Response of the synthetic photometry through `magnitude_set` to the
+        flux knots for the current wavelength grid and interpolation kind
+
+        Returns
+        -------
+            : KnotResponse
+        """
+        key = (array_fingerprint(self.wavelength_knots),
+               array_fingerprint(self.wavelength), self.interpolation_kind)
+        response = self._response_operators.get(key)
+        if response is None:
+            response = KnotResponse(self.magnitude_set, self.wavelength_knots,
+                                    self.wavelength, self.interpolation_kind)
+            self._response_operators = {key: response}
+        return response
+
+    def fit_flux_knots(self, **kwargs):
+        """
+        Fit the flux knots so that the synthetic magnitudes of the model
+        match the magnitudes of `magnitude_set`; the end point knots stay
+        fixed. Further keyword arguments are passed to
+        `KnotResponse.fit_flux_knots`.
+        """
+        free_knots = np.ones(len(self.wavelength_knots), dtype=bool)
+        if self.end_point_flux is not None:
+            free_knots[[0, -1]] = False
+        uncertainties = self.magnitude_set.magnitude_uncertainties
+        if uncertainties is None or uncertainties.ndim == 0:
+            uncertainties = None
+        flux_unit = self.flux_knots.unit
+        flux_knots = self.get_response_operator().fit_flux_knots(
+            self.magnitude_set.magnitudes, uncertainties,
+            magnitude_system=self.magnitude_system,
+            initial_flux_knots=self.flux_knots, free_knots=free_knots,
+            **kwargs)
+        self.flux_knots = (flux_knots * FLAM_UNIT).to(flux_unit)
+        return self.flux_knots
+
+    @classmethod
+    def from_catalog(cls, magnitude_catalog, wavelength,
+                     interpolation_kind=3, end_point_flux=0.0):
+        """
+        Spectral models of all objects of a catalogue at once, see
+        `BatchMagnitudeSpectralModel`
+        """
+        return BatchMagnitudeSpectralModel(
+            magnitude_catalog, wavelength,
+            interpolation_kind=interpolation_kind,
+            end_point_flux=end_point_flux)
+
+
+class BatchMagnitudeSpectralModel(object):
+    """
+    Spectral models from the magnitudes of all objects of a catalogue
+
+    All objects share the knot wavelengths (the pivot wavelengths of the
+    filters and optionally the start and end of the outer filters) and hence
+    the interpolation basis `B` on the output grid, so the SEDs of a block of
+    objects are the single matrix product ``flux_knots.dot(B.T)``. Objects
+    with missing magnitudes get NaN fluxes.
+
+    Parameters
+    ----------
+
+    magnitude_catalog: ~wsynphot.MagnitudeCatalog
+
+    wavelength: ~astropy.units.Quantity
+        common output wavelength grid
+
+    interpolation_kind: str or int, optional
+        see scipy.interpolate.interp1d
+
+    end_point_flux: float or ~astropy.units.Quantity or None, optional
+        flux at the start of the first and the end of the last filter, None
+        to not add these knots
+    """
+
+    def __init__(self, magnitude_catalog, wavelength, interpolation_kind=3,
+                 end_point_flux=0.0):
+        self.magnitude_catalog = magnitude_catalog
+        self.wavelength = wavelength
+        self.interpolation_kind = interpolation_kind
+        self.end_point_flux = end_point_flux
+
+        wavelength_knots = magnitude_catalog.lambda_pivot.to_value(u.angstrom)
+        if end_point_flux is not None:
+            wavelength_knots = np.concatenate([
+                [magnitude_catalog[0].wavelength_start.to_value(u.angstrom)],
+                wavelength_knots,
+                [magnitude_catalog[-1].wavelength_end.to_value(u.angstrom)]])
+        self.wavelength_knots = wavelength_knots * u.angstrom
+        self.basis = calculate_interpolation_basis(
+            self.wavelength_knots, wavelength, interpolation_kind)
+
+    def __len__(self):
+        return self.magnitude_catalog.n_objects
+
+    def calculate_flux_knots(self, rows=slice(None)):
+        """
+        (n_rows, n_knots) knot fluxes of catalogue rows in
+        erg/s/cm^2/Angstrom
+        """
+        catalog = self.magnitude_catalog
+        f_lambda = catalog._convert_magnitudes_to_f_lambda(
+            catalog.magnitudes[rows],
+            catalog.zero_points.to_value(FLAM_UNIT))
+        if self.end_point_flux is None:
+            return f_lambda
+        end_point_flux = u.Quantity(self.end_point_flux,
+                                    FLAM_UNIT).to_value(FLAM_UNIT)
+        end_points = np.full((len(f_lambda), 1), end_point_flux)
+        return np.hstack([end_points, f_lambda, end_points])
+
+    def iter_flux(self, chunk_size=DEFAULT_CHUNK_SIZE):
+        """
+        SEDs of blocks of objects
+
+        Yields
+        ------
+            : slice, numpy.ndarray
+            rows of the catalogue and their (n_rows, n_wavelength) fluxes in
+            erg/s/cm^2/Angstrom
+        """
+        for start in range(0, len(self), chunk_size):
+            rows = slice(start, min(start + chunk_size, len(self)))
+            yield rows, np.dot(self.calculate_flux_knots(rows), self.basis.T)
+
+    def calculate_flux(self, out=None, chunk_size=DEFAULT_CHUNK_SIZE):
+        """
+        SEDs of all objects
+
+        Parameters
+        ----------
+
+        out: numpy.ndarray, optional
+            (n_objects, n_wavelength) array to write into, e.g. a
+            `numpy.memmap` for catalogues too large for memory
+
+        chunk_size: int, optional
+            number of objects evaluated at once
+
+        Returns
+        -------
+            : numpy.ndarray
+            (n_objects, n_wavelength) fluxes in erg/s/cm^2/Angstrom
+        """
+        if out is None:
+            out = np.empty((len(self), self.basis.shape[0]))
+        for rows, flux in self.iter_flux(chunk_size):
+            out[rows] = flux
+        return out
+
+    def get_spectral_model(self, idx):
+        """`SpectralModel` of object number `idx`"""
+        return SpectralModel(
+            self.wavelength_knots,
+            self.calculate_flux_knots(slice(idx, idx + 1))[0] * FLAM_UNIT,
+            wavelength=self.wavelength,
+            interpolation_kind=self.interpolation_kind)
+
+
+
+class KnotResponse(object):
+    """
+    Linear response of the synthetic photometry of a knot spectral model to
+    its flux knots
+
+    The average flux densities through the filters are
+    ``R.dot(flux_knots)`` with the (n_filters, n_knots) response matrix `R`,
+    so evaluating the magnitudes of new knot fluxes costs one small
+    matrix-vector product.
+
+    Parameters
+    ----------
+
+    filter_set: ~wsynphot.FilterSet
+
+    wavelength_knots: ~astropy.units.Quantity
+
+    wavelength: ~astropy.units.Quantity
+        wavelength grid the model is evaluated on for the photometry
+
+    interpolation_kind: str or int, optional
+        see scipy.interpolate.interp1d
+    """
+
+    def __init__(self, filter_set, wavelength_knots, wavelength,
+                 interpolation_kind=3):
+        photometry = filter_set.get_batch_photometry(wavelength)
+        basis = calculate_interpolation_basis(wavelength_knots, wavelength,
+                                              interpolation_kind)
+        self.photometry = photometry
+        self.matrix = np.dot(photometry.weights, basis)
+
+    def _to_value(self, flux_knots):
+        if hasattr(flux_knots, 'unit'):
+            return flux_knots.to_value(FLAM_UNIT)
+        return np.asarray(flux_knots, dtype=np.float64)
+
+    def calculate_f_lambda(self, flux_knots):
+        """
+        Average flux densities through the filters
+
+        Parameters
+        ----------
+
+        flux_knots: ~astropy.units.Quantity or numpy.ndarray
+            (n_knots,) or (n_models, n_knots) knot fluxes (plain arrays in
+            erg/s/cm^2/Angstrom)
+
+        Returns
+        -------
+            : numpy.ndarray
+            (n_filters,) or (n_models, n_filters) in erg/s/cm^2/Angstrom
+        """
+        return np.dot(self._to_value(flux_knots), self.matrix.T)
+
+    def calculate_magnitudes(self, flux_knots, magnitude_system='vega'):
+        """Magnitudes of knot fluxes, see `calculate_f_lambda`"""
+        return self.photometry.convert_f_lambda_to_magnitudes(
+            self.calculate_f_lambda(flux_knots),
+            self.photometry.get_zero_points(magnitude_system))
+
+    def calculate_jacobian(self, flux_knots):
+        """(n_filters, n_knots) derivative of the magnitudes with respect to
+        the knot fluxes (in erg/s/cm^2/Angstrom)"""
+        f_lambda = self.calculate_f_lambda(flux_knots)
+        return -2.5 / np.log(10) * self.matrix / f_lambda[:, None]
+
+    def fit_flux_knots(self, magnitudes, magnitude_uncertainties=None,
+                       magnitude_system='vega', initial_flux_knots=None,
+                       free_knots=None, max_iterations=50, tolerance=1e-10):
+        """
+        Fit knot fluxes to observed magnitudes by Gauss-Newton iterations,
+        each costing one product with the response matrix
+
+        Parameters
+        ----------
+
+        magnitudes: numpy.ndarray
+            (n_filters,) observed magnitudes
+
+        magnitude_uncertainties: numpy.ndarray, optional
+            (n_filters,) uncertainties (default: all 1)
+
+        magnitude_system: str, optional
+            'ab' or 'vega'
+
+        initial_flux_knots: ~astropy.units.Quantity or numpy.ndarray
+            (n_knots,) starting values, also the values of fixed knots
+
+        free_knots: numpy.ndarray, optional
+            boolean mask of the knots to fit (default: all)
+
+        max_iterations: int, optional
+
+        tolerance: float, optional
+            stop when the largest relative change of a knot is below this
+
+        Returns
+        -------
+            : numpy.ndarray
+            (n_knots,) fitted knot fluxes in erg/s/cm^2/Angstrom
+        """
+        magnitudes = np.asarray(magnitudes, dtype=np.float64)
+        if magnitude_uncertainties is None:
+            magnitude_uncertainties = np.ones_like(magnitudes)
+        weights = 1. / np.asarray(magnitude_uncertainties, dtype=np.float64)
+        n_knots = self.matrix.shape[1]
+        if free_knots is None:
+            free_knots = np.ones(n_knots, dtype=bool)
+        free_knots = np.asarray(free_knots, dtype=bool)
+
+        zero_points = self.photometry.get_zero_points(magnitude_system)
+        if initial_flux_knots is None:
+            # least squares solution in flux space as starting point
+            flux_knots = np.zeros(n_knots)
+            flux_knots[free_knots] = np.linalg.lstsq(
+                self.matrix[:, free_knots],
+                zero_points * 10 ** (-0.4 * magnitudes), rcond=None)[0]
+        else:
+            flux_knots = self._to_value(initial_flux_knots).copy()
+
+        for i in range(max_iterations):
+            residual = (magnitudes -
+                        self.calculate_magnitudes(flux_knots,
+                                                  magnitude_system))
+            jacobian = self.calculate_jacobian(flux_knots)[:, free_knots]
+            step = np.linalg.lstsq(jacobian * weights[:, None],
+                                   residual * weights, rcond=None)[0]
+            flux_knots[free_knots] += step
+            scale = np.maximum(np.abs(flux_knots[free_knots]), 1e-300)
+            if np.all(np.abs(step) <= tolerance * scale):
+                break
+        return flux_knots
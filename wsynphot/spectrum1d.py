@@ -3,6 +3,13 @@ from astropy import constants as const
 from astropy import units as u
 from starkit.fix_spectrum1d import SKSpectrum1D
 
+FLAM_UNIT = u.erg / (u.cm**2 * u.s * u.AA)
+
+# radiation constants for wavelengths in Angstrom and temperatures in Kelvin
+BB_C1 = (2.0 * const.h * const.c ** 2).to_value(u.erg * u.AA ** 4 /
+                                                 (u.cm ** 2 * u.s))
+BB_C2 = (const.h * const.c / const.k_B).to_value(u.AA * u.K)
+
 
 # TODO: this can eventually be replaced with an astropy3+ function
 # from astropy.modeling import blackbody_lambda
@@ -37,6 +44,38 @@ def blackbody_lambda(wavelength, temperature):
     return flux / u.sr  # Add per steradian to output flux unit
 
 
+def blackbody_lambda_grid(wavelength, temperature):
+    """
+    Calculate the blackbody spectral density per unit wavelength for many
+    temperatures at once, without units in the calculation.
+
+    Parameters
+    ----------
+    wavelength : `~numpy.ndarray` or `~astropy.units.Quantity`
+        Wavelength array to evaluate on.
+        If not a Quantity, it is assumed to be in Angstrom.
+
+    temperature : float, `~numpy.ndarray` or `~astropy.units.Quantity`
+        Blackbody temperatures.
+        If not a Quantity, they are assumed to be in Kelvin.
+
+    Returns
+    -------
+    flux : `~numpy.ndarray`
+        (n_temperature, n_wavelength) flux in erg/s/cm^2/Angstrom/sr
+    """
+    if hasattr(wavelength, 'unit'):
+        wavelength = wavelength.to_value(u.AA, u.spectral())
+    wavelength = np.asarray(wavelength, dtype=np.float64)
+    if hasattr(temperature, 'unit'):
+        temperature = temperature.to_value(u.K, u.temperature())
+    temperature = np.atleast_1d(np.asarray(temperature, dtype=np.float64))
+
+    with np.errstate(over='ignore'):
+        boltzm1 = np.expm1(BB_C2 / np.multiply.outer(temperature, wavelength))
+    return BB_C1 / wavelength ** 5 / boltzm1
+
+
 def blackbody1d(temperature, radius, distance=10*u.pc,
                 lambda_min=2000, lambda_max=10000, dlambda=1):
     """
@@ -79,10 +118,12 @@ def blackbody1d(temperature, radius, distance=10*u.pc,
     if not hasattr(distance, 'unit'):
         raise ValueError("distance needs to be a quantity (e.g., 1 * u.pc)")
 
-    wavelength = np.arange(lambda_min, lambda_max, dlambda) * u.AA
+    wavelength = np.arange(lambda_min, lambda_max, dlambda)
 
     # the factor of pi sr is from the angular integral
-    flux = np.pi * u.sr * (radius/distance)**2 * blackbody_lambda(wavelength, temperature)
+    scale = np.pi * (radius / distance).to_value(u.dimensionless_unscaled)**2
+    flux = scale * blackbody_lambda_grid(wavelength, temperature)[0] * FLAM_UNIT
+    wavelength = wavelength * u.AA
 
     # theoretical quantity has no uncertainty
     uncertainty = np.zeros_like(flux)
@@ -0,0 +1,205 @@
+"""Streaming photometry of arbitrarily many spectra
+
+`PhotometryStream` consumes any iterable of spectra (e.g. lazily read files
+or a database cursor), groups consecutive spectra on the same wavelength
+grid into micro-batches for `~wsynphot.batch.BatchPhotometry` and yields one
+record per spectrum, in input order. At most one batch (plus the optional
+prefetch queue) is held in memory. The stream is pulled by the consumer;
+with prefetching a reader thread fills a bounded queue and blocks while it
+is full, so a slow consumer throttles the reader.
+"""
+from collections import namedtuple
+import queue
+import threading
+import time
+
+import numpy as np
+
+from wsynphot.batch import to_angstrom, to_f_lambda
+from wsynphot.util.cache import array_fingerprint
+
+PhotometryRecord = namedtuple('PhotometryRecord', [
+    'index', 'spectrum_id', 'f_lambda', 'magnitudes', 'seconds'])
+PhotometryRecord.__doc__ = """Photometry of one spectrum of a stream
+
+index : int
+    position in the stream
+spectrum_id :
+    identifier given with the spectrum, otherwise the index
+f_lambda : numpy.ndarray
+    (n_filters,) flux densities in erg/s/cm^2/Angstrom
+magnitudes : numpy.ndarray
+    (n_filters,) magnitudes
+seconds : float or None
+    share of the batch computation time (with ``timings=True``)
+"""
+
+DEFAULT_BATCH_SIZE = 256
+
+_END = object()
+
+
+def _split_item(item, index):
+    """(spectrum_id, wavelength, flux) of a stream item: a spectrum object,
+    a (wavelength, flux) pair or an (id, spectrum) pair"""
+    spectrum_id = index
+    if isinstance(item, tuple) and np.ndim(item[0]) == 0:
+        spectrum_id, item = item
+    if isinstance(item, tuple):
+        wavelength, flux = item
+    else:
+        wavelength, flux = item.wavelength, item.flux
+    return spectrum_id, wavelength, flux
+
+
+class _Prefetcher(object):
+    """Reads an iterable in a background thread into a bounded queue"""
+
+    def __init__(self, iterable, maxsize):
+        self._queue = queue.Queue(maxsize)
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, args=(iterable,),
+                                        daemon=True)
+        self._thread.start()
+
+    def _put(self, item):
+        while not self._stop.is_set():
+            try:
+                self._queue.put(item, timeout=0.1)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def _run(self, iterable):
+        try:
+            for item in iterable:
+                if not self._put((None, item)):
+                    return
+        except BaseException as e:
+            self._put((e, None))
+            return
+        self._put((None, _END))
+
+    def __iter__(self):
+        while True:
+            error, item = self._queue.get()
+            if error is not None:
+                raise error
+            if item is _END:
+                return
+            yield item
+
+    def close(self):
+        self._stop.set()
+        self._thread.join()
+
+
+class PhotometryStream(object):
+    """
+    Micro-batched photometry of a stream of spectra through a filter set
+
+    Parameters
+    ----------
+
+    filter_set: ~wsynphot.FilterSet
+
+    magnitude_system: str, optional
+        'ab' or 'vega'
+
+    batch_size: int, optional
+        maximum number of spectra integrated at once
+
+    prefetch: int, optional
+        number of spectra read ahead in a background thread, 0 reads in the
+        consuming thread
+
+    timings: bool, optional
+        record the computation time per spectrum
+    """
+
+    def __init__(self, filter_set, magnitude_system='ab',
+                 batch_size=DEFAULT_BATCH_SIZE, prefetch=0, timings=False):
+        if magnitude_system not in ('ab', 'vega'):
+            raise ValueError("magnitude_system needs to be 'ab' or 'vega', "
+                             "not {0!r}".format(magnitude_system))
+        self.filter_set = filter_set
+        self.magnitude_system = magnitude_system
+        self.batch_size = batch_size
+        self.prefetch = prefetch
+        self.timings = timings
+        self.n_spectra = 0
+        self.n_batches = 0
+        self.compute_seconds = 0.
+
+    def _flush(self, wavelength, batch):
+        start = time.perf_counter()
+        photometry = self.filter_set.get_batch_photometry(wavelength)
+        flux = np.array([to_f_lambda(flux, photometry.wavelength)
+                         for _, _, flux in batch])
+        f_lambda = photometry.calculate_f_lambda(flux, chunk_size=None)
+        magnitudes = photometry.convert_f_lambda_to_magnitudes(
+            f_lambda, photometry.get_zero_points(self.magnitude_system))
+        seconds = time.perf_counter() - start
+        self.n_batches += 1
+        self.n_spectra += len(batch)
+        self.compute_seconds += seconds
+        seconds = seconds / len(batch) if self.timings else None
+        for (index, spectrum_id, _), row_f_lambda, row_magnitudes in zip(
+                batch, f_lambda, magnitudes):
+            yield PhotometryRecord(index, spectrum_id, row_f_lambda,
+                                   row_magnitudes, seconds)
+
+    def process(self, spectra):
+        """
+        Photometry of a stream of spectra
+
+        Parameters
+        ----------
+
+        spectra: iterable
+            spectrum objects (with `wavelength` and `flux`),
+            (wavelength, flux) pairs or (spectrum_id, spectrum) pairs
+
+        Yields
+        ------
+            : PhotometryRecord
+        """
+        prefetcher = None
+        if self.prefetch > 0:
+            prefetcher = _Prefetcher(spectra, self.prefetch)
+            spectra = prefetcher
+        try:
+            wavelength = grid_key = None
+            batch = []
+            for index, item in enumerate(spectra):
+                spectrum_id, item_wavelength, flux = _split_item(item, index)
+                item_grid_key = array_fingerprint(item_wavelength)
+                if batch and (item_grid_key != grid_key or
+                              len(batch) >= self.batch_size):
+                    for record in self._flush(wavelength, batch):
+                        yield record
+                    batch = []
+                if not batch:
+                    wavelength = to_angstrom(item_wavelength)
+                    grid_key = item_grid_key
+                batch.append((index, spectrum_id, flux))
+            if batch:
+                for record in self._flush(wavelength, batch):
+                    yield record
+        finally:
+            if prefetcher is not None:
+                prefetcher.close()
+
+    __call__ = process
+
+    def info(self):
+        """Number of spectra and batches processed and the total computation
+        time"""
+        return {'n_spectra': self.n_spectra, 'n_batches': self.n_batches,
+                'compute_seconds': self.compute_seconds}
+
+
+def stream_photometry(filter_set, spectra, **kwargs):
+    """Photometry records of a stream of spectra, see `PhotometryStream`"""
+    return PhotometryStream(filter_set, **kwargs).process(spectra)
@@ -0,0 +1,227 @@
+"""Generators for synthetic filter caches, calibration files and spectra
+
+These are used by the test-suite and the benchmarks so that neither of them
+needs network access to SVO or STScI.
+"""
+import os
+
+import numpy as np
+from astropy import units as u
+from astropy.io import fits
+from astropy.io.votable import from_table
+from astropy.io.votable.tree import Param
+from astropy.table import Table
+
+from wsynphot.io.cache_filters import DetectorType
+
+
+def make_transmission_curve(center, width, n_points=500, edge_width=0.1):
+    """Create a smooth top-hat like transmission curve
+
+    Parameters
+    ----------
+    center : float
+        Central wavelength of the filter (in Angstrom)
+    width : float
+        Full width of the filter (in Angstrom)
+    n_points : int, optional
+        Number of points sampling the transmission curve (default is 500)
+    edge_width : float, optional
+        Width of the filter edges as a fraction of `width` (default is 0.1)
+
+    Returns
+    -------
+    tuple of numpy.ndarray
+        (wavelength, transmission) with wavelength in Angstrom
+    """
+    wavelength = np.linspace(center - width, center + width, n_points)
+    edge = edge_width * width
+    transmission = 0.9 / (
+        (1 + np.exp((wavelength - center - width / 2.) / edge)) *
+        (1 + np.exp((center - width / 2. - wavelength) / edge)))
+    return wavelength, transmission
+
+
+def make_filter_curve(center=5000., width=1000., n_points=500,
+                      detector_type=DetectorType.PHOTON_COUNTER,
+                      filter_id=None, **kwargs):
+    """Create a `~wsynphot.FilterCurve` from `make_transmission_curve`
+
+    Further keyword arguments are passed to `~wsynphot.FilterCurve`.
+    """
+    from wsynphot.base import FilterCurve
+
+    wavelength, transmission = make_transmission_curve(center, width,
+                                                       n_points=n_points)
+    if filter_id is None:
+        filter_id = 'SYNTH/INST/F{0:05d}'.format(int(center))
+    return FilterCurve(wavelength * u.angstrom, transmission, detector_type,
+                       filter_id=filter_id, **kwargs)
+
+
+def make_filter_set(centers=(4500, 5500, 7000), relative_width=0.2,
+                    vega_dir=None, **kwargs):
+    """Create a `~wsynphot.FilterSet` of `make_filter_curve` filters
+
+    Parameters
+    ----------
+    centers : list of float, optional
+        Central wavelengths of the filters (in Angstrom)
+    relative_width : float, optional
+        Width of each filter as a fraction of its center (default is 0.2)
+    vega_dir : str, optional
+        Directory to write a `write_vega_fits` calibration file to, for
+        Vega magnitudes
+
+    Further keyword arguments are passed to `make_filter_curve`.
+    """
+    from wsynphot.base import FilterSet
+
+    if vega_dir is not None:
+        kwargs['vega_fpath'] = os.path.join(vega_dir, 'vega.fits')
+        if not os.path.exists(kwargs['vega_fpath']):
+            write_vega_fits(kwargs['vega_fpath'])
+    return FilterSet([make_filter_curve(center, relative_width * center,
+                                        **kwargs) for center in centers])
+
+
+def write_filter_votable(fpath, wavelength, transmission,
+                         detector_type=DetectorType.PHOTON_COUNTER):
+    """Write a transmission curve as VOTable in the format SVO provides it
+
+    Parameters
+    ----------
+    fpath : str
+        Path of the VOTable to write
+    wavelength : numpy.ndarray
+        Wavelength (in Angstrom)
+    transmission : numpy.ndarray
+        Transmission
+    detector_type : DetectorType, optional
+        Detector type stored as PARAM (default is photon counter)
+    """
+    table = Table([np.asarray(wavelength, dtype=np.float32),
+                   np.asarray(transmission, dtype=np.float32)],
+                  names=('Wavelength', 'Transmission'))
+    votable = from_table(table)
+    votable.get_first_table().params.append(
+        Param(votable, ID='DetectorType', name='DetectorType',
+              datatype='int', value=int(detector_type)))
+    votable.to_xml(fpath)
+
+
+def make_filter_cache(cache_dir, n_filters, n_points=500, facility='SYNTH',
+                      n_instruments=10, lambda_min=3000, lambda_max=10000,
+                      empty_files=False):
+    """Populate a directory with synthetic filters in the layout of the
+    wsynphot cache (facility/instrument/filter.vot)
+
+    Parameters
+    ----------
+    cache_dir : str
+        Cache directory to populate
+    n_filters : int
+        Number of filters to create
+    n_points : int, optional
+        Number of points per transmission curve (default is 500)
+    facility : str, optional
+        Name of the facility (default is 'SYNTH')
+    n_instruments : int, optional
+        Number of instruments the filters are spread across (default is 10)
+    lambda_min, lambda_max : float, optional
+        Range of the filter central wavelengths (in Angstrom)
+    empty_files : bool, optional
+        Only create empty files, which is sufficient for benchmarking the
+        index functions and much faster for very large caches
+
+    Returns
+    -------
+    list of str
+        Filter IDs in wsynphot format: 'facilty/instrument/filter'
+    """
+    centers = np.linspace(lambda_min, lambda_max, n_filters)
+    filter_ids = []
+    for i, center in enumerate(centers):
+        instrument = 'INST{0:d}'.format(i % n_instruments)
+        filter_name = 'F{0:05d}'.format(i)
+        dir_path = os.path.join(cache_dir, facility, instrument)
+        if not os.path.exists(dir_path):
+            os.makedirs(dir_path)
+        fpath = os.path.join(dir_path, '{0}.vot'.format(filter_name))
+        if empty_files:
+            open(fpath, 'w').close()
+        else:
+            wavelength, transmission = make_transmission_curve(
+                center, 0.1 * center, n_points=n_points)
+            write_filter_votable(fpath, wavelength, transmission,
+                                 DetectorType(i % 2))
+        filter_ids.append('/'.join([facility, instrument, filter_name]))
+    return filter_ids
+
+
+def make_spectrum_arrays(n_points=10000, lambda_min=2000, lambda_max=12000,
+                         temperature=9600., n_spectra=None, seed=0):
+    """Create blackbody-like spectra in erg/s/cm^2/Angstrom
+
+    Parameters
+    ----------
+    n_points : int, optional
+        Number of wavelength points (default is 10000)
+    lambda_min, lambda_max : float, optional
+        Wavelength range (in Angstrom)
+    temperature : float, optional
+        Temperature of the blackbody (in Kelvin)
+    n_spectra : int or None, optional
+        If given, return a (n_spectra, n_points) flux matrix with slightly
+        perturbed spectra instead of a single spectrum
+    seed : int, optional
+        Seed for the perturbations
+
+    Returns
+    -------
+    tuple of numpy.ndarray
+        (wavelength, flux)
+    """
+    wavelength = np.linspace(lambda_min, lambda_max, n_points)
+    # Planck function with the constants folded in; scaled to roughly the
+    # flux of Vega
+    x = 1.4387769e8 / (wavelength * temperature)
+    flux = 1e-9 * (wavelength / 5500.) ** -5 / np.expm1(x) * np.expm1(
+        1.4387769e8 / (5500. * temperature))
+    if n_spectra is not None:
+        rng = np.random.RandomState(seed)
+        flux = flux[None, :] * rng.uniform(0.5, 2., size=(n_spectra, 1)) * (
+            1 + 0.01 * rng.standard_normal((n_spectra, n_points)))
+    return wavelength, flux
+
+
+def make_spectrum(n_points=10000, lambda_min=2000, lambda_max=12000,
+                  temperature=9600.):
+    """Create a blackbody-like `~wsynphot.Spectrum1D`, see
+    `make_spectrum_arrays`"""
+    from wsynphot.spectrum1d import SKSpectrum1D as Spectrum1D
+
+    wavelength, flux = make_spectrum_arrays(n_points, lambda_min, lambda_max,
+                                            temperature)
+    return Spectrum1D.from_array(wavelength * u.angstrom,
+                                 flux * u.erg / u.s / u.cm**2 / u.angstrom)
+
+
+def write_vega_fits(fpath, n_points=20000, lambda_min=900, lambda_max=30000):
+    """Write a synthetic calibration file in the format of alpha_lyr_mod
+
+    Parameters
+    ----------
+    fpath : str
+        Path of the FITS file to write
+    n_points : int, optional
+        Number of wavelength points (default is 20000)
+    lambda_min, lambda_max : float, optional
+        Wavelength range (in Angstrom)
+    """
+    wavelength, flux = make_spectrum_arrays(n_points, lambda_min, lambda_max)
+    columns = [fits.Column(name='wavelength', format='D', array=wavelength),
+               fits.Column(name='flux', format='D', array=flux)]
+    hdu_list = fits.HDUList([fits.PrimaryHDU(),
+                             fits.BinTableHDU.from_columns(columns)])
+    hdu_list.writeto(fpath, overwrite=True)
@@ -0,0 +1,164 @@
+import os
+import pickle
+
+import numpy as np
+import pandas as pd
+from astropy import units as u
+
+from wsynphot import FilterCurve, FilterSet, MagnitudeCatalog
+from wsynphot.io.cache_filters import DetectorType
+from wsynphot.tests.helpers import (make_filter_curve, make_filter_set,
+                                    make_spectrum, write_vega_fits)
+
+
+def test_filter_curve_has_no_dict():
+    filter = make_filter_curve()
+    assert not hasattr(filter, '__dict__')
+    assert not FilterCurve.interpolation_object.is_set(filter)
+
+
+def test_lazy_interpolation_object():
+    filter = make_filter_curve()
+    spectrum = make_spectrum(1000)
+    f_lambda = filter.calculate_f_lambda(spectrum)
+    assert FilterCurve.interpolation_object.is_set(filter)
+    assert f_lambda.unit.is_equivalent(u.erg / u.s / u.cm**2 / u.angstrom)
+
+
+def test_float32_storage():
+    filter64 = make_filter_curve()
+    filter32 = make_filter_curve(dtype=np.float32)
+    assert filter32.wavelength.dtype == np.float32
+    assert filter32.transmission_lambda.dtype == np.float32
+    assert filter32.memory_usage() < filter64.memory_usage()
+    np.testing.assert_allclose(filter32.lambda_pivot.value,
+                               filter64.lambda_pivot.value, rtol=1e-5)
+
+
+def test_shared_wavelength_grid():
+    wavelength = np.linspace(4000, 6000, 1000) * u.angstrom
+    filters = [FilterCurve(wavelength.copy(), np.ones(1000) * i,
+                           DetectorType.ENERGY_COUNTER,
+                           filter_id='SYNTH/INST/F{0}'.format(i),
+                           share_wavelength=True)
+               for i in range(1, 4)]
+    assert filters[0].wavelength is filters[1].wavelength
+    assert not filters[0].wavelength.flags.writeable
+
+    usage = FilterSet(filters).memory_usage()
+    assert usage['Total'] < usage.drop('Total').sum()
+
+
+def test_interpolation_cache():
+    filter = make_filter_curve()
+    spectrum = make_spectrum(1000)
+    first = filter.calculate_ab_magnitude(spectrum)
+    second = filter.calculate_ab_magnitude(spectrum)
+    assert first == second
+    info = filter.interpolation_cache.info()
+    assert (info.hits, info.misses, info.currsize) == (1, 1, 1)
+
+    # same grid in a different array is a hit, a modified grid is a miss
+    transmission = filter.interpolate(spectrum.wavelength.copy())
+    assert filter.interpolation_cache.info().hits == 2
+    assert not transmission.flags.writeable
+    filter.interpolate(spectrum.wavelength * 1.01)
+    assert filter.interpolation_cache.info().misses == 2
+
+    filter.interpolation_cache.resize(1)
+    assert filter.interpolation_cache.info().evictions == 1
+    filter.interpolation_cache.resize(0)
+    filter.interpolate(spectrum.wavelength)
+    assert len(filter.interpolation_cache) == 0
+
+
+def test_interpolation_cache_readonly_views():
+    filter = make_filter_curve()
+    grid = np.linspace(4000, 6000, 500)
+    view = grid.view()
+    view.flags.writeable = False
+    wavelength = u.Quantity(view, u.angstrom, copy=False)
+    filter.interpolate(wavelength)
+    # a read-only view does not make the data immutable
+    grid *= 1.02
+    np.testing.assert_allclose(filter.interpolate(wavelength),
+                               filter._interpolate(wavelength))
+
+
+def test_pickle_prepared_filter_set(tmpdir):
+    filter_set = make_filter_set([4000, 6000], vega_dir=str(tmpdir))
+    spectrum = make_spectrum(1000)
+    expected = filter_set.calculate_vega_magnitudes(spectrum)
+    filter_set.get_batch_photometry(spectrum.wavelength)
+
+    restored = pickle.loads(pickle.dumps(filter_set))
+    for item, original in zip(restored, filter_set):
+        assert item.filter_id == original.filter_id
+        assert item.detector_type == original.detector_type
+        # the zero points are kept, derived state is rebuilt lazily
+        assert FilterCurve.zp_vega_f_lambda.is_set(item)
+        assert not FilterCurve.interpolation_object.is_set(item)
+        assert not FilterCurve.interpolation_cache.is_set(item)
+        assert item.zp_vega_f_lambda == original.zp_vega_f_lambda
+    np.testing.assert_allclose(restored.calculate_vega_magnitudes(spectrum),
+                               expected)
+
+
+def test_vectorized_conversions():
+    filter_set = make_filter_set([4000, 6000])
+    magnitudes = np.array([[15., 16.], [17.5, 14.2], [20., 21.]])
+    f_lambda = filter_set.convert_ab_magnitudes_to_f_lambda(magnitudes)
+    assert f_lambda.shape == magnitudes.shape
+    for row, row_f_lambda in zip(magnitudes, f_lambda):
+        expected = u.Quantity([item.convert_ab_magnitude_to_f_lambda(mag)
+                               for item, mag in zip(filter_set, row)])
+        np.testing.assert_allclose(row_f_lambda.value, expected.value)
+
+    uncertainties = filter_set.\
+        convert_ab_magnitude_uncertainties_to_f_lambda_uncertainties(
+            magnitudes[0], [0.1, 0.2])
+    assert uncertainties.shape == (2, 2)
+    assert (uncertainties[0] < uncertainties[1]).all()
+
+
+def test_magnitude_catalog(tmpdir):
+    vega_fpath = os.path.join(str(tmpdir), 'vega.fits')
+    write_vega_fits(vega_fpath)
+    filter_set = FilterSet([
+        make_filter_curve(center, 800, filter_id='F{0}'.format(center),
+                          vega_fpath=vega_fpath) for center in [4000, 6000]])
+    dataframe = pd.DataFrame({'F4000': [15., 17.5], 'F6000': [16., np.nan],
+                              'F4000_err': [0.1, 0.2],
+                              'F6000_err': [0.2, 0.1]}, index=['a', 'b'])
+    catalog = MagnitudeCatalog.from_dataframe(dataframe, filter_set,
+                                              uncertainty_columns='{0}_err')
+    assert catalog.n_objects == 2
+    np.testing.assert_allclose(catalog.calculate_colors(), [[-1.], [np.nan]])
+    np.testing.assert_allclose(catalog.calculate_color_uncertainties(
+        [('F6000', 'F4000')]), np.hypot(0.1, 0.2))
+    assert catalog.f_lambda_uncertainties.shape == (2, 2, 2)
+    pd.testing.assert_frame_equal(catalog.to_dataframe(),
+                                  dataframe[catalog.to_dataframe().columns])
+
+    vega_catalog = catalog.convert_to_magnitude_system('vega')
+    np.testing.assert_allclose(vega_catalog.f_lambda.value,
+                               catalog.f_lambda.value)
+    np.testing.assert_allclose(
+        vega_catalog.get_magnitude_set(0).magnitudes,
+        [filter.calculate_vega_magnitude(make_spectrum(1000))
+         for filter in filter_set] - np.array(
+            [filter.calculate_ab_magnitude(make_spectrum(1000))
+             for filter in filter_set]) + catalog.magnitudes[0])
+
+
+def test_magnitude_catalog_from_filter_set():
+    filter_set = make_filter_set(centers=(4000, 6000))
+    catalog = MagnitudeCatalog(filter_set, [[15., 16.], [17.5, 17.]])
+    assert len(catalog) == len(filter_set) == 2
+    np.testing.assert_allclose(
+        catalog.f_lambda.value,
+        filter_set.convert_ab_magnitudes_to_f_lambda(catalog.magnitudes).value)
+    # indices from numpy or pandas select filters like plain integers
+    pairs = [tuple(np.array([1, 0]))]
+    np.testing.assert_allclose(catalog.calculate_colors(pairs),
+                               [[1.], [-0.5]])
@@ -0,0 +1,90 @@
+import os
+
+import numpy as np
+import pytest
+from astropy import units as u
+
+from wsynphot import FilterSet, Spectrum1D
+from wsynphot.batch import trapezoid_weights
+from wsynphot.io.cache_filters import DetectorType
+from wsynphot.spectrum1d import (blackbody1d, blackbody_lambda,
+                                 blackbody_lambda_grid)
+from wsynphot.tests.helpers import (make_filter_curve, make_spectrum_arrays,
+                                    write_vega_fits)
+
+FLAM = u.erg / u.s / u.cm**2 / u.angstrom
+
+
+@pytest.fixture(scope='module')
+def vega_fpath(tmpdir_factory):
+    fpath = os.path.join(str(tmpdir_factory.mktemp('calibration')),
+                         'vega.fits')
+    write_vega_fits(fpath)
+    return fpath
+
+
+@pytest.fixture
+def filter_set(vega_fpath):
+    return FilterSet([
+        make_filter_curve(4000, 800, vega_fpath=vega_fpath),
+        make_filter_curve(6000, 1000, vega_fpath=vega_fpath,
+                          detector_type=DetectorType.ENERGY_COUNTER)])
+
+
+def test_trapezoid_weights():
+    x = np.sort(np.random.RandomState(1).uniform(0, 10, 50))
+    y = np.sin(x)
+    np.testing.assert_allclose(np.dot(y, trapezoid_weights(x)),
+                               np.trapz(y, x))
+
+
+@pytest.mark.parametrize('magnitude_system', ['ab', 'vega'])
+def test_batch_matches_single_spectrum(filter_set, magnitude_system):
+    wavelength, flux = make_spectrum_arrays(2000, n_spectra=5)
+    expected = [
+        u.Quantity(getattr(filter_set,
+                           'calculate_{0}_magnitudes'.format(magnitude_system))(
+            Spectrum1D.from_array(wavelength * u.angstrom,
+                                  spectrum_flux * FLAM))).value
+        for spectrum_flux in flux]
+    magnitudes = getattr(
+        filter_set, 'calculate_{0}_magnitudes_batch'.format(magnitude_system))(
+        wavelength, flux, chunk_size=2)
+    np.testing.assert_allclose(magnitudes, expected, atol=1e-10)
+
+
+def test_batch_photometry_is_reused(filter_set):
+    wavelength, flux = make_spectrum_arrays(2000, n_spectra=2)
+    assert (filter_set.get_batch_photometry(wavelength) is
+            filter_set.get_batch_photometry(wavelength.copy()))
+    f_lambda = filter_set.calculate_f_lambda_batch(wavelength * u.angstrom,
+                                                   flux * FLAM)
+    assert f_lambda.shape == (2, 2)
+    assert f_lambda.unit == FLAM
+
+
+def test_blackbody_lambda_grid():
+    wavelength = np.linspace(2000, 10000, 100) * u.angstrom
+    temperature = [3000, 5000, 10000] * u.K
+    flux = blackbody_lambda_grid(wavelength, temperature)
+    assert flux.shape == (3, 100)
+    np.testing.assert_allclose(
+        flux[1], blackbody_lambda(wavelength, temperature[1]).to_value(
+            FLAM / u.sr))
+
+
+def test_blackbody_magnitudes(filter_set):
+    temperature = np.array([3000., 5780., 20000.])
+    magnitudes = filter_set.calculate_blackbody_magnitudes(
+        temperature, 1 * u.R_sun, chunk_size=2)
+    assert magnitudes.shape == (3, 2)
+    expected = [u.Quantity(filter_set.calculate_ab_magnitudes(
+        blackbody1d(temp, 1 * u.R_sun))).value for temp in temperature]
+    np.testing.assert_allclose(magnitudes.values, expected, atol=1e-10)
+
+    # doubling the radius brightens by 5 log10(2)
+    radius = [1, 2, 1] * u.R_sun
+    magnitudes_radius = filter_set.calculate_blackbody_magnitudes(
+        temperature, radius)
+    np.testing.assert_allclose(magnitudes.values[1] - 5 * np.log10(2),
+                               magnitudes_radius.values[1])
@@ -0,0 +1,93 @@
+import json
+import os
+
+import numpy as np
+import pandas as pd
+import pytest
+from astropy.io import fits
+
+from wsynphot import FilterSet
+from wsynphot.cli import main
+from wsynphot.tests.helpers import make_filter_cache, make_spectrum_arrays
+
+
+@pytest.fixture
+def filter_cache(tmpdir):
+    filter_cache_dir = str(tmpdir.mkdir('filters'))
+    return filter_cache_dir, make_filter_cache(filter_cache_dir, 3,
+                                               n_points=100)
+
+
+@pytest.fixture
+def spectrum_fpaths(tmpdir):
+    wavelength, flux = make_spectrum_arrays(1000, n_spectra=5)
+    spectra_dir = tmpdir.mkdir('spectra')
+    fpaths = []
+    for i, row in enumerate(flux):
+        if i % 2:
+            fpath = str(spectra_dir.join('spectrum{0}.txt'.format(i)))
+            np.savetxt(fpath, np.transpose([wavelength, row]))
+        else:
+            fpath = str(spectra_dir.join('spectrum{0}.fits'.format(i)))
+            fits.BinTableHDU.from_columns([
+                fits.Column('wavelength', 'D', 'Angstrom', array=wavelength),
+                fits.Column('flux', 'D', 'erg/(s cm2 Angstrom)',
+                            array=row)]).writeto(fpath)
+        fpaths.append(fpath)
+    return fpaths, wavelength, flux
+
+
+def test_photometry(filter_cache, spectrum_fpaths, tmpdir):
+    filter_cache_dir, filter_ids = filter_cache
+    fpaths, wavelength, flux = spectrum_fpaths
+    output = str(tmpdir.join('magnitudes.csv'))
+    fpaths_file = str(tmpdir.join('spectra.txt'))
+    with open(fpaths_file, 'w') as fh:
+        fh.write('\n'.join(fpaths[1:]))
+    status = main(['-q', 'photometry', '-f', ','.join(filter_ids[:2]),
+                   '-f', filter_ids[2], '--filter-cache-dir',
+                   filter_cache_dir, '-o', output, '-j', '2',
+                   '--chunk-size', '2', fpaths[0], '@' + fpaths_file,
+                   'missing.fits'])
+    assert status == 1
+    assert not os.path.exists(output + '.parts')
+
+    results = pd.read_csv(output, keep_default_na=False)
+    assert list(results['spectrum']) == fpaths + ['missing.fits']
+    assert results['error'].values[-1].startswith('FileNotFoundError')
+    filter_set = FilterSet(filter_ids, cache_dir=filter_cache_dir)
+    np.testing.assert_allclose(
+        results[filter_ids].values[:-1].astype(float),
+        filter_set.calculate_ab_magnitudes_batch(wavelength, flux))
+
+    # only the files of the job are removed from a given work directory
+    work_dir = tmpdir.mkdir('work')
+    work_dir.join('notes.txt').write('keep me')
+    assert main(['-q', 'photometry', '-f', filter_ids[0],
+                 '--filter-cache-dir', filter_cache_dir, '-o', output,
+                 '--work-dir', str(work_dir), '--executor', 'serial',
+                 fpaths[0]]) == 0
+    assert os.listdir(str(work_dir)) == ['notes.txt']
+
+    assert main(['photometry', '-f', filter_ids[0], '-o', 'magnitudes.txt',
+                 fpaths[0]]) == 1
+
+
+def test_cache_warm_and_stats(filter_cache, spectrum_fpaths, tmpdir,
+                              capsys):
+    filter_cache_dir, filter_ids = filter_cache
+    fpaths = spectrum_fpaths[0]
+    cache_dir = str(tmpdir.join('photometry'))
+    arguments = ['-f', ','.join(filter_ids), '--filter-cache-dir',
+                 filter_cache_dir, '--cache-dir', cache_dir,
+                 '--chunk-size', '2']
+    assert main(['-q', 'cache', 'warm'] + arguments + fpaths) == 0
+    capsys.readouterr()
+    assert main(['cache', 'stats', '--cache-dir', cache_dir,
+                 '--filter-cache-dir', filter_cache_dir, '--json']) == 0
+    stats = json.loads(capsys.readouterr().out)
+    assert stats['filter_cache']['n_filters'] == 3
+    table, = stats['photometry_cache']['tables']
+    assert table['filter_ids'] == filter_ids
+    assert (table['magnitude_system'], table['n_spectra']) == ('ab', 5)
+    assert table['nbytes'] > 0
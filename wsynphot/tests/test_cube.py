@@ -0,0 +1,61 @@
+import os
+
+import numpy as np
+import pytest
+from astropy import units as u
+from astropy.io import fits
+
+from wsynphot.cube import CubePhotometry, read_fits_cube
+from wsynphot.tests.helpers import make_filter_set, make_spectrum_arrays
+
+
+@pytest.fixture
+def filter_set():
+    return make_filter_set([4500, 6500])
+
+
+@pytest.fixture
+def cube_data():
+    wavelength, flux = make_spectrum_arrays(1000, n_spectra=35)
+    scale = np.random.RandomState(1).uniform(0.5, 2., (35, 1))
+    return wavelength, (flux * scale).reshape(5, 7, -1)
+
+
+def test_tiled_memmap_cube(filter_set, cube_data, tmpdir):
+    wavelength, cube = cube_data
+    fpath = os.path.join(str(tmpdir), 'cube.npy')
+    np.save(fpath, cube)
+    cube = np.load(fpath, mmap_mode='r')
+
+    expected = filter_set.calculate_ab_magnitudes_batch(
+        wavelength, cube.reshape(35, -1))
+    cube_photometry = CubePhotometry(filter_set, wavelength)
+    images = cube_photometry.calculate_magnitude_images(cube, tile_size=3)
+    assert images.shape == (2, 5, 7)
+    np.testing.assert_allclose(images.reshape(2, -1).T, expected)
+
+
+def test_fits_cube(filter_set, cube_data, tmpdir):
+    wavelength, cube = cube_data
+    fpath = os.path.join(str(tmpdir), 'cube.fits')
+    header = fits.Header({'CRVAL3': wavelength[0] / 10.,
+                          'CDELT3': (wavelength[1] - wavelength[0]) / 10.,
+                          'CRPIX3': 1., 'CUNIT3': 'nm',
+                          'BUNIT': '1e-17 erg/(s cm2 Angstrom)'})
+    fits.PrimaryHDU(np.moveaxis(cube, -1, 0) * 1e17,
+                    header=header).writeto(fpath)
+
+    fits_wavelength, data, flux_unit = read_fits_cube(fpath)
+    np.testing.assert_allclose(fits_wavelength.to_value(u.angstrom),
+                               wavelength)
+    cube_photometry = CubePhotometry(filter_set, fits_wavelength, flux_unit)
+    images = cube_photometry.calculate_f_lambda_images(data, spectral_axis=0,
+                                                       tile_size=4)
+    expected = CubePhotometry(filter_set, wavelength).\
+        calculate_f_lambda_images(cube)
+    np.testing.assert_allclose(images, expected, rtol=1e-6)
+
+    image_fpath = os.path.join(str(tmpdir), 'images.fits')
+    cube_photometry.write_fits(images, image_fpath)
+    with fits.open(image_fpath) as hdul:
+        assert hdul[1].header['FILTER'] == filter_set[0].filter_id
@@ -0,0 +1,88 @@
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+import pytest
+
+from wsynphot import FilterSet
+from wsynphot.executors import (SerialExecutor, get_chunks, get_executor,
+                                map_chunks)
+from wsynphot.fitting.templates import TemplateFitter
+from wsynphot.grid import PhotometricGrid
+from wsynphot.tests.helpers import (make_filter_cache, make_filter_set,
+                                    make_spectrum_arrays)
+from wsynphot.tests.test_grid import WAVELENGTH, blackbody_flux
+
+EXECUTORS = ['serial', 'threads', 'processes']
+
+
+@pytest.fixture(scope='module')
+def filter_set(tmpdir_factory):
+    return make_filter_set(vega_dir=str(tmpdir_factory.mktemp('vega')))
+
+
+def test_map_chunks_keeps_order():
+    chunks = get_chunks(10, 3)
+    assert chunks[-1] == slice(9, 10)
+    for executor in EXECUTORS:
+        assert map_chunks(len, [[0] * i for i in range(6)], executor,
+                          n_workers=2) == list(range(6))
+    with ThreadPoolExecutor(2) as pool:
+        assert map_chunks(abs, [-1, -2, 3], pool) == [1, 2, 3]
+        # executors passed in are left running
+        assert pool.submit(abs, -4).result() == 4
+    assert isinstance(get_executor('processes', n_workers=1), SerialExecutor)
+    with pytest.raises(ValueError):
+        get_executor('gpu')
+
+
+@pytest.mark.parametrize('executor', EXECUTORS)
+def test_batch_photometry(filter_set, executor):
+    wavelength, flux = make_spectrum_arrays(2000, n_spectra=7)
+    expected = filter_set.calculate_vega_magnitudes_batch(wavelength, flux)
+    np.testing.assert_allclose(
+        filter_set.calculate_vega_magnitudes_batch(
+            wavelength, flux, chunk_size=2, executor=executor, n_workers=2),
+        expected)
+
+
+def test_zero_points_and_loading(filter_set, tmpdir):
+    fresh = make_filter_set(vega_fpath=filter_set[0].vega_fpath)
+    np.testing.assert_allclose(
+        fresh.calculate_zero_points('vega', 'processes', n_workers=2).value,
+        filter_set.zp_vega_f_lambda.value)
+
+    filter_ids = make_filter_cache(str(tmpdir), 4, n_points=50)
+    serial = FilterSet(filter_ids, cache_dir=str(tmpdir))
+    threaded = FilterSet(filter_ids, cache_dir=str(tmpdir),
+                         executor='threads', n_workers=2)
+    assert [item.filter_id for item in threaded] == filter_ids
+    for item, reference in zip(threaded, serial):
+        np.testing.assert_array_equal(item.transmission_lambda,
+                                      reference.transmission_lambda)
+
+
+@pytest.mark.parametrize('executor', ['threads', 'processes'])
+def test_fitter_and_grid(filter_set, executor):
+    wavelength, flux = make_spectrum_arrays(2000, n_spectra=5)
+    serial_fitter = TemplateFitter.from_spectra(filter_set, wavelength, flux,
+                                                executor='serial')
+    fitter = TemplateFitter.from_spectra(filter_set, wavelength, flux,
+                                         executor=executor, n_workers=2)
+    magnitudes = serial_fitter.template_magnitudes[[4, 0, 2, 1]] + 0.3
+    result = fitter.fit(magnitudes, 0.05, chunk_size=1)
+    assert list(result['template_index']) == [4, 0, 2, 1]
+    np.testing.assert_allclose(
+        fitter.calculate_likelihood(magnitudes, chunk_size=3),
+        serial_fitter.calculate_likelihood(magnitudes))
+
+    parameters = ['teff', 'log_scale'], [np.linspace(4000, 8000, 9),
+                                         np.array([0., 1.])]
+    grid = PhotometricGrid.compute(filter_set, *parameters,
+                                   wavelength=WAVELENGTH,
+                                   flux=blackbody_flux, chunk_size=4,
+                                   executor=executor, n_workers=2)
+    serial_grid = PhotometricGrid.compute(filter_set, *parameters,
+                                          wavelength=WAVELENGTH,
+                                          flux=blackbody_flux,
+                                          executor='serial')
+    np.testing.assert_allclose(grid.magnitudes, serial_grid.magnitudes)
@@ -0,0 +1,54 @@
+import numpy as np
+import pytest
+
+from wsynphot.extinction import (ExtinctionPhotometry, ccm89,
+                                 tabulated_extinction_law)
+from wsynphot.tests.helpers import make_filter_set, make_spectrum_arrays
+
+
+@pytest.fixture
+def filter_set():
+    return make_filter_set([4400, 5500, 8000])
+
+
+def test_ccm89():
+    np.testing.assert_allclose(ccm89(5494.5), 1., atol=1e-3)
+    ratio = ccm89([2000., 4400., 22000.], r_v=[3.1, 5.])
+    assert ratio.shape == (2, 3)
+    # steeper law for smaller R_V
+    assert (ratio[0, :2] > ratio[1, :2]).all()
+
+
+def test_extinction_photometry(filter_set):
+    wavelength, flux = make_spectrum_arrays(5000, n_spectra=2)
+    extinction = ExtinctionPhotometry(filter_set, wavelength)
+    a_v = np.array([0., 0.5, 2.])
+    r_v = np.array([3.1, 3.1, 4.])
+    magnitudes = extinction.calculate_magnitudes(flux, a_v, r_v,
+                                                 chunk_size=3)
+    assert magnitudes.shape == (2, 3, 3)
+    for i in range(len(a_v)):
+        reddened = flux * 10 ** (-0.4 * a_v[i] * ccm89(wavelength, r_v[i]))
+        np.testing.assert_allclose(
+            magnitudes[:, i],
+            filter_set.calculate_ab_magnitudes_batch(wavelength, reddened))
+
+    # chunks smaller than the number of spectra
+    np.testing.assert_allclose(
+        extinction.calculate_magnitudes(flux, a_v, r_v, chunk_size=1),
+        magnitudes)
+
+    coefficients = extinction.tabulate_extinction_coefficients(flux)
+    assert list(coefficients.columns) == [item.filter_id
+                                          for item in filter_set]
+    np.testing.assert_allclose(coefficients.values[:, 1], 1., atol=0.05)
+    assert (np.diff(coefficients.values, axis=1) < 0).all()
+
+
+def test_tabulated_extinction_law(filter_set):
+    wavelength, flux = make_spectrum_arrays(2000)
+    law = tabulated_extinction_law([1000., 20000.], [1., 1.])
+    extinction = ExtinctionPhotometry(filter_set, wavelength,
+                                      extinction_law=law)
+    np.testing.assert_allclose(
+        extinction.calculate_extinction_coefficients(flux, [0.1, 1.]), 1.)
@@ -0,0 +1,70 @@
+import numpy as np
+import pytest
+
+from wsynphot.grid import PhotometricGrid
+from wsynphot.spectrum1d import blackbody_lambda_grid
+from wsynphot.tests.helpers import make_filter_set
+
+WAVELENGTH = np.linspace(1000, 15000, 3000)
+
+
+def blackbody_flux(points):
+    """Blackbodies with temperature and log10 of a flux scale"""
+    return (blackbody_lambda_grid(WAVELENGTH, points[:, 0]) *
+            10 ** points[:, 1:2] * 1e-20)
+
+
+@pytest.fixture(scope='module')
+def filter_set():
+    return make_filter_set()
+
+
+@pytest.fixture(scope='module')
+def grid(filter_set):
+    return PhotometricGrid.compute(
+        filter_set, ['teff', 'log_scale'],
+        [np.linspace(4000, 8000, 41), np.array([0., 0.5, 1., 1.5])], WAVELENGTH,
+        blackbody_flux, chunk_size=20, n_workers=2)
+
+
+def test_compute_from_array(filter_set, grid):
+    flux = blackbody_flux(grid.points).reshape(grid.shape + (-1,))
+    array_grid = PhotometricGrid.compute(
+        filter_set, grid.parameter_names, grid.parameter_values, WAVELENGTH,
+        flux, n_workers=1)
+    np.testing.assert_allclose(array_grid.magnitudes, grid.magnitudes)
+
+
+def test_interpolate(filter_set, grid):
+    np.testing.assert_allclose(grid(grid.points),
+                               grid.magnitudes.reshape(-1, 3), atol=1e-10)
+
+    points = np.array([[5123., 0.2], [7777., 1.2], [4000., 1.5]])
+    expected = filter_set.get_batch_photometry(WAVELENGTH).calculate_magnitudes(
+        blackbody_flux(points))
+    np.testing.assert_allclose(grid(points), expected, atol=1e-3)
+    # cubic interpolation along the evenly spaced temperature axis
+    point = np.array([5123., 0.5])
+    np.testing.assert_allclose(
+        grid(point, method='cubic'),
+        expected[0] - 2.5 * (point[1] - points[0, 1]), atol=1e-5)
+    assert np.isnan(grid([[3000., 0.]])).all()
+
+
+def test_interpolate_cubic_uneven_axes(grid):
+    uneven_grid = PhotometricGrid(
+        grid.parameter_names, [grid.parameter_values[0], [0., 0.5, 1.5]],
+        grid.filter_ids, grid.magnitudes[:, [0, 1, 3]])
+    np.testing.assert_allclose(uneven_grid([5123., 1.]),
+                               grid([5123., 1.]), atol=1e-10)
+    with pytest.raises(ValueError) as error:
+        uneven_grid([5123., 1.], method='cubic')
+    assert 'log_scale' in str(error.value)
+
+
+def test_write_read(grid, tmpdir):
+    fpath = str(tmpdir.join('grid.npz'))
+    grid.write(fpath)
+    grid2 = PhotometricGrid.read(fpath)
+    assert grid2.parameter_names == grid.parameter_names
+    np.testing.assert_array_equal(grid2.magnitudes, grid.magnitudes)
@@ -0,0 +1,77 @@
+import os
+
+import numpy as np
+import pytest
+from astropy.io import fits
+
+from wsynphot.jobs import PhotometryJob, parquet_available
+from wsynphot.tests.helpers import make_filter_set, make_spectrum_arrays
+
+
+@pytest.fixture
+def filter_set():
+    return make_filter_set([4500, 6500])
+
+
+@pytest.fixture
+def spectrum_fpaths(tmpdir):
+    wavelength, flux = make_spectrum_arrays(1000, n_spectra=7)
+    fpaths = []
+    for i, row in enumerate(flux):
+        if i % 2:
+            fpath = os.path.join(str(tmpdir), 'spectrum{0}.txt'.format(i))
+            np.savetxt(fpath, np.transpose([wavelength, row]))
+        else:
+            fpath = os.path.join(str(tmpdir), 'spectrum{0}.fits'.format(i))
+            fits.BinTableHDU.from_columns([
+                fits.Column('wavelength', 'D', 'Angstrom', array=wavelength),
+                fits.Column('flux', 'D', 'erg/(s cm2 Angstrom)',
+                            array=row)]).writeto(fpath)
+        fpaths.append(fpath)
+    fpaths.append(os.path.join(str(tmpdir), 'missing.fits'))
+    return fpaths, wavelength, flux
+
+
+@pytest.mark.parametrize('output_format', ['npz', 'parquet'])
+def test_job_resumes(filter_set, spectrum_fpaths, tmpdir, output_format):
+    if output_format == 'parquet' and not parquet_available():
+        pytest.skip('pyarrow is not installed')
+    fpaths, wavelength, flux = spectrum_fpaths
+    output_dir = os.path.join(str(tmpdir), 'output')
+    job = PhotometryJob(filter_set, fpaths, output_dir, shard_size=3,
+                        n_workers=2, output_format=output_format)
+    summary = job.run()
+    assert (summary.n_shards, summary.n_spectra, summary.n_failed) == (3, 8, 1)
+
+    results = job.read_results()
+    assert list(results['spectrum']) == fpaths
+    np.testing.assert_allclose(
+        results[[item.filter_id for item in filter_set]].values[:7],
+        filter_set.calculate_ab_magnitudes_batch(wavelength, flux))
+    assert results['error'].values[-1].startswith('FileNotFoundError')
+
+    # a crash before shard 1 was written is resumed from the checkpoint
+    os.remove(job.get_shard_fpath(1))
+    summary = PhotometryJob(filter_set, fpaths, output_dir, shard_size=3,
+                            n_workers=1, output_format=output_format).run()
+    assert (summary.n_shards_skipped, summary.n_spectra) == (2, 3)
+    assert len(job.read_results()) == 8
+
+    with pytest.raises(ValueError):
+        PhotometryJob(filter_set, fpaths[:-1], output_dir, shard_size=3,
+                      output_format=output_format).run()
+
+
+def test_job_key_depends_on_filter_content(filter_set, spectrum_fpaths,
+                                           tmpdir):
+    fpaths = spectrum_fpaths[0]
+    output_dir = os.path.join(str(tmpdir), 'output')
+    PhotometryJob(filter_set, fpaths, output_dir, n_workers=1,
+                  output_format='npz').run()
+    # same filter IDs with a different transmission are a different job
+    changed = make_filter_set([4500, 6500], relative_width=0.3)
+    assert ([item.filter_id for item in changed] ==
+            [item.filter_id for item in filter_set])
+    with pytest.raises(ValueError):
+        PhotometryJob(changed, fpaths, output_dir, n_workers=1,
+                      output_format='npz').run()
@@ -0,0 +1,40 @@
+import numpy as np
+import pytest
+from astropy import units as u
+
+from wsynphot.lightcurve import LightCurveModel
+from wsynphot.spectrum1d import blackbody_lambda_grid
+from wsynphot.tests.helpers import make_filter_set
+
+
+@pytest.fixture
+def filter_set():
+    return make_filter_set([4500, 6500])
+
+
+def test_light_curve(filter_set):
+    wavelength = np.linspace(2000, 10000, 2000)
+    time = np.array([10., 0., 3., 7.])
+    flux = blackbody_lambda_grid(wavelength, 5000 + 500 * time) * 1e-20
+    model = LightCurveModel(filter_set, time * u.day, wavelength, flux)
+
+    photometry = filter_set.get_batch_photometry(wavelength)
+    np.testing.assert_allclose(
+        model.calculate_magnitudes([3., 10.]),
+        photometry.calculate_magnitudes(flux[[2, 0]]))
+
+    # linear in flux between epochs
+    f_lambda = model.calculate_f_lambda(48 * u.hour)
+    expected = photometry.calculate_f_lambda(flux[[1, 2]])
+    np.testing.assert_allclose(f_lambda, expected[0] / 3 +
+                               expected[1] * 2 / 3)
+    assert np.isnan(model.calculate_f_lambda([-1., 11.])).all()
+
+    epoch_f_lambda = model.epoch_f_lambda
+    observed = model.observe([1., 2.], [filter_set[1].filter_id,
+                                        filter_set[0].filter_id])
+    assert model.epoch_f_lambda is epoch_f_lambda
+    np.testing.assert_allclose(
+        observed, [model.calculate_magnitudes([1.])[0, 1],
+                   model.calculate_magnitudes([2.])[0, 0]])
+    assert list(model.to_dataframe([1., 2.]).columns) == model.filter_ids
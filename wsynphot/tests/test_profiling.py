@@ -0,0 +1,63 @@
+import json
+import os
+
+from wsynphot.base import FilterCurve
+from wsynphot.tests.helpers import (make_filter_cache, make_filter_curve,
+                                    make_spectrum)
+from wsynphot.util import profiling
+
+
+@profiling.timed('test.add')
+def add(a, b):
+    return a + b
+
+
+def test_disabled_records_nothing():
+    profiling.profiler.reset()
+    assert add(2, 3) == 5
+    profiling.count('test.counter')
+    assert profiling.profiler.timers == {}
+    assert profiling.profiler.counters == {}
+
+
+def test_profile(tmpdir):
+    trace_fpath = os.path.join(str(tmpdir), 'trace.json')
+    with profiling.profile(trace_fpath=trace_fpath) as profiler:
+        for i in range(3):
+            add(i, i)
+        with profiling.timer('test.block'):
+            profiling.count('test.counter', 2)
+    assert not profiling.profiler.enabled
+
+    summary = profiler.summary()
+    assert summary.loc['test.add', 'calls'] == 3
+    assert summary.loc['test.block', 'calls'] == 1
+    assert summary.loc['test.counter', 'calls'] == 2
+
+    with open(trace_fpath) as fh:
+        trace = json.load(fh)
+    names = [event['name'] for event in trace['traceEvents']]
+    assert names.count('test.add') == 3
+
+
+def test_timer_enabled_inside_block():
+    profiling.profiler.reset()
+    try:
+        with profiling.timer('test.block'):
+            profiling.enable()
+    finally:
+        profiling.disable()
+    assert profiling.profiler.timers == {}
+
+
+def test_hot_paths_are_instrumented(tmpdir):
+    filter_id, = make_filter_cache(str(tmpdir), 1, n_points=50)
+    spectrum = make_spectrum(1000)
+    with profiling.profile() as profiler:
+        FilterCurve.load_filter(filter_id, cache_dir=str(tmpdir))
+        make_filter_curve().calculate_ab_magnitude(spectrum)
+    summary = profiler.summary()
+    for name in ['load_transmission_data', 'calculate_filter_flux_density',
+                 'calculate_filter_flux_density.integration',
+                 'FilterCurve.interpolate']:
+        assert summary.loc[name, 'calls'] >= 1
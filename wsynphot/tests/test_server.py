@@ -0,0 +1,111 @@
+import json
+from concurrent.futures import ThreadPoolExecutor
+from http.client import HTTPConnection
+from urllib.error import HTTPError
+from urllib.parse import urlsplit
+from urllib.request import Request, urlopen
+
+import numpy as np
+import pytest
+
+from wsynphot.server import PhotometryServer
+from wsynphot.tests.helpers import make_filter_set, make_spectrum_arrays
+
+
+@pytest.fixture(scope='module')
+def filter_set(tmpdir_factory):
+    return make_filter_set(vega_dir=str(tmpdir_factory.mktemp('vega')))
+
+
+@pytest.fixture(scope='module')
+def server(filter_set):
+    with PhotometryServer({'synth': filter_set}, port=0,
+                          max_wait=0.05) as server:
+        yield server
+
+
+def call(server, path, content=None):
+    data = None if content is None else json.dumps(content).encode()
+    with urlopen(Request(server.url + path, data=data)) as response:
+        return json.loads(response.read())
+
+
+def test_photometry(server, filter_set):
+    wavelength, flux = make_spectrum_arrays(1000, n_spectra=6)
+    expected = filter_set.calculate_vega_magnitudes_batch(wavelength, flux)
+
+    def request(row):
+        return call(server, '/photometry', {
+            'filter_set': 'synth', 'magnitude_system': 'vega',
+            'wavelength': wavelength.tolist(), 'flux': row.tolist()})
+
+    with ThreadPoolExecutor(len(flux)) as executor:
+        results = list(executor.map(request, flux))
+    np.testing.assert_allclose([result['magnitudes'] for result in results],
+                               expected)
+    # concurrent requests share batches
+    stats = call(server, '/stats')
+    assert stats['batching']['synth']['n_spectra'] >= len(flux)
+    assert stats['batching']['synth']['n_batches'] < len(flux)
+    assert stats['latency']['/photometry']['count'] >= len(flux)
+    assert stats['latency']['/photometry']['p99_ms'] > 0
+
+    result = call(server, '/photometry', {
+        'filter_set': 'synth', 'wavelength': (wavelength / 1e4).tolist(),
+        'wavelength_unit': 'micron', 'flux': flux[:2].tolist()})
+    np.testing.assert_allclose(
+        result['magnitudes'],
+        filter_set.calculate_ab_magnitudes_batch(wavelength, flux[:2]))
+
+
+def test_convert(server, filter_set):
+    magnitudes = np.array([[15., 16., 17.]])
+    result = call(server, '/convert', {'filter_set': 'synth',
+                                       'values': magnitudes.tolist(),
+                                       'from': 'ab', 'to': 'f_lambda'})
+    np.testing.assert_allclose(
+        result['values'],
+        filter_set.convert_ab_magnitudes_to_f_lambda(magnitudes).value)
+    result = call(server, '/convert', {'filter_set': 'synth',
+                                       'values': result['values'],
+                                       'from': 'f_lambda', 'to': 'vega'})
+    result = call(server, '/convert', {'filter_set': 'synth',
+                                       'values': result['values'],
+                                       'from': 'vega', 'to': 'ab'})
+    np.testing.assert_allclose(result['values'], magnitudes)
+
+
+def test_errors(server):
+    with pytest.raises(HTTPError) as error:
+        call(server, '/photometry', {'filter_set': 'other',
+                                     'wavelength': [1, 2], 'flux': [1, 2]})
+    assert error.value.code == 400
+    assert 'other' in json.loads(error.value.read())['error']
+    with pytest.raises(HTTPError) as error:
+        call(server, '/convert', {'filter_set': 'synth', 'values': [1, 2],
+                                  'from': 'ab', 'to': 'vega'})
+    assert error.value.code == 400
+    with pytest.raises(HTTPError) as error:
+        call(server, '/unknown')
+    assert error.value.code == 404
+    assert call(server, '/filter_sets')['synth']['filter_ids'][0] == \
+        'SYNTH/INST/F04500'
+
+
+def test_keep_alive(server):
+    url = urlsplit(server.url)
+    connection = HTTPConnection(url.hostname, url.port, timeout=10)
+    try:
+        # the bodies of rejected requests must not leak into the next one
+        for path in ['/nope', '/photometry']:
+            connection.request('POST', path, body=b'{"filter_set": [1, 2]}',
+                               headers={'Content-Type': 'application/json'})
+            response = connection.getresponse()
+            assert response.status in (400, 404)
+            response.read()
+            connection.request('GET', '/filter_sets')
+            response = connection.getresponse()
+            assert response.status == 200
+            assert 'synth' in json.loads(response.read())
+    finally:
+        connection.close()
@@ -0,0 +1,59 @@
+import pickle
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pytest
+
+from wsynphot.shared import SharedFilterSet, get_shared_filter_set
+from wsynphot.tests.helpers import make_filter_set, make_spectrum_arrays
+
+
+@pytest.fixture(scope='module')
+def filter_set(tmpdir_factory):
+    return make_filter_set(vega_dir=str(tmpdir_factory.mktemp('vega')))
+
+
+def _vega_magnitudes(shared, wavelength, flux):
+    filter_set = get_shared_filter_set(shared)
+    photometry = filter_set.get_batch_photometry(wavelength)
+    # published weights are used as they are, not recomputed
+    assert not photometry.weights.flags.writeable
+    return filter_set.calculate_vega_magnitudes_batch(wavelength, flux)
+
+
+def test_publish_and_attach(filter_set):
+    wavelength, flux = make_spectrum_arrays(2000, n_spectra=4)
+    expected = filter_set.calculate_vega_magnitudes_batch(wavelength, flux)
+    with SharedFilterSet.publish(filter_set, [wavelength]) as shared:
+        handle = pickle.loads(pickle.dumps(shared))
+        assert len(pickle.dumps(shared)) < 2000
+        attached = handle.attach()
+        assert [item.filter_id for item in attached] == \
+            [item.filter_id for item in filter_set]
+        assert not attached[0].wavelength.flags.writeable
+        np.testing.assert_allclose(attached.zp_vega_f_lambda.value,
+                                   filter_set.zp_vega_f_lambda.value)
+        np.testing.assert_allclose(
+            attached.calculate_vega_magnitudes_batch(wavelength, flux),
+            expected)
+
+        with ProcessPoolExecutor(2) as pool:
+            results = list(pool.map(_vega_magnitudes, [shared] * 3,
+                                    [wavelength] * 3, [flux] * 3))
+        for result in results:
+            np.testing.assert_allclose(result, expected)
+        handle.close()
+        with pytest.raises(ValueError):
+            handle.unlink()
+
+
+def test_close_while_attached(filter_set):
+    with SharedFilterSet.publish(filter_set) as shared:
+        handle = pickle.loads(pickle.dumps(shared))
+        attached = get_shared_filter_set(handle)
+        transmission = attached[0].transmission_lambda
+        handle.close()
+    # the block stays mapped until the arrays using it are freed
+    del attached
+    np.testing.assert_array_equal(transmission,
+                                  filter_set[0].transmission_lambda)
@@ -0,0 +1,90 @@
+import numpy as np
+from astropy import units as u
+
+from wsynphot import MagnitudeCatalog, MagnitudeSet
+from wsynphot.spectral_model import MagnitudeSpectralModel, SpectralModel
+from wsynphot.tests.helpers import make_filter_curve
+
+FLAM = u.erg / u.s / u.cm**2 / u.angstrom
+
+
+def make_spectral_model():
+    wavelength_knots = np.linspace(3000, 9000, 7) * u.angstrom
+    flux_knots = np.array([1., 3., 4., 3.5, 2., 1.5, 1.]) * FLAM
+    return SpectralModel(wavelength_knots, flux_knots,
+                         wavelength=np.linspace(3000, 9000, 601) * u.angstrom)
+
+
+def test_flux_is_lazy():
+    model = make_spectral_model()
+    assert model._flux is None
+    flux = model.flux
+    assert flux.shape == (601,)
+    assert model.flux is flux
+
+    model.wavelength = np.linspace(4000, 5000, 11) * u.angstrom
+    assert model._flux is None
+    np.testing.assert_allclose(model.flux[0].value, 3.)
+
+
+def test_interpolation_object_is_shared():
+    model = make_spectral_model()
+    interpolation_object = model.get_interpolation_object()
+    model.interpolate(np.linspace(3000, 9000, 10) * u.nm)
+    model.interpolate(np.linspace(3000, 9000, 20) * u.angstrom)
+    assert model.get_interpolation_object() is interpolation_object
+    assert model.get_interpolation_object('linear') is not \
+        interpolation_object
+
+    # changing the knots rebuilds the interpolator and the flux
+    flux = model.flux
+    model.flux_knots = model.flux_knots * 2
+    assert model.get_interpolation_object() is not interpolation_object
+    np.testing.assert_allclose(model.flux.value, 2 * flux.value)
+
+
+def test_interpolate_converts_units():
+    model = make_spectral_model()
+    np.testing.assert_allclose(
+        model.interpolate([400, 500] * u.nm).value,
+        model.interpolate([4000, 5000] * u.angstrom).value)
+
+
+def test_knot_response():
+    magnitude_set = MagnitudeSet(
+        [make_filter_curve(center, 0.2 * center)
+         for center in [3500, 4500, 5500, 7000, 9000]],
+        [15., 14.5, 14.2, 14.1, 14.3], [0.1] * 5)
+    model = MagnitudeSpectralModel(magnitude_set, magnitude_system='ab')
+    model.wavelength = np.linspace(2500, 11000, 2000) * u.angstrom
+
+    response = model.get_response_operator()
+    assert response.matrix.shape == (5, 7)
+    assert model.get_response_operator() is response
+    np.testing.assert_allclose(
+        response.calculate_magnitudes(model.flux_knots, 'ab'),
+        u.Quantity(model.calculate_ab_magnitudes()).value)
+
+    # the fitted knots reproduce the magnitudes of the set
+    model.fit_flux_knots()
+    np.testing.assert_allclose(u.Quantity(model.calculate_ab_magnitudes()),
+                               magnitude_set.magnitudes, atol=1e-8)
+
+
+def test_batch_magnitude_spectral_model():
+    filter_set = [make_filter_curve(center, 0.2 * center)
+                  for center in [4000, 5000, 6500, 8000]]
+    magnitudes = np.array([[15., 14.5, 14.2, 14.1], [18., 17., 16.5, 16.]])
+    catalog = MagnitudeCatalog(filter_set, magnitudes)
+    wavelength = np.linspace(3000, 9500, 300) * u.angstrom
+    batch = MagnitudeSpectralModel.from_catalog(catalog, wavelength)
+
+    flux = batch.calculate_flux(chunk_size=1)
+    assert flux.shape == (2, 300)
+    for i, row in enumerate(magnitudes):
+        model = MagnitudeSpectralModel(MagnitudeSet(filter_set, row),
+                                       magnitude_system='ab')
+        np.testing.assert_allclose(model.interpolate(wavelength).value,
+                                   flux[i], rtol=1e-10, atol=1e-30)
+    np.testing.assert_allclose(batch.get_spectral_model(1).flux.value,
+                               flux[1], rtol=1e-10, atol=1e-30)
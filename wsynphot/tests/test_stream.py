@@ -0,0 +1,57 @@
+import numpy as np
+import pytest
+from astropy import units as u
+
+from wsynphot.stream import PhotometryStream, stream_photometry
+from wsynphot.tests.helpers import (make_filter_set, make_spectrum,
+                                    make_spectrum_arrays)
+
+
+@pytest.fixture
+def filter_set():
+    return make_filter_set([4500, 6500])
+
+
+def generate_spectra():
+    wavelength, flux = make_spectrum_arrays(1000, n_spectra=5)
+    for i, row in enumerate(flux):
+        yield 'a{0}'.format(i), (wavelength, row)
+    # a different grid and a spectrum object with units
+    wavelength, flux = make_spectrum_arrays(1500, n_spectra=2)
+    for row in flux:
+        yield wavelength * u.angstrom, row * u.erg / u.s / u.cm**2 / u.AA
+    yield make_spectrum(800)
+
+
+@pytest.mark.parametrize('prefetch', [0, 2])
+def test_stream(filter_set, prefetch):
+    stream = PhotometryStream(filter_set, batch_size=3, prefetch=prefetch,
+                              timings=True)
+    records = list(stream.process(generate_spectra()))
+    assert [record.index for record in records] == list(range(8))
+    assert records[0].spectrum_id == 'a0'
+    assert records[6].spectrum_id == 6
+    assert stream.info()['n_batches'] == 4
+    assert all(record.seconds >= 0 for record in records)
+
+    expected = [filter_set.calculate_ab_magnitudes_batch(
+        *make_spectrum_arrays(1000, n_spectra=5)),
+        filter_set.calculate_ab_magnitudes_batch(
+            *make_spectrum_arrays(1500, n_spectra=2)),
+        [[filter.calculate_ab_magnitude(make_spectrum(800))
+          for filter in filter_set]]]
+    np.testing.assert_allclose([record.magnitudes for record in records],
+                               np.concatenate(expected))
+
+
+def test_stream_errors_and_early_exit(filter_set):
+    def failing():
+        yield from generate_spectra()
+        raise IOError('broken source')
+
+    with pytest.raises(IOError):
+        list(stream_photometry(filter_set, failing(), prefetch=2))
+
+    records = stream_photometry(filter_set, generate_spectra(), prefetch=1)
+    next(records)
+    records.close()
@@ -0,0 +1,68 @@
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+from wsynphot.io.photometry_cache import PhotometryCache
+from wsynphot.tests.helpers import make_filter_set, make_spectrum_arrays
+from wsynphot.util.properties import slot_lazyproperty
+
+N_THREADS = 8
+
+
+def run_concurrently(function, n_threads=N_THREADS):
+    """Call `function` from `n_threads` threads released at the same time"""
+    barrier = threading.Barrier(n_threads)
+
+    def call(_):
+        barrier.wait()
+        return function()
+
+    with ThreadPoolExecutor(n_threads) as executor:
+        return list(executor.map(call, range(n_threads)))
+
+
+class SlowProperty(object):
+    __slots__ = ('n_calls', '_value', '__weakref__')
+
+    def __init__(self):
+        self.n_calls = 0
+
+    @slot_lazyproperty
+    def value(self):
+        self.n_calls += 1
+        time.sleep(0.01)
+        return object()
+
+
+def test_slot_lazyproperty_computes_once():
+    obj = SlowProperty()
+    values = run_concurrently(lambda: obj.value)
+    assert obj.n_calls == 1
+    assert all(value is values[0] for value in values)
+
+
+def test_filter_set_iteration_is_reentrant():
+    filter_set = make_filter_set([4000, 5000, 6000], relative_width=0.1)
+    pairs = [(a.filter_id, b.filter_id)
+             for a in filter_set for b in filter_set]
+    assert len(pairs) == 9
+    results = run_concurrently(
+        lambda: [item.filter_id for _ in range(200) for item in filter_set])
+    assert all(len(result) == 600 for result in results)
+
+
+def test_concurrent_first_photometry(tmpdir):
+    wavelength, flux = make_spectrum_arrays(2000, n_spectra=6)
+    expected = make_filter_set([4000, 6000]).calculate_ab_magnitudes_batch(
+        wavelength, flux)
+    filter_set = make_filter_set([4000, 6000])
+    cache = PhotometryCache(str(tmpdir))
+    results = run_concurrently(
+        lambda: filter_set.calculate_ab_magnitudes_batch(
+            wavelength, flux, chunk_size=2, cache=cache))
+    for result in results:
+        np.testing.assert_allclose(result, expected)
+    info = cache.info()
+    assert info['hits'] + info['misses'] == N_THREADS * len(flux)
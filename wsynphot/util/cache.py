@@ -0,0 +1,146 @@
+"""In-memory caching helpers"""
+from collections import OrderedDict, namedtuple
+import threading
+import weakref
+
+import numpy as np
+
+CacheInfo = namedtuple('CacheInfo', ['hits', 'misses', 'evictions', 'maxsize',
+                                     'currsize', 'nbytes'])
+
+# fingerprints of read-only arrays, which can be looked up by identity
+_readonly_fingerprints = {}
+
+
+def _is_immutable(array):
+    """Whether the data of `array` cannot change: it and every array it is a
+    view of are read-only (or the data is an immutable bytes object)"""
+    while isinstance(array, np.ndarray):
+        if array.flags.writeable:
+            return False
+        array = array.base
+    return array is None or isinstance(array, bytes)
+
+
+def array_fingerprint(array):
+    """Cheap fingerprint identifying the content of an array
+
+    The fingerprint combines unit (for Quantities), dtype, shape, end points
+    and a hash of the data. Arrays whose data cannot change (read-only and
+    not a view of writable memory) have their fingerprint remembered by
+    identity and not recomputed.
+
+    Parameters
+    ----------
+    array : numpy.ndarray or ~astropy.units.Quantity
+
+    Returns
+    -------
+    tuple
+    """
+    readonly = isinstance(array, np.ndarray) and _is_immutable(array)
+    if readonly:
+        entry = _readonly_fingerprints.get(id(array))
+        if entry is not None and entry[0]() is array:
+            return entry[1]
+
+    unit = getattr(array, 'unit', None)
+    value = np.ascontiguousarray(getattr(array, 'value', array))
+    if value.size > 0:
+        end_points = (value.flat[0], value.flat[-1])
+    else:
+        end_points = ()
+    fingerprint = (None if unit is None else unit.to_string(),
+                   value.dtype.str, value.shape, end_points,
+                   hash(value.tobytes()))
+
+    if readonly:
+        array_id = id(array)
+        _readonly_fingerprints[array_id] = (
+            weakref.ref(array,
+                        lambda ref: _readonly_fingerprints.pop(array_id,
+                                                               None)),
+            fingerprint)
+    return fingerprint
+
+
+class LRUCache(object):
+    """Least-recently-used cache with statistics
+
+    Parameters
+    ----------
+    maxsize : int
+        Maximum number of entries, 0 disables caching
+    """
+
+    def __init__(self, maxsize=8):
+        self._data = OrderedDict()
+        self._lock = threading.RLock()
+        self.maxsize = maxsize
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def __len__(self):
+        return len(self._data)
+
+    def __contains__(self, key):
+        return key in self._data
+
+    def get(self, key, default=None):
+        """Value for `key` (marking it as most recently used) or `default`"""
+        with self._lock:
+            try:
+                value = self._data[key]
+            except KeyError:
+                self.misses += 1
+                return default
+            self._data.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def put(self, key, value):
+        """Store `value` under `key`, evicting least recently used entries
+        beyond `maxsize`"""
+        if self.maxsize <= 0:
+            return
+        with self._lock:
+            self._data[key] = value
+            self._data.move_to_end(key)
+            self._evict()
+
+    def resize(self, maxsize):
+        """Change the maximum number of entries, evicting if necessary"""
+        with self._lock:
+            self.maxsize = maxsize
+            self._evict()
+
+    def _evict(self):
+        while len(self._data) > max(self.maxsize, 0):
+            self._data.popitem(last=False)
+            self.evictions += 1
+
+    def clear(self):
+        """Remove all entries and reset the statistics"""
+        with self._lock:
+            self._data.clear()
+            self.hits = self.misses = self.evictions = 0
+
+    def values(self):
+        with self._lock:
+            return list(self._data.values())
+
+    def info(self):
+        """Statistics of the cache
+
+        Returns
+        -------
+        CacheInfo
+            hits, misses, evictions, maxsize, current size and the number of
+            bytes held by cached numpy arrays
+        """
+        with self._lock:
+            nbytes = sum(value.nbytes for value in self._data.values()
+                         if isinstance(value, np.ndarray))
+            return CacheInfo(self.hits, self.misses, self.evictions,
+                             self.maxsize, len(self._data), nbytes)
@@ -0,0 +1,237 @@
+"""Optional instrumentation of the wsynphot hot paths
+
+Instrumentation is disabled by default and then only costs a single attribute
+lookup per instrumented call. It can be enabled for a block of code with
+`profile`::
+
+    from wsynphot.util import profiling
+
+    with profiling.profile(trace_fpath='wsynphot_trace.json') as profiler:
+        filter_set = FilterSet(filter_ids)
+        filter_set.calculate_vega_magnitudes(spectrum)
+    print(profiler.summary())
+
+or for a whole run by setting the environment variable ``WSYNPHOT_PROFILE``.
+Setting it to ``1`` logs the summary table at exit, setting it to a file path
+additionally writes a trace file there. Trace files use the Chrome trace
+event format and can be inspected with ``chrome://tracing`` or Perfetto.
+"""
+import atexit
+import functools
+import json
+import logging
+import os
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+PROFILE_ENV_VAR = 'WSYNPHOT_PROFILE'
+
+
+class Profiler(object):
+    """Collects counters, timers and trace events
+
+    Parameters
+    ----------
+    max_events : int, optional
+        Maximum number of trace events kept; timers keep being aggregated
+        once this is exceeded (default is 1000000)
+    """
+
+    def __init__(self, max_events=1000000):
+        self.enabled = False
+        self.max_events = max_events
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        """Remove all recorded counters, timers and trace events"""
+        with self._lock:
+            self.timers = {}
+            self.counters = {}
+            self.events = []
+            self.start_time = time.perf_counter()
+
+    def record(self, name, start, end):
+        """Record a timed call of `name` from `start` to `end` (in seconds
+        as returned by `time.perf_counter`)"""
+        duration = end - start
+        with self._lock:
+            timer = self.timers.get(name)
+            if timer is None:
+                self.timers[name] = [1, duration, duration, duration]
+            else:
+                timer[0] += 1
+                timer[1] += duration
+                timer[2] = min(timer[2], duration)
+                timer[3] = max(timer[3], duration)
+            if len(self.events) < self.max_events:
+                self.events.append((name, start, duration,
+                                    threading.get_ident()))
+
+    def count(self, name, n=1):
+        """Increment counter `name` by `n`"""
+        with self._lock:
+            self.counters[name] = self.counters.get(name, 0) + n
+
+    def summary(self):
+        """Summary of all timers and counters
+
+        Returns
+        -------
+        pandas.core.frame.DataFrame
+            Number of calls, total, mean, min and max time (in seconds) per
+            instrumented name, sorted by total time. Counters appear with
+            their count and no timing.
+        """
+        import pandas as pd
+
+        with self._lock:
+            rows = [(name, n_calls, total, total / n_calls, t_min, t_max)
+                    for name, (n_calls, total, t_min, t_max)
+                    in self.timers.items()]
+            rows += [(name, n, float('nan'), float('nan'), float('nan'),
+                      float('nan'))
+                     for name, n in self.counters.items()
+                     if name not in self.timers]
+        summary = pd.DataFrame(rows, columns=['name', 'calls', 'total',
+                                              'mean', 'min', 'max'])
+        return summary.set_index('name').sort_values('total', ascending=False)
+
+    def write_trace(self, fpath):
+        """Write all recorded trace events in the Chrome trace event format
+
+        Parameters
+        ----------
+        fpath : str
+            Path of the JSON file to write
+        """
+        pid = os.getpid()
+        with self._lock:
+            trace_events = [
+                {'name': name, 'ph': 'X', 'pid': pid, 'tid': tid,
+                 'ts': (start - self.start_time) * 1e6,
+                 'dur': duration * 1e6}
+                for name, start, duration, tid in self.events]
+            trace_events += [
+                {'name': name, 'ph': 'C', 'pid': pid, 'ts': 0,
+                 'args': {name: n}}
+                for name, n in self.counters.items()]
+        with open(fpath, 'w') as fh:
+            json.dump({'traceEvents': trace_events,
+                       'displayTimeUnit': 'ms'}, fh)
+
+
+profiler = Profiler()
+
+
+def timed(name):
+    """Decorator timing every call of the decorated function under `name`
+    when instrumentation is enabled"""
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            if not profiler.enabled:
+                return func(*args, **kwargs)
+            start = time.perf_counter()
+            try:
+                return func(*args, **kwargs)
+            finally:
+                profiler.record(name, start, time.perf_counter())
+        return wrapper
+    return decorator
+
+
+class timer(object):
+    """Context manager timing a block of code under `name` when
+    instrumentation is enabled"""
+    __slots__ = ('name', 'start')
+
+    def __init__(self, name):
+        self.name = name
+        self.start = None
+
+    def __enter__(self):
+        # blocks entered while instrumentation is disabled are not recorded,
+        # even if it gets enabled before they end
+        self.start = time.perf_counter() if profiler.enabled else None
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        if self.start is not None:
+            profiler.record(self.name, self.start, time.perf_counter())
+        return False
+
+
+def count(name, n=1):
+    """Increment counter `name` by `n` when instrumentation is enabled"""
+    if profiler.enabled:
+        profiler.count(name, n)
+
+
+def enable(reset=True):
+    """Enable instrumentation, clearing previous records if `reset`"""
+    if reset:
+        profiler.reset()
+    profiler.enabled = True
+
+
+def disable():
+    """Disable instrumentation, keeping what was recorded"""
+    profiler.enabled = False
+
+
+class profile(object):
+    """Context manager enabling instrumentation for a block of code
+
+    Parameters
+    ----------
+    trace_fpath : str, optional
+        If given, the trace events are written to this path on exit
+    reset : bool, optional
+        Clear previously recorded data on entering (default is True)
+
+    Returns
+    -------
+    Profiler
+        on entering, use its `summary()` for the results
+    """
+
+    def __init__(self, trace_fpath=None, reset=True):
+        self.trace_fpath = trace_fpath
+        self.reset = reset
+
+    def __enter__(self):
+        self.was_enabled = profiler.enabled
+        enable(reset=self.reset)
+        return profiler
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        profiler.enabled = self.was_enabled
+        if self.trace_fpath is not None:
+            profiler.write_trace(self.trace_fpath)
+        return False
+
+
+def _report_at_exit(trace_fpath=None):
+    logger.info('wsynphot profiling summary:\n{0}'.format(
+        profiler.summary().to_string()))
+    if trace_fpath is not None:
+        profiler.write_trace(trace_fpath)
+        logger.info('wsynphot profiling trace written to {0}'.format(
+            trace_fpath))
+
+
+def _enable_from_environment():
+    value = os.environ.get(PROFILE_ENV_VAR, '').strip()
+    if value.lower() in ('', '0', 'false', 'no', 'off'):
+        return
+    trace_fpath = None
+    if value.lower() not in ('1', 'true', 'yes', 'on'):
+        trace_fpath = value
+    enable()
+    atexit.register(_report_at_exit, trace_fpath)
+
+
+_enable_from_environment()
@@ -0,0 +1,75 @@
+"""Property helpers for classes defining ``__slots__``"""
+import threading
+import weakref
+
+# locks of lazy properties being computed, per instance and property
+_computing_locks = weakref.WeakKeyDictionary()
+_computing_locks_lock = threading.Lock()
+
+
+def _get_computing_lock(obj, slot_name):
+    with _computing_locks_lock:
+        locks = _computing_locks.setdefault(obj, {})
+        lock = locks.get(slot_name)
+        if lock is None:
+            lock = locks[slot_name] = threading.RLock()
+        return lock
+
+
+def _release_computing_lock(obj, slot_name):
+    with _computing_locks_lock:
+        locks = _computing_locks.get(obj)
+        if locks is not None:
+            locks.pop(slot_name, None)
+            if not locks:
+                del _computing_locks[obj]
+
+
+class slot_lazyproperty(object):
+    """Equivalent of `astropy.utils.lazyproperty` for classes with
+    ``__slots__``
+
+    The value is computed on first access and stored in the slot named like
+    the property with a leading underscore, which the class has to define.
+    Deleting the attribute resets the cached value.
+
+    Concurrent first accesses from several threads compute the value only
+    once: the computation holds a lock for this instance and property (the
+    class needs a ``__weakref__`` slot), later accesses read the slot without
+    locking.
+    """
+
+    def __init__(self, fget, doc=None):
+        self.fget = fget
+        self.slot_name = '_' + fget.__name__
+        self.__doc__ = fget.__doc__ if doc is None else doc
+        self.__name__ = fget.__name__
+
+    def __get__(self, obj, owner=None):
+        if obj is None:
+            return self
+        try:
+            return getattr(obj, self.slot_name)
+        except AttributeError:
+            pass
+        with _get_computing_lock(obj, self.slot_name):
+            try:
+                return getattr(obj, self.slot_name)
+            except AttributeError:
+                value = self.fget(obj)
+                setattr(obj, self.slot_name, value)
+        _release_computing_lock(obj, self.slot_name)
+        return value
+
+    def __set__(self, obj, value):
+        setattr(obj, self.slot_name, value)
+
+    def __delete__(self, obj):
+        try:
+            delattr(obj, self.slot_name)
+        except AttributeError:
+            pass
+
+    def is_set(self, obj):
+        """Whether the value has already been computed for `obj`"""
+        return hasattr(obj, self.slot_name)